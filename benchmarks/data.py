@@ -0,0 +1,102 @@
+import csv
+import random
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Questions per bundled dataset, with the SQL the stub model answers them with
+QUESTIONS: Dict[str, List[Tuple[str, str]]] = {
+    'budget': [
+        ("What is the total budget per fiscal year?",
+         "SELECT fy, SUM(amount) AS total_amount FROM budget GROUP BY fy ORDER BY fy"),
+        ("Which budget lines belong to Project Alpha?",
+         "SELECT title, fy, amount FROM budget WHERE LOWER(project) LIKE '%alpha%'"),
+        ("How many budget lines were modified by Alice Johnson?",
+         "SELECT COUNT(*) FROM budget WHERE LOWER(modified_by) LIKE '%alice%johnson%'"),
+        ("Show every budget line.", "SELECT * FROM budget"),
+    ],
+    'personnel': [
+        ("What are the planned and actual personnel numbers per program?",
+         "SELECT program, ROUND(SUM(planned), 2), ROUND(SUM(actual), 2) FROM personnel GROUP BY program"),
+        ("Which roles have actual staffing below plan?",
+         "SELECT title, personnel, planned, actual FROM personnel WHERE actual < planned"),
+        ("Show every personnel record.", "SELECT * FROM personnel"),
+    ],
+    'schedule': [
+        ("How many critical milestones are there?",
+         "SELECT COUNT(*) FROM schedule WHERE is_milestone = 1 AND is_critical = 1"),
+        ("Which tasks finish after 2025?",
+         "SELECT title, finish_date FROM schedule WHERE finish_date > '2025-12-31 23:59:59' ORDER BY finish_date"),
+        ("Which tasks mention a review?",
+         "SELECT title, start_date FROM schedule WHERE LOWER(title) LIKE '%review%'"),
+        ("Show the whole schedule.", "SELECT * FROM schedule"),
+    ],
+    'risks': [
+        ("How many risks does each owner have?",
+         "SELECT owner, COUNT(*) FROM risks GROUP BY owner ORDER BY COUNT(*) DESC"),
+        ("Which risks are still open?",
+         "SELECT title, status, currentc, currentl FROM risks WHERE LOWER(status) LIKE '%open%'"),
+        ("Show every risk.", "SELECT * FROM risks"),
+    ],
+    'product_progression': [
+        ("What is the average actual progress per product?",
+         "SELECT product, ROUND(AVG(actual), 2) FROM product_progression GROUP BY product"),
+        ("Which products are behind plan?",
+         "SELECT product, date, planned, actual FROM product_progression WHERE actual < planned"),
+        ("Show all product progression records.", "SELECT * FROM product_progression"),
+    ],
+    'progress': [
+        ("What is the average actual value per technical performance measure?",
+         "SELECT tpm, ROUND(AVG(actual), 2) FROM progress GROUP BY tpm"),
+        ("Which measures are not on track?", "SELECT tpm, performancedate, actual FROM progress WHERE ontrack = 0"),
+    ],
+}
+
+
+def load_seed_rows(dataset: str) -> Tuple[List[str], List[tuple]]:
+    db_path = REPO_ROOT / f"{dataset}.db"
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        cursor = conn.execute(f'SELECT * FROM "{dataset}";')
+        columns = [column[0] for column in cursor.description]
+        return columns, cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def generate_csv(dataset: str, rows: int, output_dir: Path, seed: int = 0) -> Path:
+    """Write `rows` synthetic rows shaped like the bundled `<dataset>.db` table.
+
+    Every column is sampled from the values the bundled table already holds,
+    numbers are jittered, and identifier-like columns are made unique so the
+    data can take a primary key.
+    """
+    columns, seed_rows = load_seed_rows(dataset)
+    rng = random.Random(seed)
+    pools = []
+    for position, column in enumerate(columns):
+        values = [row[position] for row in seed_rows if row[position] not in (None, '')]
+        pools.append(values or [None])
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    csv_path = output_dir / f"{dataset}.csv"
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for index in range(rows):
+            writer.writerow([_synthetic_value(column, pool, index, rng) for column, pool in zip(columns, pools)])
+    return csv_path
+
+
+def _synthetic_value(column: str, pool: list, index: int, rng: random.Random):
+    name = column.lower()
+    if name in ('id', 'uid') or name.endswith('guid'):
+        return index + 1
+    value = rng.choice(pool)
+    if isinstance(value, float):
+        return round(value * rng.uniform(0.5, 1.5), 2)
+    if isinstance(value, int) and not isinstance(value, bool) and name not in ('fy',) and abs(value) > 1:
+        return int(value * rng.uniform(0.5, 1.5))
+    return value
@@ -0,0 +1,129 @@
+"""Cold-start benchmark: how long a fresh interpreter takes to become useful.
+
+Each scenario runs in a new Python process, so nothing is warm:
+
+    import   import texttosql.sqlite
+    ingest   import, then load a small CSV into a new database
+    query    import, then answer one question against the local chat-completions stub
+
+Point --package-root at another checkout (e.g. one made with
+`git worktree add /tmp/before <ref>`) to compare against it:
+
+    python -m benchmarks.import_time --repeat 10 --package-root . --package-root /tmp/before
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from benchmarks.data import QUESTIONS, REPO_ROOT, generate_csv
+from benchmarks.stub_openai import StubChatCompletions
+
+HEAVY_MODULES = ['openai', 'streamlit', 'pandas', 'dotenv', 'httpx', 'numpy', 'tiktoken']
+
+_SCENARIOS = {
+    'import': """
+import texttosql.sqlite
+""",
+    'ingest': """
+import texttosql.sqlite
+engine = texttosql.sqlite.SQLiteEngine('bench_ingest')
+engine.create_tables_from_csv(CSV_PATH)
+""",
+    'query': """
+import texttosql.sqlite
+engine = texttosql.sqlite.SQLiteEngine('budget')
+engine.texttosql_cache_enabled = False
+engine.query(QUESTION)
+""",
+}
+
+_HARNESS = """
+import contextlib, io, json, sys, time
+started = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+{body}
+seconds = time.perf_counter() - started
+print(json.dumps({{'seconds': seconds, 'modules': [m for m in {modules!r} if m in sys.modules]}}))
+"""
+
+
+def run_scenario(name: str, package_root: Path, workdir: Path, env: Dict[str, str],
+                 csv_path: Path, question: str) -> dict:
+    body = _SCENARIOS[name].replace('CSV_PATH', repr(str(csv_path))).replace('QUESTION', repr(question))
+    code = _HARNESS.format(body='\n'.join('    ' + line for line in body.strip().splitlines()),
+                           modules=HEAVY_MODULES)
+    for stale in workdir.glob('bench_ingest.db*'):
+        stale.unlink()
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', code], cwd=workdir, capture_output=True, text=True,
+                               env={**env, 'PYTHONPATH': str(package_root)})
+    wall = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"{name} failed under {package_root}:\n{completed.stderr}")
+    report = json.loads(completed.stdout.strip().splitlines()[-1])
+    report['wall_seconds'] = wall
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Measure cold-start time of the texttosql package.")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--scenarios', default=','.join(_SCENARIOS))
+    parser.add_argument('--package-root', action='append', help="checkout to import texttosql from (repeatable)")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    package_roots = [Path(root).resolve() for root in (args.package_root or [str(REPO_ROOT)])]
+    scenarios = [scenario.strip() for scenario in args.scenarios.split(',') if scenario.strip()]
+    question, sql = QUESTIONS['budget'][0]
+    results = []
+
+    with StubChatCompletions({question: sql}) as stub, tempfile.TemporaryDirectory(prefix='texttosql-import-') as tmp:
+        workdir = Path(tmp)
+        csv_path = generate_csv('budget', 1000, workdir)
+        (workdir / 'budget.db').write_bytes((REPO_ROOT / 'budget.db').read_bytes())
+        env = {
+            **os.environ,
+            'OPENAI_BASE_URL': stub.base_url,
+            'OPENAI_API_KEY': 'benchmark',
+            'DEVELOPMENT_MODE': '1',
+            'TEXTTOSQL_CACHE_PATH': str(workdir / '.texttosql_cache.sqlite'),
+            'TEXTTOSQL_WORKLOAD_PATH': str(workdir / '.texttosql_workload.sqlite'),
+            'TEXTTOSQL_TRACE_PATH': str(workdir / '.texttosql_traces.sqlite'),
+            'TEXTTOSQL_RESULT_CACHE_PATH': str(workdir / '.texttosql_results.sqlite'),
+        }
+
+        for package_root in package_roots:
+            for scenario in scenarios:
+                runs = [run_scenario(scenario, package_root, workdir, env, csv_path, question)
+                        for _ in range(args.repeat)]
+                results.append({
+                    'package_root': str(package_root),
+                    'scenario': scenario,
+                    'runs': len(runs),
+                    'median_seconds': round(statistics.median(run['seconds'] for run in runs), 4),
+                    'min_seconds': round(min(run['seconds'] for run in runs), 4),
+                    'median_wall_seconds': round(statistics.median(run['wall_seconds'] for run in runs), 4),
+                    'modules': runs[-1]['modules'],
+                })
+
+    print(f"{'package root':<32} {'scenario':<8} {'median s':>9} {'min s':>8} {'process s':>10}  heavy modules loaded")
+    for result in results:
+        print(f"{result['package_root'][-32:]:<32} {result['scenario']:<8} {result['median_seconds']:>9.3f} "
+              f"{result['min_seconds']:>8.3f} {result['median_wall_seconds']:>10.3f}  {', '.join(result['modules'])}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'results': results}, f, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+"""Offline benchmarks for ingestion, the query pipeline and constraint migrations.
+
+Synthetic data shaped like the bundled databases is generated at the requested
+size, loaded through the CSV importer, queried through every stage of
+SQLiteEngine.query against a local chat-completions stub, and migrated with
+migrate_table. Run from the repository root:
+
+    python -m benchmarks.run --rows 100000 --output results.json
+    python -m benchmarks.run --rows 1000000 --compare results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.data import QUESTIONS, generate_csv
+from benchmarks.stub_openai import StubChatCompletions
+
+
+class PeakMemory:
+    """Samples resident memory in the background and keeps the peak seen during a block."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+    def _rss(self) -> int:
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * self._page_size
+        except OSError:
+            # Lifetime peak is the best that is available without procfs
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak if sys.platform == 'darwin' else peak * 1024
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_bytes = max(self.peak_bytes, self._rss())
+
+    def __enter__(self):
+        self.peak_bytes = self._rss()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, self._rss())
+
+
+class StageRecorder:
+    def __init__(self):
+        self.samples: Dict[tuple, List[float]] = {}
+        self.units: Dict[tuple, tuple] = {}
+        self.peaks: Dict[tuple, int] = {}
+
+    def add(self, stage: str, dataset: str, seconds: float, units: float = 1, unit: str = 'ops'):
+        key = (stage, dataset)
+        self.samples.setdefault(key, []).append(seconds)
+        total_units, _ = self.units.get(key, (0, unit))
+        self.units[key] = (total_units + units, unit)
+
+    def peak(self, stage: str, dataset: str, peak_bytes: int):
+        key = (stage, dataset)
+        self.peaks[key] = max(self.peaks.get(key, 0), peak_bytes)
+
+    def results(self) -> List[dict]:
+        results = []
+        for (stage, dataset), samples in self.samples.items():
+            timings = np.array(samples) * 1000
+            total_seconds = float(np.sum(samples))
+            units, unit = self.units[(stage, dataset)]
+            results.append({
+                'stage': stage,
+                'dataset': dataset,
+                'count': len(samples),
+                'total_seconds': round(total_seconds, 6),
+                'throughput': round(units / total_seconds, 3) if total_seconds else None,
+                'throughput_unit': f'{unit}/s',
+                'p50_ms': round(float(np.percentile(timings, 50)), 3),
+                'p95_ms': round(float(np.percentile(timings, 95)), 3),
+                'p99_ms': round(float(np.percentile(timings, 99)), 3),
+                'peak_rss_mb': round(self.peaks[(stage, dataset)] / 2 ** 20, 1) if (stage, dataset) in self.peaks else None,
+            })
+        return results
+
+
+@contextlib.contextmanager
+def quiet(enabled: bool = True):
+    # The handlers report progress with print; keep it out of the benchmark output
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def run_ingest(datasets: List[str], rows: int, workdir: Path, recorder: StageRecorder, verbose: bool):
+    from texttosql.sqlite import SQLiteEngine
+
+    csv_dir = workdir / 'csv'
+    for dataset in datasets:
+        csv_path = generate_csv(dataset, rows, csv_dir)
+        with quiet(not verbose):
+            engine = SQLiteEngine(dataset)
+            with PeakMemory() as memory:
+                started = time.perf_counter()
+                engine.create_tables_from_csv(csv_path)
+                seconds = time.perf_counter() - started
+        recorder.add('ingest_csv', dataset, seconds, units=rows, unit='rows')
+        recorder.peak('ingest_csv', dataset, memory.peak_bytes)
+        print(f"ingest_csv  {dataset:<20} {rows:>10,} rows in {seconds:8.3f}s", file=sys.stderr)
+
+
+def run_queries(datasets: List[str], repeat: int, recorder: StageRecorder, verbose: bool):
+    from texttosql.sqlite import SQLiteEngine
+
+    for dataset in datasets:
+        with quiet(not verbose):
+            engine = SQLiteEngine(dataset)
+        # Every repetition should reach the model and the database, not the question or result cache
+        engine.texttosql_cache_enabled = False
+        engine.result_cache_enabled = False
+        for _ in range(repeat):
+            for question, _ in QUESTIONS.get(dataset, []):
+                with quiet(not verbose), PeakMemory() as memory:
+                    timings = run_query_stages(engine, question)
+                for stage, seconds in timings.items():
+                    recorder.add(stage, dataset, seconds)
+                recorder.peak('query_total', dataset, memory.peak_bytes)
+        print(f"query       {dataset:<20} {repeat * len(QUESTIONS.get(dataset, []))} questions", file=sys.stderr)
+
+
+def run_query_stages(engine, question: str) -> Dict[str, float]:
+    # The same steps SQLiteEngine.query takes, timed one by one
+    timings = {}
+    started = time.perf_counter()
+
+    mark = time.perf_counter()
+    cleaned_query = engine.handle_query(question)
+    schema = engine._schema_for_query(cleaned_query)
+    timings['query_schema'] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    llm_sql_result = engine.make_texttosql_llm_call(query=cleaned_query, schema=schema)
+    timings['query_texttosql_llm'] = time.perf_counter() - mark
+
+    if engine._early_query_result(llm_sql_result) is None:
+        mark = time.perf_counter()
+        data = engine.execute_query_result(llm_sql_result.get('sql'))
+        timings['query_execute'] = time.perf_counter() - mark
+
+        if data is not None:
+            mark = time.perf_counter()
+            prompt_data = engine.compact_result_for_prompt(data)
+            timings['query_compact'] = time.perf_counter() - mark
+
+            mark = time.perf_counter()
+            engine.make_generative_llm_call(query=cleaned_query, data=prompt_data)
+            timings['query_generative_llm'] = time.perf_counter() - mark
+
+    timings['query_total'] = time.perf_counter() - started
+    return timings
+
+
+def run_migrations(datasets: List[str], rows: int, recorder: StageRecorder, verbose: bool):
+    from texttosql.sqlite import SQLiteEngine
+
+    for dataset in datasets:
+        with quiet(not verbose):
+            engine = SQLiteEngine(dataset)
+            key_column = _unique_column(engine, dataset)
+            if key_column is None:
+                continue
+            other_columns = [column['name'] for column in engine.get_db_schema()[dataset]['columns']
+                             if column['name'] != key_column][:2]
+            changes = [{'op': 'set_primary_key', 'columns': [key_column]}]
+            changes += [{'op': 'create_index', 'columns': [column]} for column in other_columns]
+
+            # The report rounds to milliseconds, too coarse for small tables
+            with PeakMemory() as memory:
+                started = time.perf_counter()
+                engine.migrate_table(dataset, changes)
+                seconds = time.perf_counter() - started
+            recorder.add('migrate_batch', dataset, seconds, units=rows, unit='rows')
+            recorder.peak('migrate_batch', dataset, memory.peak_bytes)
+
+            # The single-change path rebuilds once per call
+            started = time.perf_counter()
+            engine.remove_primary_key(dataset)
+            recorder.add('migrate_single', dataset, time.perf_counter() - started, units=rows, unit='rows')
+        print(f"migrate     {dataset:<20} {len(changes)} changes in {seconds:8.3f}s", file=sys.stderr)
+
+
+def _unique_column(engine, dataset: str) -> Optional[str]:
+    for column in engine.get_db_schema()[dataset]['columns']:
+        name = column['name'].lower()
+        if name in ('id', 'uid') or name.endswith('guid'):
+            return column['name']
+    return None
+
+
+def compare(results: List[dict], baseline_path: Path):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(r['stage'], r['dataset']): r for r in json.load(f)['results']}
+    print(f"\n{'stage':<22} {'dataset':<20} {'p50 ms':>10} {'Δp50':>8} {'p95 ms':>10} {'Δp95':>8}")
+    for result in results:
+        previous = baseline.get((result['stage'], result['dataset']))
+        if previous is None:
+            continue
+        deltas = [
+            f"{(result[k] - previous[k]) / previous[k] * 100:+7.1f}%" if previous[k] else '     n/a'
+            for k in ('p50_ms', 'p95_ms')
+        ]
+        print(f"{result['stage']:<22} {result['dataset']:<20} {result['p50_ms']:>10.3f} {deltas[0]} "
+              f"{result['p95_ms']:>10.3f} {deltas[1]}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, querying and migrations offline.")
+    parser.add_argument('--rows', type=int, default=100_000, help="synthetic rows per dataset")
+    parser.add_argument('--datasets', default=','.join(QUESTIONS), help="comma-separated bundled datasets")
+    parser.add_argument('--repeat', type=int, default=5, help="passes over each dataset's questions")
+    parser.add_argument('--llm-latency-ms', type=float, default=50.0)
+    parser.add_argument('--llm-jitter-ms', type=float, default=10.0)
+    parser.add_argument('--stages', default='ingest,query,migrate')
+    parser.add_argument('--workdir', help="where databases are written (default: a temporary directory)")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--compare', help="earlier JSON results to print deltas against")
+    parser.add_argument('--verbose', action='store_true', help="keep the engine's own progress output")
+    args = parser.parse_args(argv)
+
+    datasets = [dataset.strip() for dataset in args.datasets.split(',') if dataset.strip()]
+    stages = {stage.strip() for stage in args.stages.split(',')}
+    canned_sql = {question: sql for questions in QUESTIONS.values() for question, sql in questions}
+
+    with StubChatCompletions(canned_sql, latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms) as stub, \
+            tempfile.TemporaryDirectory(prefix='texttosql-bench-') as tmp:
+        workdir = Path(args.workdir or tmp).resolve()
+        workdir.mkdir(parents=True, exist_ok=True)
+        output = Path(args.output).resolve() if args.output else None
+        baseline = Path(args.compare).resolve() if args.compare else None
+
+        # The client reads these when the handler module is first imported
+        os.environ['OPENAI_BASE_URL'] = stub.base_url
+        os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+        os.environ.setdefault('DEVELOPMENT_MODE', '1')
+        os.environ['TEXTTOSQL_CACHE_PATH'] = str(workdir / '.texttosql_cache.sqlite')
+        os.environ['TEXTTOSQL_WORKLOAD_PATH'] = str(workdir / '.texttosql_workload.sqlite')
+        os.environ['TEXTTOSQL_RESULT_CACHE_PATH'] = str(workdir / '.texttosql_results.sqlite')
+        os.chdir(workdir)
+
+        recorder = StageRecorder()
+        if 'ingest' in stages:
+            run_ingest(datasets, args.rows, workdir, recorder, args.verbose)
+        if 'query' in stages:
+            run_queries(datasets, args.repeat, recorder, args.verbose)
+        if 'migrate' in stages:
+            run_migrations(datasets, args.rows, recorder, args.verbose)
+
+        report = {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'rows': args.rows,
+                'repeat': args.repeat,
+                'llm_latency_ms': args.llm_latency_ms,
+                'llm_jitter_ms': args.llm_jitter_ms,
+                'llm_requests': stub.requests,
+                'python': platform.python_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+            },
+            'results': recorder.results(),
+        }
+
+    print(f"\n{'stage':<22} {'dataset':<20} {'n':>5} {'throughput':>18} {'p50 ms':>10} {'p95 ms':>10} "
+          f"{'p99 ms':>10} {'peak MB':>8}")
+    for result in report['results']:
+        throughput = f"{result['throughput']:,.1f} {result['throughput_unit']}" if result['throughput'] else '-'
+        peak = f"{result['peak_rss_mb']:.1f}" if result['peak_rss_mb'] is not None else '-'
+        print(f"{result['stage']:<22} {result['dataset']:<20} {result['count']:>5} {throughput:>18} "
+              f"{result['p50_ms']:>10.3f} {result['p95_ms']:>10.3f} {result['p99_ms']:>10.3f} {peak:>8}")
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {output}")
+    if baseline:
+        compare(report['results'], baseline)
+    return report
+
+
+if __name__ == '__main__':
+    main()
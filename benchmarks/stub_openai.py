@@ -0,0 +1,197 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+_QUESTION = re.compile(r"The user's question is: (.*)")
+
+
+class StubChatCompletions:
+    """Local stand-in for the OpenAI chat-completions endpoint.
+
+    Text-to-SQL prompts are answered with canned SQL looked up by question;
+    every other prompt gets a short fixed answer, streamed when asked to.
+    Point the client at it with OPENAI_BASE_URL=<base_url>.
+    """
+
+    def __init__(self, canned_sql: Optional[Dict[str, str]] = None, latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0, host: str = '127.0.0.1', port: int = 0,
+                 fallback_sql: str = "SELECT 1", answer: str = "This is a benchmark answer based on the data provided.",
+                 rate_limit_rate: float = 0.0):
+        self.canned_sql = dict(canned_sql or {})
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.fallback_sql = fallback_sql
+        self.answer = answer
+        # Share of requests answered with a 429, to exercise client retries
+        self.rate_limit_rate = rate_limit_rate
+        self.requests = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stub-openai', daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def completion_text(self, body: dict) -> str:
+        messages = body.get('messages', [])
+        system = ' '.join(m.get('content', '') for m in messages if m.get('role') == 'system')
+        prompt = ' '.join(m.get('content', '') for m in messages if m.get('role') == 'user')
+        # Both prompts share a system message; only the text-to-SQL one asks for a JSON object
+        if 'JSON object' not in system:
+            return self.answer
+
+        match = _QUESTION.search(prompt)
+        question = match.group(1).strip() if match else ''
+        # Same shape the real model is asked for: a Python dict literal
+        return repr({
+            'out_of_domain': False,
+            'out_of_domain_message': '',
+            'query_cleaning': question,
+            'query_expansion': question,
+            'recommended_next_questions': [],
+            'sql': self.canned_sql.get(question, self.fallback_sql),
+        })
+
+    def _sleep(self):
+        delay = self.latency_ms + (random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    self._send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                with stub._lock:
+                    stub.requests += 1
+                    rate_limited = stub.rate_limit_rate and random.random() < stub.rate_limit_rate
+                    stub.rate_limited += bool(rate_limited)
+                if rate_limited:
+                    self._send_json(429, {'error': {'message': 'Rate limit reached (stub).', 'type': 'requests',
+                                                    'code': 'rate_limit_exceeded'}},
+                                    headers={'retry-after-ms': '50'})
+                    return
+                stub._sleep()
+
+                text = stub.completion_text(body)
+                model = body.get('model', 'stub')
+                created = int(time.time())
+                prompt_tokens = sum(len(m.get('content', '')) for m in body.get('messages', [])) // 4
+                completion_tokens = len(text) // 4
+                usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                         'total_tokens': prompt_tokens + completion_tokens}
+                if body.get('stream'):
+                    include_usage = (body.get('stream_options') or {}).get('include_usage')
+                    self._send_stream(text, model, created, usage if include_usage else None)
+                    return
+                self._send_json(200, {
+                    'id': 'chatcmpl-stub',
+                    'object': 'chat.completion',
+                    'created': created,
+                    'model': model,
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text},
+                                 'finish_reason': 'stop', 'logprobs': None}],
+                    'usage': usage,
+                })
+
+            def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, text: str, model: str, created: int, usage: Optional[dict]):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                pieces = re.findall(r'\S+\s*', text) + [None]
+                for piece in pieces:
+                    chunk = {
+                        'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                        'choices': [{'index': 0, 'delta': {'content': piece} if piece else {},
+                                     'finish_reason': None if piece else 'stop', 'logprobs': None}],
+                    }
+                    self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                if usage is not None:
+                    # Like the real endpoint: one extra chunk with no choices and the totals
+                    chunk = {'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': created,
+                             'model': model, 'choices': [], 'usage': usage}
+                    self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                self._write_chunk(b"data: [DONE]\n\n")
+                self._write_chunk(b"")
+
+            def _write_chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local chat-completions stand-in for benchmarks.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="share of requests answered with a 429")
+    parser.add_argument('--canned-sql', help="JSON file mapping questions to the SQL to answer them with")
+    args = parser.parse_args()
+
+    canned_sql = None
+    if args.canned_sql:
+        with open(args.canned_sql, encoding='utf-8') as f:
+            canned_sql = json.load(f)
+    else:
+        from benchmarks.data import QUESTIONS
+        canned_sql = {question: sql for questions in QUESTIONS.values() for question, sql in questions}
+
+    stub = StubChatCompletions(canned_sql, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                               host=args.host, port=args.port, rate_limit_rate=args.rate_limit_rate)
+    print(f"Serving chat completions at {stub.base_url} (set OPENAI_BASE_URL to this)...")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,7 @@
 import streamlit as st
 import os
 from pathlib import Path
-import sqlite3
-import pandas as pd
-from texttosql.sqlite import SQLiteEngine
+from texttosql.sqlite import SQLiteQueryResult, get_engine, get_federated_engine, invalidate_engine, get_tracer, summarize_trace
 import base64
 
 # Set page configuration
@@ -27,43 +25,118 @@ st.markdown(
 # Initialize the engine at the global level
 engine = None
 
-def get_table_data(db_name, table_name, limit=1000):
-    conn = sqlite3.connect(db_name)
-    query = f"SELECT * FROM {table_name} LIMIT ?;"
-    data = pd.read_sql(query, conn, params=(limit,))
-    conn.close()
-    return data
+def display_table_viewer(db_name):
+    schema = engine.get_db_schema() or {}
+    if not schema:
+        st.info("This database has no tables yet.")
+        return
+
+    tables = list(schema)
+    default_table = Path(db_name).stem
+    table_name = st.selectbox("Table", tables, index=tables.index(default_table) if default_table in tables else 0)
+    all_columns = [column['name'] for column in schema[table_name]['columns']]
+    columns = st.multiselect("Columns", all_columns, default=all_columns)
+    page_size = st.selectbox("Rows per page", [100, 500, 1000, 5000], index=2)
+
+    # Each page remembers the rowid it starts after, so moving between pages is a keyset seek
+    viewer_key = (db_name, table_name, tuple(columns), page_size)
+    viewer = st.session_state.get('viewer')
+    if viewer is None or viewer['key'] != viewer_key:
+        viewer = st.session_state['viewer'] = {'key': viewer_key, 'cursors': [None]}
+
+    page = engine.get_table_page(table_name, after=viewer['cursors'][-1], limit=page_size, columns=columns or None)
+    page_number = len(viewer['cursors'])
+    start = (page_number - 1) * page_size + 1 if page['result'].row_count else 0
+    end = (page_number - 1) * page_size + page['result'].row_count
+    st.write(f"Rows {start:,}-{end:,} of {page['total_rows']:,}")
+    st.dataframe(page['result'].to_pandas())
+
+    previous_column, next_column = st.columns(2)
+    if previous_column.button("Previous page", disabled=page_number == 1):
+        viewer['cursors'].pop()
+        st.rerun()
+    if next_column.button("Next page", disabled=not page['has_next']):
+        viewer['cursors'].append(page['last_rowid'])
+        st.rerun()
+
+def display_sql_result(sql_result):
+    if isinstance(sql_result, SQLiteQueryResult):
+        if sql_result.status == 'timed_out':
+            st.warning(f"The query exceeded its time budget; displaying the {sql_result.row_count} rows fetched before it was stopped:")
+        elif sql_result.truncated:
+            st.write(f"Displaying the first {sql_result.row_count} rows (result was truncated):")
+        st.dataframe(sql_result.to_pandas())
+    else:
+        st.json(sql_result)
+
+def display_diagnostics():
+    tracer = get_tracer()
+    if not tracer.enabled:
+        st.info("Tracing is turned off (TEXTTOSQL_TRACING=0).")
+        return
+
+    trace_ids = set(st.session_state.get('trace_ids', ()))
+    summaries = [summarize_trace(trace) for trace in tracer.recent_traces() if trace[0].trace_id in trace_ids]
+    if not summaries:
+        st.info("Ask a question to see where its time and tokens go.")
+        return
+
+    # Where the time goes, averaged over the questions asked in this session
+    stage_names = ['handle_query', 'get_db_schema', 'texttosql_llm', 'execute_query', 'compact_result', 'generative_llm']
+    stage_rows = []
+    for name in stage_names:
+        timings = [summary['stages'][name] for summary in summaries if name in summary['stages']]
+        if timings:
+            stage_rows.append({'stage': name, 'questions': len(timings),
+                               'avg ms': round(sum(timings) / len(timings) * 1000, 2),
+                               'max ms': round(max(timings) * 1000, 2)})
+    st.subheader("Latency by stage")
+    st.dataframe(stage_rows)
+    st.bar_chart({row['stage']: row['avg ms'] for row in stage_rows})
+
+    st.subheader("Recent questions")
+    st.dataframe([{
+        'question': summary['question'],
+        'database': summary['db'],
+        'status': summary['status'],
+        'total ms': round(summary['seconds'] * 1000, 1),
+        'prompt tokens': summary['prompt_tokens'],
+        'completion tokens': summary['completion_tokens'],
+        'rows': summary['rows'],
+        'bytes': summary['bytes'],
+        'cached SQL': summary['cache_hit'],
+    } for summary in summaries])
+    if tracer.dropped:
+        st.warning(f"{tracer.dropped:,} spans were dropped because the trace writer fell behind.")
 
 def display_query_result(query_input, db_name):
-    with st.spinner("Processing your query..."):
-        result = engine.query(query_input)
-
-        generative_result = result.get('generative_result', 'No generative result found')
-        sql = result.get('sql', 'No SQL found')
-        sql_result = result.get('sql_result', 'No SQL result found')
+    tab1, tab2, tab3 = st.tabs(["Answer", "SQL", "Data"])
+    answer_placeholder = tab1.empty()
+    sql_placeholder = tab2.empty()
+    data_placeholder = tab3.empty()
 
-        tab1, tab2, tab3 = st.tabs(["Answer", "SQL", "Data"])
-
-        with tab1:
-            st.write(generative_result)
-
-        with tab2:
-            st.code(sql, language='sql')
-
-        with tab3:
-            if isinstance(sql_result, list) and len(sql_result) > 0:
-                try:
-                    data = get_table_data(db_name)
-                    if len(data) > 1000:
-                        st.write("Displaying the first 1000 rows of pdw_data (subset of data):")
-                    else:
-                        st.write("Displaying the pdw_data:")
-                    st.dataframe(data)
-                except Exception as e:
-                    st.json(sql_result)
-                    st.error(f"Could not display table data: {str(e)}")
-            else:
-                st.json(sql_result)
+    # Fill each tab as soon as its stage finishes instead of waiting for the whole answer
+    with st.spinner("Processing your query..."):
+        answer, sql_shown = '', False
+        for event in engine.query(query_input, stream=True):
+            if event['event'] == 'sql':
+                sql_placeholder.code(event['sql'], language='sql')
+                sql_shown = True
+            elif event['event'] == 'rows':
+                with data_placeholder.container():
+                    display_sql_result(event['sql_result'])
+            elif event['event'] == 'token':
+                answer += event['text']
+                answer_placeholder.markdown(answer)
+            elif event['event'] == 'done':
+                result = event['result']
+                # The tracer is shared by every session; diagnostics only show this session's own questions
+                st.session_state.setdefault('trace_ids', []).append(event['trace_id'])
+                answer_placeholder.write(result.get('generative_result', 'No generative result found'))
+                if not sql_shown:
+                    sql_placeholder.code(result.get('sql', 'No SQL found'), language='sql')
+                    with data_placeholder.container():
+                        display_sql_result(result.get('sql_result', 'No SQL result found'))
 
 def main():
     global engine
@@ -80,7 +153,7 @@ def main():
     uploaded_files = st.file_uploader(
         "Upload a file or multiple files from a directory",
         accept_multiple_files=True,
-        type=["db", "csv", "json", "xlsx", "tmp"]
+        type=["db", "csv", "json", "jsonl", "xlsx", "tmp"]
     )
 
     db_options = [f for f in os.listdir('.') if f.endswith('.db')]
@@ -89,49 +162,82 @@ def main():
         selected_db = st.selectbox("Choose a database", db_options)
 
         if selected_db:
-            engine = SQLiteEngine(db_name=f'{selected_db}')
+            engine = get_engine(selected_db)
 
-        tab1, tab2 = st.tabs(["View Dataset", "Ask a Question"])
+        tab1, tab2, tab3 = st.tabs(["View Dataset", "Ask a Question", "Diagnostics"])
 
         with tab1:
             st.header("Database Viewer")
-            data = get_table_data(selected_db, table_name=f'{selected_db[:-3]}')
-            st.write("Displaying the first 1000 rows of data (subset of total data):")
-            st.dataframe(data)
+            display_table_viewer(selected_db)
         
         with tab2:
             st.header("Database Chat")
+            # Attaching every database lets one question join tables across them
+            federated = len(db_options) > 1 and st.checkbox("Ask across all databases")
             user_query = st.text_input("Ask a question:", "")
 
             if st.button("Submit"):
                 if user_query:
                     st.write(f'{user_query}')
-                    display_query_result(user_query, selected_db)
+                    if federated:
+                        try:
+                            engine = get_federated_engine(db_options)
+                        except ValueError as e:
+                            # Too many files to attach, or a file name that cannot be used as a schema name
+                            st.error(f"Cannot ask across all databases: {e}")
+                            engine = None
+                    if engine is not None:
+                        display_query_result(user_query, selected_db)
                 else:
                     st.warning("Please enter a question...")
+
+        with tab3:
+            st.header("Diagnostics")
+            display_diagnostics()
     else:
         st.warning("No databases found. Please upload a database file.")
 
     if uploaded_files:
         st.write(f"Uploaded {len(uploaded_files)} file(s):")
+        # Uploads stay in the widget across reruns; only process each one once it has imported successfully
+        processed_uploads = st.session_state.setdefault('processed_uploads', set())
         for uploaded_file in uploaded_files:
+            if uploaded_file.file_id in processed_uploads:
+                continue
             db_name = Path(uploaded_file.name).stem
-            engine = SQLiteEngine(db_name=db_name)
+            engine = get_engine(db_name)
             tmp_dir = Path("uploaded_files")
             tmp_dir.mkdir(exist_ok=True)
             tmp_file_path = tmp_dir / uploaded_file.name
             with open(tmp_file_path, "wb") as f:
                 f.write(uploaded_file.getbuffer())
             
-            if uploaded_file.name.endswith('.csv'):
+            importers = {
+                '.csv': engine.create_tables_from_csv,
+                '.xlsx': engine.create_tables_from_xlsx,
+                '.json': engine.create_tables_from_json,
+                '.jsonl': engine.create_tables_from_json,
+                '.tmp': engine.create_tables_from_tmp,
+            }
+            importer = importers.get(tmp_file_path.suffix.lower())
+            if importer:
                 try:
+                    progress_bar = st.progress(0.0, text=f"Processing {uploaded_file.name}...")
+
+                    def report_progress(rows_loaded, bytes_read, total_bytes, name=uploaded_file.name):
+                        fraction = min(bytes_read / total_bytes, 1.0) if total_bytes else 0.0
+                        progress_bar.progress(fraction, text=f"Processing {name}: {rows_loaded:,} rows loaded...")
+
                     with st.spinner(f"Processing {uploaded_file.name}..."):
-                        engine.create_tables_from_csv(tmp_file_path)
+                        importer(tmp_file_path, progress_callback=report_progress)
+                    processed_uploads.add(uploaded_file.file_id)
+                    progress_bar.empty()
+                    invalidate_engine(db_name)
                     st.success(f"Successfully processed {uploaded_file.name} into database '{db_name}.db'")
                 except Exception as e:
                     st.error(f"Failed to process {uploaded_file.name}: {e}")
             else:
-                st.error("Please upload a CSV file to create tables.")
+                st.error("Please upload a CSV, Excel, JSON or .tmp file to create tables.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,26 @@
+import pytest
+
+from texttosql.sqlite.handlers.database import workload
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # Databases are created in the working directory; keep side files out of the repo and the result cache in memory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('TEXTTOSQL_WORKLOAD_PATH', str(tmp_path / '.texttosql_workload.sqlite'))
+    monkeypatch.setenv('TEXTTOSQL_RESULT_CACHE_PATH', '')
+    monkeypatch.setattr(workload, '_workload_log', None)
+    return tmp_path
+
+
+@pytest.fixture
+def llm_stub(monkeypatch):
+    # The benchmark's local chat-completions stand-in, so LLM calls go through the real client code
+    from benchmarks.stub_openai import StubChatCompletions
+    from texttosql.sqlite.handlers.llm import client
+
+    for name in ('_sources', '_base_url', '_client', '_async_client'):
+        monkeypatch.setattr(client, name, getattr(client, name))
+    with StubChatCompletions() as stub:
+        client.configure_llm(api_key='test', base_url=stub.base_url)
+        yield stub
@@ -0,0 +1,80 @@
+import pytest
+
+from texttosql.sqlite.handlers.database.advisor import IndexAdvisor, tokenize_sql
+from texttosql.sqlite.handlers.database.handler import SQLiteDatabaseHandler
+
+TABLES = {'items': ['id', 'category', 'amount', 'supplier_id'], 'suppliers': ['id', 'name', 'country']}
+
+
+def test_tokenize_sql_classifies_tokens():
+    tokens = tokenize_sql("SELECT \"order id\", [x] FROM t WHERE name = 'it''s' AND n >= 2.5")
+    assert ('identifier', 'order id') in tokens
+    assert ('identifier', 'x') in tokens
+    assert ('keyword', 'where') in tokens
+    assert ('literal', "'it''s'") in tokens
+    assert ('symbol', '>=') in tokens
+    assert tokenize_sql("SELECT a", spans=True)[1] == ('identifier', 'a', 7, 8)
+
+
+def test_equality_columns_lead_and_one_range_column_follows():
+    advisor = IndexAdvisor(TABLES, {})
+    sql = "SELECT * FROM items WHERE amount > 5 AND category = 'tools' AND 3 < id"
+    assert advisor.candidates(sql, ['SCAN items']) == [('items', ('category', 'amount'), 'filtered or joined')]
+    # Tables the plan already searches with an index are left alone
+    assert advisor.candidates(sql, ['SEARCH items USING INDEX idx (category=?)']) == []
+
+
+def test_join_keys_and_aliases_resolve_to_tables():
+    advisor = IndexAdvisor(TABLES, {})
+    sql = "SELECT s.name FROM items AS i JOIN suppliers s ON s.id = i.supplier_id WHERE s.country = 'NL'"
+    assert advisor.candidates(sql, ['SCAN i', 'SCAN s']) == [
+        ('items', ('supplier_id',), 'filtered or joined'),
+        ('suppliers', ('country',), 'filtered or joined'),
+    ]
+
+
+def test_grouping_is_only_suggested_when_sorted_in_a_temp_b_tree():
+    advisor = IndexAdvisor(TABLES, {})
+    sql = "SELECT category, SUM(amount) FROM items GROUP BY category"
+    assert advisor.candidates(sql, ['SCAN items']) == []
+    assert advisor.candidates(sql, ['SCAN items', 'USE TEMP B-TREE FOR GROUP BY']) == [
+        ('items', ('category',), 'grouped or sorted'),
+    ]
+
+
+def test_recommendations_merge_prefixes_and_skip_covered_columns():
+    entries = [
+        {'sql': "SELECT * FROM items WHERE category = 'a'", 'plan': ['SCAN items'], 'seconds': 0.5},
+        {'sql': "SELECT * FROM items WHERE category = 'a' AND amount < 3", 'plan': ['SCAN items'], 'seconds': 1.0},
+        {'sql': "SELECT * FROM suppliers WHERE country = 'NL'", 'plan': ['SCAN suppliers'], 'seconds': 2.0},
+    ]
+    [recommendation] = IndexAdvisor(TABLES, {'suppliers': [['country', 'name']]}).recommend(entries)
+    assert recommendation['name'] == 'idx_items_category_amount'
+    assert recommendation['queries'] == 2
+    assert recommendation['total_seconds'] == 1.5
+    assert len(recommendation['sql']) == 2
+    assert IndexAdvisor(TABLES, {}).recommend(entries, min_queries=2) == [recommendation]
+
+
+def test_recommended_indexes_are_applied_from_the_workload(workdir):
+    handler = SQLiteDatabaseHandler('advisor')
+    handler.result_cache_enabled = False
+    with handler._connection_pool.writer() as conn:
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, category TEXT, amount REAL);")
+        conn.executemany("INSERT INTO items (category, amount) VALUES (?, ?);",
+                         [(f"c{i % 50}", i) for i in range(2000)])
+        conn.commit()
+
+    handler.execute_query_result("SELECT * FROM items WHERE category = 'c7'")
+    handler.execute_query_result("SELECT * FROM items WHERE id = 7")
+    [recommendation] = handler.recommend_indexes()
+    assert (recommendation['table'], recommendation['columns']) == ('items', ['category'])
+
+    [report] = handler.apply_index_recommendations(repeat=1)
+    assert report['index'] == 'idx_items_category'
+    assert [replay['sql'] for replay in report['replays']] == ["SELECT * FROM items WHERE category = 'c7'"]
+    with handler._connection_pool.writer() as conn:
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN SELECT * FROM items WHERE category = 'c7'")]
+    assert any('idx_items_category' in detail for detail in plan)
+    assert handler.recommend_indexes() == []
+    assert handler.execute_query_result("SELECT COUNT(*) AS n FROM items WHERE category = 'c7'").to_records() == [{'n': 40}]
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from openai import RateLimitError
+
+from texttosql.sqlite import SQLiteEngine
+from texttosql.sqlite.handlers.llm import handler as llm_handler
+
+QUESTIONS = {
+    "How many items?": "SELECT COUNT(*) AS n FROM items;",
+    "What is the total?": "SELECT SUM(amount) AS total FROM items;",
+    "Which is the largest?": "SELECT name FROM items ORDER BY amount DESC LIMIT 1;",
+}
+
+
+@pytest.fixture
+def engine(workdir, llm_stub, monkeypatch):
+    # Semaphores are created per event loop from the first handler's setting; start from none
+    monkeypatch.setattr(llm_handler, '_llm_semaphores', type(llm_handler._llm_semaphores)())
+    llm_stub.canned_sql.update(QUESTIONS)
+    engine = SQLiteEngine('async')
+    engine.texttosql_cache_enabled = False
+    engine.result_cache_enabled = False
+    engine.workload_log_enabled = False
+    with engine._connection_pool.writer() as conn:
+        conn.execute("CREATE TABLE items (name TEXT, amount REAL);")
+        conn.executemany("INSERT INTO items VALUES (?, ?);", [('bolt', 1.5), ('nut', 2.5), ('gear', 4.0)])
+        conn.commit()
+    return engine
+
+
+def test_aquery_matches_query(engine, llm_stub):
+    question = "What is the total?"
+    expected = engine.query(question)
+    result = asyncio.run(engine.aquery(question))
+    assert result['sql'] == QUESTIONS[question]
+    assert result['sql_result'].to_records() == expected['sql_result'].to_records() == [{'total': 8.0}]
+    assert result['generative_result'] == expected['generative_result'] == llm_stub.answer
+
+
+def test_aquery_many_keeps_question_order(engine):
+    questions = list(QUESTIONS)
+    results = asyncio.run(engine.aquery_many(questions))
+    assert [result['sql'] for result in results] == [QUESTIONS[question] for question in questions]
+    assert results[0]['sql_result'].to_records() == [{'n': 3}]
+    assert results[2]['sql_result'].to_records() == [{'name': 'gear'}]
+
+
+def test_aquery_many_bounds_requests_in_flight(engine, llm_stub, monkeypatch):
+    engine.llm_max_concurrency = 2
+    lock, in_flight, peak = threading.Lock(), [0], [0]
+
+    def slow_request():
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.05)
+        with lock:
+            in_flight[0] -= 1
+
+    monkeypatch.setattr(llm_stub, '_sleep', slow_request)
+    results = asyncio.run(engine.aquery_many(list(QUESTIONS) * 2))
+    assert len(results) == 6
+    assert llm_stub.requests == 12
+    assert peak[0] == 2
+
+
+def test_rate_limited_calls_give_up_after_the_retry_budget(engine, llm_stub):
+    llm_stub.rate_limit_rate = 1.0
+    engine.llm_rate_limit_retries = 1
+    engine.llm_backoff_base_seconds = 0.01
+    results = asyncio.run(engine.aquery_many(list(QUESTIONS)[:2], return_exceptions=True))
+    assert all(isinstance(result, RateLimitError) for result in results)
+    assert llm_stub.rate_limited == 4
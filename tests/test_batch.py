@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+import pytest
+
+from texttosql.sqlite import batch
+from texttosql.sqlite.batch import SQLiteBatchStore, read_questions, run_batch
+from texttosql.sqlite.handlers.llm.ratelimit import AsyncRateLimiter
+
+
+class FakeEngine:
+    # Stands in for a registry engine: class-level defaults, answers without an LLM
+    llm_rate_limiter = None
+    llm_max_concurrency = 8
+    llm_rate_limit_retries = 3
+
+    def __init__(self):
+        self.asked = []
+
+    async def aquery(self, question):
+        self.asked.append((question, self.llm_rate_limiter, self.llm_max_concurrency))
+        if 'fail' in question:
+            raise RuntimeError("model unavailable")
+        return {'sql': 'SELECT 1', 'sql_result': [{'1': 1}], 'generative_result': f"answer to {question}"}
+
+
+@pytest.fixture
+def engines(monkeypatch):
+    engines = {}
+    monkeypatch.setattr(batch, 'get_engine', lambda db: engines.setdefault(db, FakeEngine()))
+    return engines
+
+
+@pytest.fixture
+def questions(workdir):
+    path = workdir / 'questions.jsonl'
+    path.write_text('\n'.join(json.dumps(record) for record in [
+        {'id': 'q1', 'question': 'total budget'},
+        {'question': 'programs at risk'},
+        {'id': 'q3', 'question': 'fail please'},
+    ]) + '\n')
+    return str(path)
+
+
+def test_batch_settings_do_not_leak_into_shared_engines(engines, questions, workdir):
+    limiter = AsyncRateLimiter(requests_per_minute=600)
+    store = SQLiteBatchStore(str(workdir / 'batch.sqlite'))
+    asyncio.run(run_batch(read_questions(questions, ['budget']), store, 'run', concurrency=2, limiter=limiter,
+                          rate_limit_retries=7))
+
+    shared = engines['budget']
+    # The batch's copy asked the questions with the batch settings...
+    assert {(limiter_used, concurrency) for _, limiter_used, concurrency in shared.asked} == {(limiter, 2)}
+    # ...while the engine the registry hands to interactive callers is untouched
+    assert (shared.llm_rate_limiter, shared.llm_max_concurrency, shared.llm_rate_limit_retries) == (None, 8, 3)
+    assert 'llm_rate_limiter' not in vars(shared)
+
+
+def test_rerunning_a_batch_resumes_from_its_checkpoint(engines, questions, workdir):
+    store = SQLiteBatchStore(str(workdir / 'batch.sqlite'))
+    tasks = read_questions(questions, ['budget', 'risks'])
+    assert asyncio.run(run_batch(tasks, store, 'run')) == {'ok': 4, 'error': 2}
+    asked = sum(len(engine.asked) for engine in engines.values())
+
+    assert asyncio.run(run_batch(tasks, store, 'run')) == {'ok': 4, 'error': 2}
+    assert sum(len(engine.asked) for engine in engines.values()) == asked
+
+    # Only the failed questions are asked again when retrying
+    asyncio.run(run_batch(tasks, store, 'run', retry_failed=True))
+    assert sum(len(engine.asked) for engine in engines.values()) == asked + 2
+    errors = [result for result in store.results('run') if result['status'] == 'error']
+    assert {result['attempts'] for result in errors} == {2}
+    assert all('model unavailable' in result['error'] for result in errors)
@@ -0,0 +1,98 @@
+import struct
+
+import numpy as np
+import pytest
+
+from texttosql.sqlite.handlers.database.bluefile import BlueFileReader
+from texttosql.sqlite.handlers.database.handler import SQLiteDatabaseHandler
+
+
+def write_blue(path, data, blue_type=1000, blue_format='SD', frame=None, subrecords=(), record_length=None,
+               representation=b'EEEI', data_size=None):
+    # A minimal header control block: fixed fields, then the type 2000/3000 adjunct
+    order = '<' if representation == b'EEEI' else '>'
+    header = bytearray(512)
+    header[0:12] = b'BLUE' + representation + representation
+    struct.pack_into(f'{order}ddi2s', header, 32, 512.0, float(len(data) if data_size is None else data_size),
+                     blue_type, blue_format.encode('ascii'))
+    if frame is not None:
+        struct.pack_into(f'{order}i', header, 256 + 20, frame)
+    if subrecords:
+        struct.pack_into(f'{order}i', header, 256 + 20, len(subrecords))
+        struct.pack_into(f'{order}i', header, 256 + 44, record_length)
+        for index, (name, subrecord_format, offset) in enumerate(subrecords):
+            struct.pack_into(f'{order}4s2sh', header, 256 + 48 + index * 8, name.encode('ascii'),
+                             subrecord_format.encode('ascii'), offset)
+    path.write_bytes(bytes(header) + data)
+    return path
+
+
+def fetch(handler, sql):
+    with handler._connection_pool.writer() as conn:
+        return conn.execute(sql).fetchall()
+
+
+def test_scalar_and_complex_type_1000_files(tmp_path):
+    reader = BlueFileReader(write_blue(tmp_path / 'a.tmp', np.array([1.5, -2.0, 3.25], '<f8').tobytes()))
+    assert (reader.columns, reader.types, reader.row_count) == (['value'], ['REAL'], 3)
+    assert list(reader.rows()) == [(1.5,), (-2.0,), (3.25,)]
+
+    reader = BlueFileReader(write_blue(tmp_path / 'c.tmp', np.array([1, 2, 3, 4], '<f4').tobytes(), blue_format='CF'))
+    assert reader.columns == ['value_real', 'value_imag']
+    assert list(reader.rows(chunk_size=1)) == [(1.0, 2.0), (3.0, 4.0)]
+
+
+def test_type_2000_frames_become_columns(tmp_path):
+    reader = BlueFileReader(write_blue(tmp_path / 'f.tmp', np.arange(6, dtype='<i4').tobytes(),
+                                       blue_type=2000, blue_format='SL', frame=3))
+    assert reader.columns == ['value_0', 'value_1', 'value_2']
+    assert list(reader.rows()) == [(0, 1, 2), (3, 4, 5)]
+
+
+def test_type_3000_subrecords_in_big_endian(tmp_path):
+    records = np.array([(100.0, 0.5, b'pulse'), (200.0, 0.25, b'cw')],
+                       dtype=[('freq', '>f8'), ('amp', '>f4'), ('kind', 'S8')])
+    path = write_blue(tmp_path / 'p.tmp', records.tobytes(), blue_type=3000, blue_format='NH', representation=b'IEEE',
+                      subrecords=[('FREQ', 'SD', 0), ('AMP', 'SF', 8), ('KIND', 'SA', 12)], record_length=20)
+    reader = BlueFileReader(path)
+    assert reader.columns == ['freq', 'amp', 'kind']
+    assert reader.types == ['REAL', 'REAL', 'TEXT']
+    assert list(reader.rows()) == [(100.0, 0.5, 'pulse'), (200.0, 0.25, 'cw')]
+
+
+def test_rows_stop_at_the_end_of_a_truncated_file(tmp_path):
+    data = np.array([1.0, 2.0], '<f8').tobytes() + b'\x00\x00'
+    reader = BlueFileReader(write_blue(tmp_path / 't.tmp', data, data_size=800))
+    assert reader.row_count == 2
+    assert reader.total_bytes == 16
+
+
+def test_unreadable_files_are_rejected(tmp_path):
+    not_blue = tmp_path / 'x.tmp'
+    not_blue.write_bytes(b'\x00' * 600)
+    with pytest.raises(ValueError, match="not a BLUE file"):
+        BlueFileReader(not_blue)
+    with pytest.raises(ValueError, match="type 6000"):
+        BlueFileReader(write_blue(tmp_path / 'y.tmp', b'', blue_type=6000))
+    with pytest.raises(ValueError, match="Unsupported BLUE data format"):
+        BlueFileReader(write_blue(tmp_path / 'z.tmp', b'', blue_format='SZ'))
+
+
+def test_tmp_files_load_into_one_table(workdir):
+    handler = SQLiteDatabaseHandler('signals')
+    handler.ingest_chunk_size = 2
+    drops = workdir / 'drops'
+    drops.mkdir()
+    write_blue(drops / '1.tmp', np.array([1.0, 2.0, 3.0], '<f8').tobytes())
+    write_blue(drops / '2.tmp', np.array([4.0, 5.0], '<f8').tobytes())
+    progress = []
+
+    reports = handler.create_tables_from_tmp(drops, progress_callback=lambda *args: progress.append(args))
+    assert [(report['table'], report['rows']) for report in reports] == [('pdw_data', 3), ('pdw_data', 2)]
+    assert fetch(handler, "SELECT value FROM pdw_data ORDER BY rowid;") == [(1.0,), (2.0,), (3.0,), (4.0,), (5.0,)]
+    assert progress[-1] == (2, 16, 16)
+
+    write_blue(workdir / 'other.tmp', np.array([1, 2], '<f4').tobytes(), blue_format='CF')
+    with pytest.raises(ValueError, match="do not match the columns"):
+        handler.create_tables_from_tmp(workdir / 'other.tmp')
+    assert fetch(handler, "SELECT COUNT(*) FROM pdw_data;") == [(5,)]
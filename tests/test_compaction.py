@@ -0,0 +1,17 @@
+from texttosql.sqlite.handlers.database.result import SQLiteQueryResult
+from texttosql.sqlite.handlers.llm.compaction import summarize_result
+
+
+def rows(count):
+    return [(f'item{i}', i) for i in range(count)]
+
+
+def test_summary_of_a_complete_result_states_its_row_count():
+    summary = summarize_result(SQLiteQueryResult.from_rows(['name', 'amount'], rows(100)))
+    assert summary['note'].startswith("The result has 100 rows,")
+
+
+def test_summary_of_a_capped_result_states_a_lower_bound():
+    summary = summarize_result(SQLiteQueryResult.from_rows(['name', 'amount'], rows(100), truncated=True))
+    assert "at least 100 rows" in summary['note']
+    assert summary['truncated']
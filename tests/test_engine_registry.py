@@ -0,0 +1,37 @@
+import threading
+
+from texttosql.sqlite import get_engine, get_federated_engine, invalidate_engine
+
+
+def test_engines_are_reused_across_calls(workdir):
+    engine = get_engine('registry')
+    # Names resolve the way the handler does, to '<stem>.db' in the working directory
+    assert get_engine('registry.db') is engine
+    assert get_engine(str(workdir / 'registry.db')) is engine
+    assert get_engine('other') is not engine
+
+
+def test_invalidated_engine_is_rebuilt(workdir):
+    engine = get_engine('registry')
+    invalidate_engine('registry.db')
+    rebuilt = get_engine('registry')
+    assert rebuilt is not engine
+    assert get_engine('registry') is rebuilt
+
+
+def test_concurrent_callers_share_one_engine(workdir):
+    engines = []
+    threads = [threading.Thread(target=lambda: engines.append(get_engine('concurrent'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(engine) for engine in engines}) == 1
+
+
+def test_federated_engines_are_keyed_on_their_members(workdir):
+    get_engine('first')
+    get_engine('second')
+    engine = get_federated_engine(['first.db', 'second.db'])
+    assert get_federated_engine(['second', 'first']) is engine
+    assert engine is not get_engine('first')
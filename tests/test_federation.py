@@ -0,0 +1,66 @@
+import sqlite3
+
+import pytest
+
+from texttosql.sqlite.handlers.database.federation import SQLiteFederatedDatabaseHandler
+
+
+def make_database(path, table, rows):
+    conn = sqlite3.connect(path)
+    conn.execute(f"CREATE TABLE {table} (program TEXT, amount INTEGER);")
+    conn.executemany(f"INSERT INTO {table} VALUES (?, ?);", rows)
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def members(workdir):
+    make_database(workdir / 'budget.db', 'budget', [('A', 10), ('B', 20)])
+    make_database(workdir / 'risks.db', 'risks', [('A', 1), ('A', 2), ('C', 3)])
+    return ['budget.db', 'risks.db']
+
+
+def test_members_are_attached_under_their_file_names(members):
+    handler = SQLiteFederatedDatabaseHandler(members)
+    handler.result_cache_enabled = False
+    assert sorted(handler.get_db_schema()) == ['budget.budget', 'risks.risks']
+
+    result = handler.execute_query_result(
+        "SELECT b.program, b.amount, COUNT(r.amount) AS risks FROM budget.budget b "
+        "LEFT JOIN risks.risks r ON r.program = b.program GROUP BY b.program ORDER BY b.program"
+    )
+    assert result.data['program'].tolist() == ['A', 'B']
+    assert result.data['risks'].tolist() == [2, 0]
+
+
+def test_generated_sql_cannot_attach_more_files(members):
+    handler = SQLiteFederatedDatabaseHandler(members)
+    assert handler.execute_query_result("ATTACH DATABASE 'other.db' AS other") is None
+
+
+def test_members_are_read_only(members):
+    handler = SQLiteFederatedDatabaseHandler(members)
+    assert handler.execute_query_result("DELETE FROM budget.budget") is None
+    with pytest.raises(ValueError):
+        handler._connection_pool.writer()
+    assert sqlite3.connect('budget.db').execute("SELECT COUNT(*) FROM budget").fetchone() == (2,)
+
+
+@pytest.mark.parametrize('file_name', ['my data.db', 'main.db', '2024.db'])
+def test_file_names_that_are_not_usable_schema_names_are_rejected(members, workdir, file_name):
+    make_database(workdir / file_name, 'items', [('A', 1)])
+    with pytest.raises(ValueError, match='cannot be used as an attached database name'):
+        SQLiteFederatedDatabaseHandler([*members, file_name])
+
+
+def test_more_members_than_sqlite_can_attach_are_rejected(workdir):
+    names = [f'db{i}.db' for i in range(11)]
+    for name in names:
+        make_database(workdir / name, 'items', [('A', 1)])
+    with pytest.raises(ValueError, match='At most 10 databases'):
+        SQLiteFederatedDatabaseHandler(names)
+
+
+def test_missing_members_are_rejected(members):
+    with pytest.raises(ValueError, match='does not exist'):
+        SQLiteFederatedDatabaseHandler([*members, 'missing.db'])
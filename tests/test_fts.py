@@ -0,0 +1,61 @@
+import pytest
+
+from texttosql.sqlite.handlers.database.handler import SQLiteDatabaseHandler
+
+QUERY = "SELECT id, name FROM items WHERE LOWER(name) LIKE '%widget%' ORDER BY id"
+
+
+def write_items(path, ids):
+    # Every other item is a widget, so the expected rows are easy to tell apart
+    lines = ["id,name"] + [f"{i},{'Blue Widget' if i % 2 else 'gadget'} {i}" for i in ids]
+    path.write_text("\n".join(lines) + "\n")
+
+
+def rows(handler, sql):
+    result = handler.execute_query_result(sql)
+    assert result is not None
+    return list(zip(*(result.data[name].tolist() for name in result.columns)))
+
+
+def search(handler, sql=QUERY):
+    # The same statement with and without the trigram rewrite
+    handler.fts_rewrite_enabled = True
+    rewritten = rows(handler, sql)
+    handler.fts_rewrite_enabled = False
+    plain = rows(handler, sql)
+    handler.fts_rewrite_enabled = True
+    return rewritten, plain
+
+
+@pytest.fixture
+def handler(workdir):
+    handler = SQLiteDatabaseHandler('fts')
+    handler.result_cache_enabled = False
+    handler.workload_log_enabled = False
+    write_items(workdir / 'items.csv', range(100, 80, -1))
+    handler.create_tables_from_csv(workdir / 'items.csv')
+    handler.create_fts_index('items', ['name'])
+    return handler
+
+
+def test_like_rewrite_returns_the_rows_of_the_plain_query(handler):
+    assert 'items__fts' in handler.rewrite_text_search(QUERY)
+    rewritten, plain = search(handler)
+    assert rewritten == plain
+    assert len(plain) == 10
+
+
+def test_index_follows_an_append_without_the_ingest_setting(handler, workdir):
+    assert not handler.fts_index_enabled
+    write_items(workdir / 'items.csv', range(200, 180, -1))
+    handler.create_tables_from_csv(workdir / 'items.csv', append=True)
+    rewritten, plain = search(handler)
+    assert rewritten == plain
+    assert len(plain) == 20
+
+
+def test_index_follows_rowids_renumbered_by_a_primary_key_migration(handler):
+    handler.update_primary_key('items', 'id')
+    rewritten, plain = search(handler)
+    assert rewritten == plain
+    assert len(plain) == 10
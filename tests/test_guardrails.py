@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from texttosql.sqlite.handlers.database.handler import SQLiteDatabaseHandler
+
+ENDLESS_COUNT = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT COUNT(*) FROM c"
+
+
+@pytest.fixture
+def handler(workdir):
+    handler = SQLiteDatabaseHandler('guarded')
+    handler.result_cache_enabled = False
+    handler.workload_log_enabled = False
+    with handler._connection_pool.writer() as conn:
+        conn.execute("CREATE TABLE items (name TEXT, amount INTEGER);")
+        conn.executemany("INSERT INTO items VALUES (?, ?);", [(f"item{i}", i) for i in range(100)])
+        conn.commit()
+    return handler
+
+
+def test_time_budget_interrupts_a_runaway_query(handler):
+    handler.query_progress_interval = 1000
+    started = time.perf_counter()
+    result = handler.execute_query_result(ENDLESS_COUNT, timeout=0.05)
+    assert time.perf_counter() - started < 5
+    assert result.status == 'timed_out'
+    assert result.row_count == 0
+
+    # The guards come off afterwards, so the same reader runs the next statement normally
+    assert handler.execute_query_result("SELECT COUNT(*) AS n FROM items").to_records() == [{'n': 100}]
+
+
+def test_vm_step_budget_keeps_the_rows_fetched_so_far(handler):
+    handler.query_progress_interval = 1000
+    handler.result_batch_size = 10
+    sql = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT x FROM c"
+    result = handler.execute_query_result(sql, max_rows=10_000_000, max_vm_steps=50_000, timeout=0)
+    assert result.status == 'timed_out'
+    assert 0 < result.row_count < 50_000
+    assert result.rows()[:3] == [(1,), (2,), (3,)]
+
+
+def test_row_and_byte_caps_truncate_the_result(handler):
+    result = handler.execute_query_result("SELECT name FROM items ORDER BY amount", max_rows=5)
+    assert (result.status, result.row_count) == ('truncated', 5)
+    assert result.rows()[-1] == ('item4',)
+
+    result = handler.execute_query_result("SELECT name FROM items ORDER BY amount", max_bytes=25)
+    # 'item0'..'item4' are five bytes each
+    assert (result.status, result.row_count) == ('truncated', 5)
+
+    result = handler.execute_query_result("SELECT name FROM items", max_rows=100)
+    assert (result.status, result.row_count) == ('ok', 100)
+
+
+def test_generated_sql_cannot_attach_change_settings_or_write(handler, workdir):
+    assert handler.execute_query_result(f"ATTACH DATABASE '{workdir / 'other.db'}' AS other") is None
+    assert not (workdir / 'other.db').exists()
+    assert handler.execute_query_result("PRAGMA journal_mode = DELETE") is None
+    assert handler.execute_query_result("PRAGMA query_only = 0") is None
+    assert handler.execute_query_result("DELETE FROM items") is None
+    assert handler.execute_query_result("DROP TABLE items") is None
+
+    # Introspection still works, and nothing was changed
+    columns = handler.execute_query_result("PRAGMA table_info(items)").to_records()
+    assert [column['name'] for column in columns] == ['name', 'amount']
+    assert handler.execute_query_result("SELECT COUNT(*) AS n FROM items").to_records() == [{'n': 100}]
+    with handler._connection_pool.writer() as conn:
+        assert conn.execute("PRAGMA journal_mode;").fetchone()[0] == 'wal'
@@ -0,0 +1,146 @@
+import threading
+
+import pytest
+
+from texttosql.sqlite.handlers.database.handler import SQLiteDatabaseHandler
+
+
+def write_csv(path, rows, bad_row=None):
+    lines = [b"name,amount"] + [f"item{i},{i}".encode() for i in range(rows)]
+    if bad_row is not None:
+        lines[bad_row] = b"bad\xff,1"
+    path.write_bytes(b"\n".join(lines) + b"\n")
+
+
+def table_names(handler):
+    with handler._connection_pool.writer() as conn:
+        return [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table';")]
+
+
+def test_failed_csv_import_leaves_no_table_and_can_be_retried(workdir):
+    handler = SQLiteDatabaseHandler('ingest')
+    handler.ingest_chunk_size = 100
+    csv_file = workdir / 'bad.csv'
+    write_csv(csv_file, 2000, bad_row=1500)
+
+    with pytest.raises(UnicodeDecodeError):
+        handler.create_tables_from_csv(csv_file)
+    assert 'bad' not in table_names(handler)
+
+    write_csv(csv_file, 2000)
+    [report] = handler.create_tables_from_csv(csv_file)
+    assert not report['skipped']
+    assert report['rows'] == 2000
+
+
+def test_failed_csv_append_keeps_only_the_original_rows(workdir):
+    handler = SQLiteDatabaseHandler('ingest')
+    handler.ingest_chunk_size = 100
+    csv_file = workdir / 'items.csv'
+    write_csv(csv_file, 10)
+    handler.create_tables_from_csv(csv_file)
+
+    write_csv(csv_file, 2000, bad_row=1500)
+    with pytest.raises(UnicodeDecodeError):
+        handler.create_tables_from_csv(csv_file, append=True)
+    assert handler.count_rows('items') == 10
+
+
+def test_multi_sheet_workbooks_with_the_same_sheet_titles_do_not_collide(workdir):
+    openpyxl = pytest.importorskip('openpyxl')
+    (workdir / 'books').mkdir()
+    for name in ('sales', 'costs'):
+        workbook = openpyxl.Workbook()
+        workbook.active.title = 'Sheet1'
+        workbook.create_sheet('Sheet2')
+        for sheet in workbook.worksheets:
+            sheet.append(['name', 'amount'])
+            sheet.append([name, 1])
+        workbook.save(workdir / 'books' / f'{name}.xlsx')
+
+    handler = SQLiteDatabaseHandler('ingest')
+    reports = handler.create_tables_from_xlsx(workdir / 'books')
+    assert not any(report['skipped'] for report in reports)
+    assert {'sales_sheet1', 'sales_sheet2', 'costs_sheet1', 'costs_sheet2'} <= set(table_names(handler))
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_a_bad_file_in_a_directory_fails_the_same_way_serially_and_in_parallel(workdir, workers):
+    handler = SQLiteDatabaseHandler('ingest')
+    handler.ingest_chunk_size = 100
+    (workdir / 'files').mkdir()
+    write_csv(workdir / 'files' / 'good.csv', 500)
+    write_csv(workdir / 'files' / 'bad.csv', 500, bad_row=300)
+    write_csv(workdir / 'files' / 'more.csv', 500)
+
+    with pytest.raises(ValueError, match=r"Failed to import 1 of 3 file\(s\): '.*bad\.csv' \(UnicodeDecodeError"):
+        handler.create_tables_from_csv(workdir / 'files', workers=workers)
+    assert sorted(table_names(handler)) == ['good', 'more']
+    assert handler.count_rows('good') == handler.count_rows('more') == 500
+
+
+def test_a_failing_writer_stops_the_parallel_workers(workdir):
+    handler = SQLiteDatabaseHandler('ingest')
+    # Small chunks fill the bounded queue long before the workers are done
+    handler.ingest_chunk_size = 10
+    (workdir / 'files').mkdir()
+    for name in ('first', 'second'):
+        write_csv(workdir / 'files' / f'{name}.csv', 5000)
+
+    def fail_on_progress(rows_loaded, bytes_read, total_bytes):
+        raise RuntimeError("progress display went away")
+
+    outcome = []
+
+    def run():
+        try:
+            handler.create_tables_from_csv(workdir / 'files', workers=2, progress_callback=fail_on_progress)
+        except RuntimeError as e:
+            outcome.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=60)
+    assert not thread.is_alive(), "the import hung after the writer failed"
+    assert outcome and 'progress display went away' in str(outcome[0])
+    assert table_names(handler) == []
+
+
+def test_failed_append_to_an_integer_primary_key_table_keeps_only_the_original_rows(workdir):
+    handler = SQLiteDatabaseHandler('ingest')
+    handler.ingest_chunk_size = 100
+    handler.ingest_rows_per_transaction = 200
+    csv_file = workdir / 'items.csv'
+    write_csv(csv_file, 10)
+    handler.create_tables_from_csv(csv_file)
+    with handler._connection_pool.writer() as conn:
+        conn.execute("UPDATE items SET amount = amount + 5000;")
+    handler.update_primary_key('items', 'amount')
+
+    # The appended keys sort below the existing ones, so their rowids do too
+    write_csv(csv_file, 2000, bad_row=1500)
+    with pytest.raises(UnicodeDecodeError):
+        handler.create_tables_from_csv(csv_file, append=True)
+    assert handler.count_rows('items') == 10
+
+
+def test_workbook_progress_moves_towards_its_total(workdir):
+    openpyxl = pytest.importorskip('openpyxl')
+    workbook = openpyxl.Workbook()
+    workbook.active.title = 'first'
+    workbook.create_sheet('second')
+    for sheet, rows in zip(workbook.worksheets, (250, 150)):
+        sheet.append(['name', 'amount'])
+        for i in range(rows):
+            sheet.append([f'item{i}', i])
+    workbook.save(workdir / 'book.xlsx')
+
+    handler = SQLiteDatabaseHandler('ingest')
+    handler.ingest_chunk_size = 100
+    calls = []
+    handler.create_tables_from_xlsx(workdir / 'book.xlsx', progress_callback=lambda *call: calls.append(call))
+
+    fractions = [done / total for _, done, total in calls]
+    assert all(total == 402 for _, _, total in calls)
+    assert fractions == sorted(fractions) and 0 < fractions[0] < 1 and fractions[-1] == 1
+    assert calls[-1][0] == 400
@@ -0,0 +1,25 @@
+import pytest
+
+from texttosql.sqlite.handlers.llm.cache import SQLiteLLMCache, normalize_question
+
+
+@pytest.mark.parametrize('first, second', [
+    ("Which programs have budget > 1000000?", "Which programs have budget < 1000000?"),
+    ("Which programs have budget >= 1000000?", "Which programs have budget = 1000000?"),
+    ("Show items with a balance of -500", "Show items with a balance of 500"),
+    ("Projects with risk score above 1.5", "Projects with risk score above 15"),
+])
+def test_questions_that_differ_in_operators_or_numbers_do_not_collide(first, second):
+    assert normalize_question(first) != normalize_question(second)
+
+
+def test_phrasing_differences_share_a_key():
+    assert normalize_question("Can you show me the total budget for 2024?") == \
+        normalize_question("total budget for 2024")
+
+
+def test_comparison_questions_are_cached_separately(tmp_path):
+    cache = SQLiteLLMCache(path=str(tmp_path / 'cache.sqlite'))
+    cache.put("Which programs have budget > 1000000?", 'schema', {'sql': 'SELECT ... WHERE budget > 1000000'})
+    assert cache.get("Which programs have budget < 1000000?", 'schema') is None
+    assert cache.get("which programs have budget > 1000000", 'schema') == {'sql': 'SELECT ... WHERE budget > 1000000'}
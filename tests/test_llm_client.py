@@ -0,0 +1,74 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from texttosql.sqlite.handlers.llm import client
+from texttosql.sqlite.handlers.llm.client import (EnvCredentialSource, StaticCredentialSource,
+                                                  StreamlitSecretsCredentialSource, configure_llm, resolve_api_key)
+
+HEAVY_MODULES = ['openai', 'streamlit', 'dotenv', 'tiktoken', 'httpx', 'pandas']
+
+
+@pytest.fixture(autouse=True)
+def client_state(monkeypatch):
+    # Every test starts without sources or clients, and never reads a real .env file
+    monkeypatch.setattr(client, '_sources', None)
+    monkeypatch.setattr(client, '_base_url', None)
+    monkeypatch.setattr(client, '_client', None)
+    monkeypatch.setattr(client, '_async_client', None)
+    monkeypatch.setattr(client, '_dotenv_loaded', True)
+
+
+def test_importing_and_creating_an_engine_skips_heavy_modules(workdir):
+    script = (
+        "import sys, texttosql.sqlite\n"
+        "texttosql.sqlite.SQLiteEngine('cold').get_db_schema_prompt()\n"
+        f"print('loaded:', [name for name in {HEAVY_MODULES!r} if name in sys.modules])\n"
+    )
+    # A fresh interpreter, since this one has long since imported everything
+    env = dict(os.environ, PYTHONPATH=str(Path(__file__).resolve().parents[1]))
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, env=env, check=True)
+    assert output.stdout.splitlines()[-1] == 'loaded: []'
+
+
+def test_sources_are_tried_in_order(monkeypatch):
+    monkeypatch.setenv('TEST_OPENAI_KEY', 'from-env')
+    configure_llm(sources=[lambda: None, EnvCredentialSource('TEST_OPENAI_KEY', load_dotenv=False),
+                           StaticCredentialSource('static')])
+    assert resolve_api_key() == 'from-env'
+
+    monkeypatch.delenv('TEST_OPENAI_KEY')
+    assert resolve_api_key() == 'static'
+
+
+def test_missing_key_names_the_sources_tried():
+    configure_llm(sources=[EnvCredentialSource('TEST_MISSING_KEY', load_dotenv=False), StaticCredentialSource('')])
+    with pytest.raises(ValueError, match=r"EnvCredentialSource\('TEST_MISSING_KEY'\), StaticCredentialSource\(\*\*\*\)"):
+        resolve_api_key()
+
+
+def test_default_sources_depend_on_development_mode(monkeypatch):
+    monkeypatch.setenv('DEVELOPMENT_MODE', '1')
+    assert [type(source) for source in client.default_credential_sources()] == [EnvCredentialSource]
+    monkeypatch.delenv('DEVELOPMENT_MODE')
+    assert [type(source) for source in client.default_credential_sources()] == [
+        StreamlitSecretsCredentialSource, EnvCredentialSource,
+    ]
+
+
+def test_configure_llm_drops_clients_already_built():
+    configure_llm(api_key='first', base_url='http://127.0.0.1:9/v1')
+    first = client.get_client()
+    assert client.get_client() is first
+    assert first.api_key == 'first'
+
+    configure_llm(api_key='second')
+    second = client.get_client()
+    assert second is not first
+    assert second.api_key == 'second'
+    # The base URL is kept unless it is given again
+    assert str(second.base_url).startswith('http://127.0.0.1:9/v1')
+    assert client.get_async_client().api_key == 'second'
@@ -0,0 +1,77 @@
+import sqlite3
+
+import pytest
+
+from texttosql.sqlite.handlers.database.handler import SQLiteDatabaseHandler
+
+ROLLUP_CHECK = ("SELECT program, COUNT(*), SUM(amount) FROM items GROUP BY program ORDER BY program",
+                "SELECT program, row_count, sum_amount FROM items__rollup_program ORDER BY program")
+
+
+def write_items(path, ids):
+    lines = ["id,name,program,amount"] + [f"{i},item {i},{'ABC'[i % 3]},{i * 10}" for i in ids]
+    path.write_text("\n".join(lines) + "\n")
+
+
+@pytest.fixture
+def handler(workdir):
+    handler = SQLiteDatabaseHandler('migration')
+    handler.result_cache_enabled = False
+    handler.workload_log_enabled = False
+    # Ids run backwards, so an INTEGER PRIMARY KEY on them renumbers every row
+    write_items(workdir / 'items.csv', range(50, 0, -1))
+    handler.create_tables_from_csv(workdir / 'items.csv')
+    return handler
+
+
+def fetch(handler, sql):
+    with handler._connection_pool.writer() as conn:
+        return conn.execute(sql).fetchall()
+
+
+def test_rebuild_keeps_rowids_when_the_key_is_not_the_rowid(handler):
+    with handler._connection_pool.writer() as conn:
+        conn.execute("DELETE FROM items WHERE id % 7 = 0;")
+    before = fetch(handler, "SELECT rowid, * FROM items ORDER BY rowid")
+
+    report = handler.migrate_table('items', [{'op': 'set_primary_key', 'columns': ['name']},
+                                             {'op': 'create_index', 'columns': ['program']}])
+    assert report['rebuilt'] and report['rows'] == len(before)
+    assert fetch(handler, "SELECT rowid, * FROM items ORDER BY rowid") == before
+    assert fetch(handler, "SELECT name FROM sqlite_master WHERE type='index' AND sql IS NOT NULL") == \
+        [('idx_items_program',)]
+
+
+def test_rebuild_refreshes_rollups_and_the_text_index(handler, workdir):
+    handler.create_rollup('items', ['program'], [('sum', 'amount')])
+    handler.create_fts_index('items', ['name'])
+    handler.update_primary_key('items', 'id')
+
+    fresh, rollup = (fetch(handler, sql) for sql in ROLLUP_CHECK)
+    assert rollup == fresh
+    sql = "SELECT id FROM items WHERE LOWER(name) LIKE '%item 1%' ORDER BY id"
+    assert 'items__fts' in handler.rewrite_text_search(sql)
+    assert handler.execute_query_result(sql).data['id'].tolist() == [1, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19]
+
+    # Rows appended after the migration are still merged into the rollup
+    write_items(workdir / 'items.csv', range(51, 61))
+    handler.create_tables_from_csv(workdir / 'items.csv', append=True)
+    fresh, rollup = (fetch(handler, sql) for sql in ROLLUP_CHECK)
+    assert rollup == fresh
+
+
+def test_failed_migration_leaves_the_table_as_it_was(handler):
+    handler.create_rollup('items', ['program'], [('sum', 'amount')])
+    with handler._connection_pool.writer() as conn:
+        conn.execute("UPDATE items SET program = 'A' WHERE id = 2;")
+    before = fetch(handler, "SELECT rowid, * FROM items ORDER BY rowid")
+    schema = fetch(handler, "SELECT name, sql FROM sqlite_master ORDER BY name")
+
+    # The batch fails on its last change, after an index was already queued
+    with pytest.raises(sqlite3.IntegrityError):
+        handler.migrate_table('items', [{'op': 'create_index', 'columns': ['amount']},
+                                        {'op': 'set_primary_key', 'columns': ['program']}])
+
+    assert fetch(handler, "SELECT rowid, * FROM items ORDER BY rowid") == before
+    assert fetch(handler, "SELECT name, sql FROM sqlite_master ORDER BY name") == schema
+    assert handler.list_rollups()[0]['last_rowid'] == 50
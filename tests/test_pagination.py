@@ -0,0 +1,72 @@
+import pytest
+
+from texttosql.sqlite.handlers.database.handler import SQLiteDatabaseHandler
+
+
+@pytest.fixture
+def handler(workdir):
+    handler = SQLiteDatabaseHandler('paging')
+    with handler._connection_pool.writer() as conn:
+        conn.execute("CREATE TABLE items (name TEXT, category TEXT, amount INTEGER);")
+        conn.executemany("INSERT INTO items VALUES (?, ?, ?);",
+                         [(f"item{i}", 'even' if i % 2 == 0 else None, i) for i in range(30)])
+        # Gaps in the rowids must not shorten a page
+        conn.execute("DELETE FROM items WHERE amount IN (3, 4, 5, 6, 7);")
+        conn.commit()
+    return handler
+
+
+def amounts(page):
+    return [row['amount'] for row in page['result'].to_records()]
+
+
+def test_pages_walk_forward_and_back(handler):
+    first = handler.get_table_page('items', limit=10)
+    assert amounts(first) == [0, 1, 2, 8, 9, 10, 11, 12, 13, 14]
+    assert (first['has_previous'], first['has_next'], first['total_rows']) == (False, True, 25)
+
+    second = handler.get_table_page('items', after=first['last_rowid'], limit=10)
+    assert amounts(second) == list(range(15, 25))
+    assert (second['has_previous'], second['has_next']) == (True, True)
+
+    last = handler.get_table_page('items', after=second['last_rowid'], limit=10)
+    assert amounts(last) == list(range(25, 30))
+    assert last['has_next'] is False
+
+    back = handler.get_table_page('items', before=last['first_rowid'], limit=10)
+    assert amounts(back) == amounts(second)
+    assert (back['has_previous'], back['has_next']) == (True, True)
+    back = handler.get_table_page('items', before=back['first_rowid'], limit=10)
+    assert amounts(back) == amounts(first)
+    assert back['has_previous'] is False
+
+
+def test_filters_and_columns_narrow_the_page(handler):
+    page = handler.get_table_page('items', limit=4, columns=['amount'],
+                                  filters=[('category', '=', 'even'), ('amount', '>=', 10)])
+    assert page['result'].to_records() == [{'amount': 10}, {'amount': 12}, {'amount': 14}, {'amount': 16}]
+    assert page['total_rows'] == 10
+
+    page = handler.get_table_page('items', filters=[('category', '=', None), ('name', 'like', 'item2%')])
+    assert amounts(page) == [21, 23, 25, 27, 29]
+    assert handler.count_rows('items', filters=[('category', '!=', None)]) == 13
+
+
+def test_invalid_tables_columns_and_operators_are_rejected(handler):
+    with pytest.raises(ValueError, match="Table 'missing'"):
+        handler.get_table_page('missing')
+    with pytest.raises(ValueError, match="Column 'price'"):
+        handler.get_table_page('items', columns=['name', 'price'])
+    with pytest.raises(ValueError, match="Column 'price'"):
+        handler.get_table_page('items', filters=[('price', '=', 1)])
+    with pytest.raises(ValueError, match="Unsupported filter operator"):
+        handler.get_table_page('items', filters=[('amount', '= 1 OR 1 =', 1)])
+
+
+def test_row_counts_follow_writes(handler):
+    assert handler.count_rows('items') == 25
+    with handler._connection_pool.writer() as conn:
+        conn.execute("INSERT INTO items VALUES ('late', 'even', 100);")
+        conn.commit()
+    assert handler.count_rows('items') == 26
+    assert handler.get_table_page('items', limit=1)['total_rows'] == 26
@@ -0,0 +1,33 @@
+import sqlite3
+
+from texttosql.sqlite.handlers.database.pool import get_pool, get_federated_pool
+
+
+def make_database(path):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (name TEXT, amount INTEGER);")
+    conn.execute("INSERT INTO items VALUES ('a', 1);")
+    conn.commit()
+    conn.close()
+
+
+def test_reading_leaves_the_database_file_untouched(workdir):
+    paths = [workdir / 'first.db', workdir / 'second.db']
+    for path in paths:
+        make_database(path)
+    before = [path.read_bytes() for path in paths]
+
+    assert get_pool(str(paths[0])).reader().execute("SELECT COUNT(*) FROM items;").fetchone() == (1,)
+    federated = get_federated_pool({'first': str(paths[0]), 'second': str(paths[1])}).reader()
+    assert federated.execute("SELECT COUNT(*) FROM first.items JOIN second.items;").fetchone() == (1,)
+
+    assert [path.read_bytes() for path in paths] == before
+    assert not list(workdir.glob('*-wal')) and not list(workdir.glob('*-shm'))
+
+
+def test_first_write_switches_to_wal(workdir):
+    path = workdir / 'items.db'
+    make_database(path)
+    with get_pool(str(path)).writer() as conn:
+        conn.execute("INSERT INTO items VALUES ('b', 2);")
+    assert conn.execute("PRAGMA journal_mode;").fetchone() == ('wal',)
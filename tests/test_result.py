@@ -0,0 +1,11 @@
+from texttosql.sqlite.handlers.database.handler import SQLiteDatabaseHandler
+
+
+def test_duplicate_column_names_never_collide(workdir):
+    handler = SQLiteDatabaseHandler('result')
+    result = handler.execute_query_result("SELECT 1 AS a, 2 AS a, 3 AS a_1")
+    assert len(set(result.columns)) == 3
+    assert sorted(result.to_records()[0].values()) == [1, 2, 3]
+
+    result = handler.execute_query_result("SELECT 1 AS a_1, 2 AS a, 3 AS a")
+    assert result.columns == ['a_1', 'a', 'a_2']
@@ -0,0 +1,28 @@
+import pytest
+
+from texttosql.sqlite.handlers.database.result_cache import is_cacheable_sql
+
+
+@pytest.mark.parametrize('sql', [
+    "SELECT date()",
+    "SELECT time()",
+    "SELECT datetime()",
+    "SELECT julianday()",
+    "SELECT unixepoch()",
+    "SELECT strftime('%s')",
+    "SELECT * FROM t WHERE d > date('now', '-7 days')",
+    "SELECT random()",
+    "SELECT CURRENT_TIMESTAMP",
+])
+def test_time_dependent_statements_are_not_cached(sql):
+    assert not is_cacheable_sql(sql)
+
+
+@pytest.mark.parametrize('sql', [
+    "SELECT date(created_at) FROM t",
+    "SELECT strftime('%Y', created_at), SUM(amount) FROM t GROUP BY 1",
+    "SELECT julianday(end_date) - julianday(start_date) FROM t",
+    "SELECT datetime(coalesce(a, b), '+1 day') FROM t",
+])
+def test_date_functions_of_a_column_are_cached(sql):
+    assert is_cacheable_sql(sql)
@@ -0,0 +1,127 @@
+import random
+
+import pytest
+
+from texttosql.sqlite.handlers.database.handler import SQLiteDatabaseHandler
+
+
+def write_budget(path, rows, seed):
+    # Empty programs and amounts load as NULLs, which both the keys and the aggregates must handle
+    rnd = random.Random(seed)
+    lines = ["program,fiscal_year,amount,hours"]
+    for _ in range(rows):
+        amount = '' if rnd.random() < 0.1 else round(rnd.uniform(-100, 1000), 2)
+        lines.append(f"{rnd.choice(['A', 'B', 'C', ''])},{rnd.choice([2022, 2023, 2024])},{amount},{rnd.randint(0, 40)}")
+    path.write_text("\n".join(lines) + "\n")
+
+
+def fetch(handler, sql):
+    with handler._connection_pool.writer() as conn:
+        return conn.execute(sql).fetchall()
+
+
+def assert_rows_match(actual, expected):
+    # Sums merged in a different order may differ in the last bits of a float
+    assert len(actual) == len(expected)
+    for actual_row, expected_row in zip(actual, expected):
+        assert [pytest.approx(value) if isinstance(value, float) else value for value in actual_row] == list(expected_row)
+
+
+@pytest.fixture
+def handler(workdir):
+    handler = SQLiteDatabaseHandler('rollup')
+    handler.result_cache_enabled = False
+    handler.workload_log_enabled = False
+    write_budget(workdir / 'budget.csv', 2000, seed=1)
+    handler.create_tables_from_csv(workdir / 'budget.csv')
+    return handler
+
+
+def test_rollup_merged_on_append_matches_a_recompute(handler, workdir):
+    handler.create_rollup('budget', ['program', 'fiscal_year'],
+                          [('sum', 'amount'), ('min', 'amount'), ('max', 'amount'), ('avg', 'hours')])
+    write_budget(workdir / 'budget.csv', 1500, seed=2)
+    handler.create_tables_from_csv(workdir / 'budget.csv', append=True)
+
+    expected = fetch(handler, "SELECT program, fiscal_year, COUNT(*), SUM(amount), MIN(amount), MAX(amount), "
+                              "SUM(hours), COUNT(hours) FROM budget GROUP BY 1, 2 ORDER BY 1, 2")
+    actual = fetch(handler, "SELECT program, fiscal_year, row_count, sum_amount, min_amount, max_amount, "
+                            "sum_hours, count_hours FROM budget__rollup_program_fiscal_year ORDER BY 1, 2")
+    assert_rows_match(actual, expected)
+    assert handler.list_rollups('budget')[0]['last_rowid'] == 3500
+
+
+def test_rollup_answers_match_the_base_table(handler):
+    report = handler.create_rollup('budget', ['fiscal_year'], [('avg', 'amount'), ('max', 'hours')])
+    assert report['name'] == 'budget__rollup_fiscal_year'
+    assert (report['rows'], report['groups']) == (2000, 3)
+
+    expected = fetch(handler, "SELECT fiscal_year, COUNT(*), AVG(amount), MAX(hours) FROM budget GROUP BY 1 ORDER BY 1")
+    actual = fetch(handler, "SELECT fiscal_year, row_count, sum_amount / count_amount, max_hours "
+                            "FROM budget__rollup_fiscal_year ORDER BY 1")
+    assert_rows_match(actual, expected)
+    # Coarser questions re-aggregate the rollup
+    assert_rows_match(fetch(handler, "SELECT SUM(sum_amount), SUM(row_count) FROM budget__rollup_fiscal_year"),
+                      fetch(handler, "SELECT SUM(amount), COUNT(*) FROM budget"))
+
+
+def test_invalid_rollups_are_rejected(handler):
+    with pytest.raises(ValueError, match="does not exist in the database"):
+        handler.create_rollup('missing', ['program'])
+    with pytest.raises(ValueError, match="Column 'region'"):
+        handler.create_rollup('budget', ['region'])
+    with pytest.raises(ValueError, match="Unsupported rollup aggregate"):
+        handler.create_rollup('budget', ['program'], [('median', 'amount')])
+    with pytest.raises(ValueError, match="at least one GROUP BY"):
+        handler.create_rollup('budget', [], [('sum', 'amount')])
+    assert handler.list_rollups() == []
+
+
+def test_schema_describes_rollups_and_hides_their_bookkeeping(handler):
+    handler.create_rollup('budget', ['program'])
+    schema = handler.get_db_schema()
+    assert '__rollups' not in schema
+    description = schema['budget__rollup_program']['rollup']
+    assert description['source_table'] == 'budget'
+    assert description['group_by'] == ['program']
+    # By default every numeric column outside the grouping is summed
+    assert description['measures'] == {'row_count': 'COUNT(*)', 'sum_fiscal_year': 'SUM(fiscal_year)',
+                                       'sum_amount': 'SUM(amount)', 'sum_hours': 'SUM(hours)'}
+    assert 'rollup' not in schema['budget']
+
+    handler.drop_rollup('budget__rollup_program')
+    assert handler.list_rollups() == []
+    assert 'budget__rollup_program' not in handler.get_db_schema()
+
+
+def test_full_refresh_picks_up_rows_changed_outside_a_load(handler):
+    handler.create_rollup('budget', ['program'], [('sum', 'hours')])
+    with handler._connection_pool.writer() as conn:
+        conn.execute("UPDATE budget SET hours = hours + 1;")
+        conn.commit()
+
+    # Updated rows are below the watermark, so only a full pass sees them
+    assert handler.refresh_rollups() == {'budget__rollup_program': 0}
+    assert handler.refresh_rollups(full=True) == {'budget__rollup_program': 2000}
+    assert fetch(handler, "SELECT program, sum_hours FROM budget__rollup_program ORDER BY 1") == \
+        fetch(handler, "SELECT program, SUM(hours) FROM budget GROUP BY 1 ORDER BY 1")
+
+
+def test_rollups_are_recommended_from_repeated_aggregations(handler):
+    handler.workload_log_enabled = True
+    handler.execute_query_result("SELECT program, SUM(amount) FROM budget GROUP BY program")
+    handler.execute_query_result("SELECT program, fiscal_year, MAX(hours) FROM budget "
+                                 "WHERE fiscal_year = 2023 GROUP BY program")
+    handler.execute_query_result("SELECT program, amount FROM budget WHERE hours > 10")
+    assert handler.recommend_rollups(min_queries=3) == []
+
+    [recommendation] = handler.recommend_rollups()
+    assert recommendation['table'] == 'budget'
+    assert recommendation['group_by'] == ['program', 'fiscal_year']
+    assert recommendation['measures'] == [('max', 'hours'), ('sum', 'amount')]
+    assert recommendation['queries'] == 2
+
+    [report] = handler.apply_rollup_recommendations([recommendation])
+    assert report['name'] == 'budget__rollup_program_fiscal_year'
+    handler.execute_query_result("SELECT program, SUM(amount) FROM budget GROUP BY program")
+    assert handler.recommend_rollups() == []
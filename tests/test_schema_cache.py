@@ -0,0 +1,88 @@
+import os
+import sqlite3
+
+import pytest
+
+from texttosql.sqlite.handlers.database.schema_cache import SQLiteSchemaCache
+
+
+def execute(path, *statements):
+    # Changes come from an unrelated connection, as another process would make them
+    conn = sqlite3.connect(path)
+    for statement in statements:
+        conn.execute(statement)
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def db_path(workdir):
+    path = str(workdir / 'schema.db')
+    execute(path, "CREATE TABLE programs (id INTEGER PRIMARY KEY, name TEXT);",
+            "INSERT INTO programs (name) VALUES ('alpha');")
+    return path
+
+
+def test_unchanged_database_is_served_from_the_cache(db_path):
+    cache = SQLiteSchemaCache()
+    schema = cache.get_schema(db_path)
+    assert schema['programs']['columns'] == [{'name': 'id', 'type': 'INTEGER', 'primary_key': True},
+                                             {'name': 'name', 'type': 'TEXT', 'primary_key': False}]
+    assert cache.get_schema(db_path) is schema
+    assert cache.get_schema_text(db_path) is cache.get_schema_text(db_path)
+
+
+def test_data_changes_resample_rows_without_reintrospecting(db_path):
+    cache = SQLiteSchemaCache()
+    columns = cache.get_schema(db_path)['programs']['columns']
+    version = cache.get_version(db_path)
+
+    execute(db_path, "INSERT INTO programs (name) VALUES ('beta');")
+    schema = cache.get_schema(db_path)
+    assert schema['programs']['sample_data'] == [(1, 'alpha'), (2, 'beta')]
+    assert schema['programs']['columns'] is columns
+    assert cache.get_version(db_path)[0] == version[0] and cache.get_version(db_path) != version
+
+
+def test_schema_changes_only_reintrospect_the_tables_that_changed(db_path):
+    cache = SQLiteSchemaCache()
+    programs = cache.get_schema(db_path)['programs']
+
+    execute(db_path, "CREATE TABLE risks (program_id INTEGER REFERENCES programs (id), level TEXT);")
+    schema = cache.get_schema(db_path)
+    assert sorted(schema) == ['programs', 'risks']
+    assert schema['programs'] is programs
+    assert {'type': 'foreign_key', 'from': 'program_id', 'to': 'id', 'table': 'programs'} in schema['risks']['constraints']
+
+    execute(db_path, "CREATE INDEX idx_programs_name ON programs (name);")
+    assert cache.get_schema(db_path)['programs']['constraints'] == [
+        {'index_name': 'idx_programs_name', 'columns': ['name'], 'unique': False}
+    ]
+
+
+def test_derived_values_are_rebuilt_after_a_change(db_path):
+    cache = SQLiteSchemaCache()
+    builds = []
+
+    def build(schema):
+        builds.append(sorted(schema))
+        return len(builds)
+
+    assert cache.get_derived(db_path, 'tables', build) == 1
+    assert cache.get_derived(db_path, 'tables', build) == 1
+    execute(db_path, "INSERT INTO programs (name) VALUES ('beta');")
+    assert cache.get_derived(db_path, 'tables', build) == 2
+
+
+def test_replaced_file_is_read_again(db_path, workdir):
+    cache = SQLiteSchemaCache()
+    cache.get_schema(db_path)
+
+    replacement = str(workdir / 'replacement.db')
+    execute(replacement, "CREATE TABLE budget (amount REAL);")
+    os.replace(replacement, db_path)
+    assert sorted(cache.get_schema(db_path)) == ['budget']
+
+
+def test_missing_database_has_no_schema(workdir):
+    assert SQLiteSchemaCache().get_schema(str(workdir / 'missing.db')) is None
@@ -0,0 +1,72 @@
+import pytest
+
+from texttosql.sqlite import SQLiteEngine
+from texttosql.sqlite.tracing import Tracer, get_tracer, set_tracer
+
+
+@pytest.fixture
+def tracer():
+    previous = get_tracer()
+    tracer = set_tracer(Tracer(sink=None))
+    yield tracer
+    set_tracer(previous)
+
+
+@pytest.fixture
+def engine(workdir):
+    engine = SQLiteEngine('stream')
+    engine.texttosql_cache_enabled = False
+    engine.result_cache_enabled = False
+    engine.workload_log_enabled = False
+    with engine._connection_pool.writer() as conn:
+        conn.execute("CREATE TABLE items (name TEXT, amount REAL);")
+        conn.executemany("INSERT INTO items VALUES (?, ?);", [('bolt', 1.5), ('nut', 2.5)])
+        conn.commit()
+    return engine
+
+
+def test_events_arrive_in_stage_order(engine, llm_stub, tracer):
+    llm_stub.fallback_sql = "SELECT name, amount FROM items ORDER BY name;"
+    events = list(engine.query("What items are there?", stream=True))
+
+    kinds = [event['event'] for event in events]
+    assert kinds[:2] == ['sql', 'rows']
+    assert kinds[-1] == 'done'
+    assert set(kinds[2:-1]) == {'token'} and len(kinds) > 4
+
+    assert events[0]['sql'] == llm_stub.fallback_sql
+    assert events[1]['sql_result'].to_records() == [{'name': 'bolt', 'amount': 1.5}, {'name': 'nut', 'amount': 2.5}]
+    answer = ''.join(event['text'] for event in events[2:-1])
+    assert answer.strip() == llm_stub.answer
+
+    result = events[-1]['result']
+    assert result['generative_result'] == llm_stub.answer
+    assert result['sql_result'] is events[1]['sql_result']
+    assert events[-1]['trace_id'] == tracer.recent_traces()[0][0].trace_id
+
+
+def test_streamed_answer_matches_the_blocking_call(engine, llm_stub):
+    llm_stub.fallback_sql = "SELECT SUM(amount) AS total FROM items;"
+    streamed = list(engine.query("How much in total?", stream=True))[-1]['result']
+    blocking = engine.query("How much in total?")
+    assert streamed['generative_result'] == blocking['generative_result']
+    assert streamed['sql_result'].to_records() == blocking['sql_result'].to_records()
+
+
+def test_token_usage_is_read_from_the_final_chunk(engine, llm_stub, tracer):
+    llm_stub.fallback_sql = "SELECT name FROM items;"
+    list(engine.query("Which items?", stream=True))
+    spans = {span.name: span for span in tracer.recent_traces()[0]}
+    assert spans['generative_llm'].attributes['completion_tokens'] > 0
+    assert spans['generative_llm'].attributes['prompt_tokens'] > 0
+
+
+def test_failed_sql_streams_the_failure_message(engine, llm_stub):
+    llm_stub.fallback_sql = "SELECT missing_column FROM items;"
+    events = list(engine.query("Which items?", stream=True))
+    assert [event['event'] for event in events] == ['sql', 'rows', 'token', 'done']
+    assert events[1]['sql_result'] is None
+    assert events[2]['text'] == engine.query_failed_message
+    assert events[-1]['result']['generative_result'] == engine.query_failed_message
+    # Only the text-to-SQL request went out
+    assert llm_stub.requests == 1
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from texttosql.sqlite import _run_on_sqlite_executor
+from texttosql.sqlite.handlers.database.handler import SQLiteDatabaseHandler
+from texttosql.sqlite.tracing import Tracer, current_span, get_tracer, set_tracer, trace_span
+
+
+@pytest.fixture
+def tracer():
+    previous = get_tracer()
+    tracer = set_tracer(Tracer(sink=None))
+    yield tracer
+    set_tracer(previous)
+
+
+def test_spans_set_on_the_sqlite_executor_keep_their_attributes(tracer):
+    def mark():
+        current_span().set(marked=True)
+
+    async def run():
+        with trace_span('query'):
+            with trace_span('execute_query') as span:
+                await _run_on_sqlite_executor(mark)
+        return span
+
+    assert asyncio.run(run()).attributes == {'marked': True}
+
+
+def test_result_cache_hits_are_recorded_from_the_executor(tracer, workdir):
+    handler = SQLiteDatabaseHandler('tracing')
+    handler.workload_log_enabled = False
+
+    async def run():
+        with trace_span('query'):
+            with trace_span('execute_query') as span:
+                await _run_on_sqlite_executor(handler.execute_query_result, "SELECT 1")
+        return span.attributes.get('result_cache_hit')
+
+    assert asyncio.run(run()) is False
+    assert asyncio.run(run()) is True
+    [latest, earlier] = tracer.recent_traces()
+    assert latest[0].trace_id != earlier[0].trace_id
@@ -1,9 +1,30 @@
 from texttosql.sqlite.handlers.database.handler import SQLiteDatabaseHandler
+from texttosql.sqlite.handlers.database.federation import SQLiteFederatedDatabaseHandler
 from texttosql.sqlite.handlers.query.handler import SQLiteQueryHandler
+from texttosql.sqlite.handlers.query.schema_index import SchemaIndex
 from texttosql.sqlite.handlers.llm.handler import SQLiteLLMHandler
-import json
+from texttosql.sqlite.handlers.llm.client import (configure_llm, EnvCredentialSource, StreamlitSecretsCredentialSource,
+                                                  StaticCredentialSource)
+from texttosql.sqlite.handlers.database.result import SQLiteQueryResult
+from texttosql.sqlite.handlers.database.schema_cache import schema_cache
+from texttosql.sqlite.tracing import trace_span, get_tracer, summarize_trace
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from pathlib import Path
+import json, os, threading, asyncio, contextvars, functools
+
+# SQLite work issued from the async API runs here; each worker keeps its own pooled reader
+_sqlite_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='texttosql-sqlite')
+
+
+def _run_on_sqlite_executor(function, *args):
+    # Unlike asyncio.to_thread, run_in_executor drops context variables, and with them the current span
+    context = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(_sqlite_executor, functools.partial(context.run, function, *args))
 
 class SQLiteEngine(SQLiteDatabaseHandler, SQLiteQueryHandler, SQLiteLLMHandler):
+    query_failed_message = "The generated SQL query could not be executed."
+
     def __init__(self, db_name: str):
         # Initialize the SQLiteDatabaseHandler with the db_name
         SQLiteDatabaseHandler.__init__(self, db_name=db_name)
@@ -14,16 +35,138 @@ class SQLiteEngine(SQLiteDatabaseHandler, SQLiteQueryHandler, SQLiteLLMHandler):
         # Initialize the SQLiteLLMHandler
         SQLiteLLMHandler.__init__(self)
 
-    def query(self, query: str):
+    def query(self, query: str, stream: bool = False):
+        # In stream mode, hand back a generator of progress events instead of the final dict
+        if stream:
+            return self._query_events(query)
+
+        with trace_span('query', db=self.db_name, question=query) as root:
+            cleaned_query, llm_sql_result, early_result = self._generate_sql(query)
+            if early_result is not None:
+                root.set(outcome='early')
+                return early_result
+
+            # Execute the query once, keeping the rows columnar until the prompt needs them
+            data = self._traced_execute(llm_sql_result.get('sql'))
+
+            if data is not None:
+                # Make a generative LLM call using the inherited make_generative_llm_call method
+                with trace_span('compact_result'):
+                    prompt_data = self.compact_result_for_prompt(data)
+                with trace_span('generative_llm', model=self.model):
+                    llm_generative_result = self.make_generative_llm_call(query=cleaned_query, data=prompt_data)
+                print(json.dumps(llm_generative_result, indent=4))
+            else:
+                llm_generative_result = self.query_failed_message
+            root.set(outcome='answered' if data is not None else 'failed')
+
+            return self._build_query_result(llm_sql_result, data, llm_generative_result)
+
+    def _query_events(self, query: str):
+        with trace_span('query', db=self.db_name, question=query, stream=True) as root:
+            cleaned_query, llm_sql_result, early_result = self._generate_sql(query)
+            if early_result is not None:
+                root.set(outcome='early')
+                yield {'event': 'done', 'result': early_result, 'trace_id': root.trace_id}
+                return
+
+            yield {'event': 'sql', 'sql': llm_sql_result.get('sql'), 'llm_sql_result': llm_sql_result}
+
+            data = self._traced_execute(llm_sql_result.get('sql'))
+            yield {'event': 'rows', 'sql_result': data}
+
+            if data is not None:
+                # Forward answer tokens as they arrive so callers can render them immediately
+                tokens = []
+                with trace_span('compact_result'):
+                    prompt_data = self.compact_result_for_prompt(data)
+                with trace_span('generative_llm', model=self.model):
+                    for token in self.make_generative_llm_call_stream(query=cleaned_query, data=prompt_data):
+                        tokens.append(token)
+                        yield {'event': 'token', 'text': token}
+                llm_generative_result = ''.join(tokens).strip()
+            else:
+                llm_generative_result = self.query_failed_message
+                yield {'event': 'token', 'text': llm_generative_result}
+            root.set(outcome='answered' if data is not None else 'failed')
+
+            yield {'event': 'done', 'result': self._build_query_result(llm_sql_result, data, llm_generative_result),
+                   'trace_id': root.trace_id}
+
+    async def aquery(self, query: str) -> dict:
+        with trace_span('query', db=self.db_name, question=query) as root:
+            with trace_span('handle_query'):
+                cleaned_query = self.handle_query(query)
+
+            # Schema lookups and SQL execution block, so they run on the SQLite thread pool
+            with trace_span('get_db_schema'):
+                schema = await _run_on_sqlite_executor(self._schema_for_query, cleaned_query)
+            with trace_span('texttosql_llm', model=self.model):
+                llm_sql_result = await self.amake_texttosql_llm_call(query=cleaned_query, schema=schema)
+
+            early_result = self._early_query_result(llm_sql_result)
+            if early_result is not None:
+                root.set(outcome='early')
+                return early_result
+
+            with trace_span('execute_query', sql=llm_sql_result.get('sql')) as span:
+                data = await _run_on_sqlite_executor(self.execute_query_result, llm_sql_result.get('sql'))
+                self._annotate_result(span, data)
+
+            if data is not None:
+                with trace_span('compact_result'):
+                    prompt_data = await _run_on_sqlite_executor(self.compact_result_for_prompt, data)
+                with trace_span('generative_llm', model=self.model):
+                    llm_generative_result = await self.amake_generative_llm_call(query=cleaned_query, data=prompt_data)
+            else:
+                llm_generative_result = self.query_failed_message
+            root.set(outcome='answered' if data is not None else 'failed')
+
+            return self._build_query_result(llm_sql_result, data, llm_generative_result)
+
+    async def aquery_many(self, queries: List[str], return_exceptions: bool = False) -> list:
+        # Questions overlap freely; the LLM semaphore bounds how many completions are in flight
+        return await asyncio.gather(*(self.aquery(query) for query in queries), return_exceptions=return_exceptions)
+
+    def _generate_sql(self, query: str):
         # Handle the query using the inherited handle_query method
-        cleaned_query = self.handle_query(query)
+        with trace_span('handle_query'):
+            cleaned_query = self.handle_query(query)
         
-        # Get the database schema using the inherited get_db_schema method
-        schema = self.get_db_schema()
+        # Get the serialized schema, pruned to the relevant tables on large databases
+        with trace_span('get_db_schema'):
+            schema = self._schema_for_query(cleaned_query)
         
         # Make a text-to-SQL LLM call using the inherited make_texttosql_llm_call method
-        llm_sql_result = self.make_texttosql_llm_call(query=cleaned_query, schema=schema)
+        with trace_span('texttosql_llm', model=self.model):
+            llm_sql_result = self.make_texttosql_llm_call(query=cleaned_query, schema=schema)
 
+        return cleaned_query, llm_sql_result, self._early_query_result(llm_sql_result)
+
+    def _traced_execute(self, sql: str) -> Optional[SQLiteQueryResult]:
+        with trace_span('execute_query', sql=sql) as span:
+            data = self.execute_query_result(sql)
+            self._annotate_result(span, data)
+            return data
+
+    @staticmethod
+    def _annotate_result(span, data: Optional[SQLiteQueryResult]):
+        if data is None:
+            span.set(failed=True)
+        else:
+            span.set(rows=data.row_count, bytes=data.nbytes, result_status=data.status)
+
+    def _schema_for_query(self, cleaned_query: str) -> Optional[str]:
+        schema = self.get_db_schema()
+        if not schema or len(schema) <= self.schema_prune_top_k_tables:
+            # Small schemas go in whole, using the cached serialized form
+            return self.get_db_schema_prompt()
+
+        # The lexical index is rebuilt only when the schema version changes
+        index = self._derived('schema_index', SchemaIndex)
+        return str(self.prune_schema(cleaned_query, schema, index=index))
+
+    def _early_query_result(self, llm_sql_result: dict) -> Optional[dict]:
         return_result = {}
 
         if isinstance(llm_sql_result, dict):
@@ -43,17 +186,62 @@ class SQLiteEngine(SQLiteDatabaseHandler, SQLiteQueryHandler, SQLiteLLMHandler):
                     print(json.dumps(llm_sql_result, indent=4))
                     return return_result
 
-        # Execute the query using the inherited execute_query method
-        data = self.execute_query(llm_sql_result.get('sql'))
-        
-        if data:
-            # Make a generative LLM call using the inherited make_generative_llm_call method
-            llm_generative_result = self.make_generative_llm_call(query=cleaned_query, data=data)
-            print(json.dumps(llm_generative_result, indent=4))
-        
+        return None
+
+    def _build_query_result(self, llm_sql_result: dict, data, llm_generative_result) -> dict:
+        return_result = {}
         for k, v in llm_sql_result.items():
             return_result[k] = v
         return_result['sql_result'] = data
         return_result['generative_result'] = llm_generative_result
 
         return return_result
+
+
+class SQLiteFederatedEngine(SQLiteFederatedDatabaseHandler, SQLiteEngine):
+    """SQLiteEngine over several attached database files, answering questions that span them."""
+
+    def __init__(self, db_names: List[str]):
+        SQLiteFederatedDatabaseHandler.__init__(self, db_names=db_names)
+        SQLiteQueryHandler.__init__(self)
+        SQLiteLLMHandler.__init__(self)
+
+
+# Process-wide registry so callers (e.g. Streamlit reruns) reuse warm engines
+_engines: Dict[str, SQLiteEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def _engine_key(db_name: str) -> str:
+    # Mirror SQLiteDatabaseHandler, which always resolves to '<stem>.db'
+    return os.path.abspath(f"{Path(db_name).stem}.db")
+
+
+def get_engine(db_name: str) -> SQLiteEngine:
+    key = _engine_key(db_name)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = SQLiteEngine(db_name=db_name)
+            # Warm the schema cache and connection pool before handing it out
+            engine.get_db_schema_prompt()
+            _engines[key] = engine
+        return engine
+
+
+def invalidate_engine(db_name: str):
+    key = _engine_key(db_name)
+    with _engines_lock:
+        _engines.pop(key, None)
+    schema_cache.invalidate(key)
+
+
+def get_federated_engine(db_names: List[str]) -> SQLiteFederatedEngine:
+    key = 'federated:' + ','.join(sorted(_engine_key(db_name) for db_name in db_names))
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = SQLiteFederatedEngine(db_names=sorted(db_names, key=lambda db_name: Path(db_name).stem))
+            engine.get_db_schema_prompt()
+            _engines[key] = engine
+        return engine
@@ -0,0 +1,267 @@
+"""Headless batch runs of canned questions against one or more databases.
+
+Questions come from a JSONL file, one object per line:
+
+    {"id": "budget-by-year", "question": "What is the total budget per fiscal year?", "db": "budget"}
+
+`id` and `db` are optional; questions without a `db` run against every
+database given with --db. Results are checkpointed to a SQLite side file
+as each question finishes, so rerunning with the same --run-id skips what
+is already done:
+
+    python -m texttosql.sqlite.batch questions.jsonl --db all --rpm 500 --tpm 200000 --output answers.jsonl
+"""
+import argparse
+import asyncio
+import contextlib
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Iterable
+
+from texttosql.sqlite import get_engine, SQLiteQueryResult
+from texttosql.sqlite.handlers.llm.ratelimit import AsyncRateLimiter
+from texttosql.sqlite.tracing import trace_span, current_trace_spans
+
+
+class SQLiteBatchStore:
+    """Checkpoints of batch runs, one row per question and database."""
+
+    def __init__(self, path: str = '.texttosql_batch.sqlite'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("PRAGMA synchronous=NORMAL;")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS texttosql_batch (
+                run_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                db TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                question TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                seconds REAL,
+                prompt_tokens INTEGER,
+                completion_tokens INTEGER,
+                finished_at REAL,
+                PRIMARY KEY (run_id, task_id, db)
+            );
+        """)
+
+    def register(self, run_id: str, tasks: List[Dict[str, Any]]):
+        # New tasks start out pending; tasks seen in an earlier run keep their status
+        with self._lock:
+            self._conn.execute("BEGIN;")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO texttosql_batch (run_id, task_id, db, position, question, status) "
+                    "VALUES (?, ?, ?, ?, ?, 'pending');",
+                    [(run_id, task['id'], task['db'], task['position'], task['question']) for task in tasks],
+                )
+                self._conn.execute("COMMIT;")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK;")
+                raise
+
+    def pending(self, run_id: str, retry_failed: bool = False) -> List[Dict[str, Any]]:
+        statuses = ('pending', 'running', 'failed', 'error') if retry_failed else ('pending', 'running')
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT task_id, db, position, question FROM texttosql_batch WHERE run_id = ? "
+                f"AND status IN ({', '.join('?' for _ in statuses)}) ORDER BY position, db;",
+                (run_id, *statuses),
+            ).fetchall()
+        return [{'id': task_id, 'db': db, 'position': position, 'question': question}
+                for task_id, db, position, question in rows]
+
+    def mark_running(self, run_id: str, task: Dict[str, Any]):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE texttosql_batch SET status = 'running', attempts = attempts + 1 "
+                "WHERE run_id = ? AND task_id = ? AND db = ?;",
+                (run_id, task['id'], task['db']),
+            )
+
+    def finish(self, run_id: str, task: Dict[str, Any], status: str, result: Optional[dict] = None,
+               error: Optional[str] = None, seconds: Optional[float] = None,
+               prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE texttosql_batch SET status = ?, result = ?, error = ?, seconds = ?, prompt_tokens = ?, "
+                "completion_tokens = ?, finished_at = ? WHERE run_id = ? AND task_id = ? AND db = ?;",
+                (status, json.dumps(result, default=str) if result is not None else None, error, seconds,
+                 prompt_tokens, completion_tokens, time.time(), run_id, task['id'], task['db']),
+            )
+
+    def results(self, run_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT task_id, db, question, status, attempts, result, error, seconds, prompt_tokens, "
+                "completion_tokens FROM texttosql_batch WHERE run_id = ? ORDER BY position, db;",
+                (run_id,),
+            ).fetchall()
+        return [
+            {'id': task_id, 'db': db, 'question': question, 'status': status, 'attempts': attempts,
+             'result': json.loads(result) if result else None, 'error': error, 'seconds': seconds,
+             'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens}
+            for task_id, db, question, status, attempts, result, error, seconds, prompt_tokens, completion_tokens in rows
+        ]
+
+    def counts(self, run_id: str) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM texttosql_batch WHERE run_id = ? GROUP BY status;", (run_id,)
+            ).fetchall()
+        return dict(rows)
+
+
+def read_questions(path: str, databases: List[str]) -> List[Dict[str, Any]]:
+    tasks = []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {'question': record}
+            question = record.get('question')
+            if not question:
+                raise ValueError(f"{path}:{line_number} has no 'question'.")
+            # Without an explicit id the question text identifies the task, so reordering the file is harmless
+            task_id = str(record.get('id') or hashlib.sha256(question.encode('utf-8')).hexdigest()[:16])
+            for db in ([record['db']] if record.get('db') else databases):
+                tasks.append({'id': task_id, 'db': Path(db).stem, 'position': line_number, 'question': question})
+    if not tasks:
+        raise ValueError(f"No questions to run: {path} is empty or no --db was given.")
+    return tasks
+
+
+def serialize_result(result: dict, max_rows: int) -> dict:
+    serialized = {key: value for key, value in result.items() if key != 'sql_result'}
+    data = result.get('sql_result')
+    if isinstance(data, SQLiteQueryResult):
+        records = data.to_records()
+        serialized['sql_result'] = records[:max_rows]
+        serialized['row_count'] = data.row_count
+        serialized['result_status'] = data.status
+    else:
+        serialized['sql_result'] = data
+    return serialized
+
+
+async def run_batch(tasks: List[Dict[str, Any]], store: SQLiteBatchStore, run_id: str, concurrency: int = 8,
+                    limiter: Optional[AsyncRateLimiter] = None, retry_failed: bool = False,
+                    max_result_rows: int = 100, rate_limit_retries: Optional[int] = None,
+                    verbose: bool = False) -> Dict[str, int]:
+    store.register(run_id, tasks)
+    pending = store.pending(run_id, retry_failed=retry_failed)
+    total = len(pending)
+    print(f"Run '{run_id}': {total} of {len(tasks)} question(s) to run...")
+
+    engines = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    done = 0
+    progress = sys.stdout
+
+    async def run_task(task: Dict[str, Any]):
+        nonlocal done
+        async with semaphore:
+            store.mark_running(run_id, task)
+            started = time.perf_counter()
+            status, result, error = 'ok', None, None
+            with trace_span('batch_question', run_id=run_id, task_id=task['id'], db=task['db']):
+                try:
+                    result = await engines[task['db']].aquery(task['question'])
+                    result = serialize_result(result, max_result_rows)
+                    if result.get('error') or result.get('sql_result') is None:
+                        status = 'failed'
+                except Exception as e:
+                    status, error = 'error', f"{type(e).__name__}: {e}"
+                spans = current_trace_spans()
+            seconds = time.perf_counter() - started
+            prompt_tokens = sum(span.attributes.get('prompt_tokens', 0) for span in spans)
+            completion_tokens = sum(span.attributes.get('completion_tokens', 0) for span in spans)
+            store.finish(run_id, task, status, result=result, error=error, seconds=seconds,
+                         prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+            done += 1
+            print(f"[{done}/{total}] {status:<6} {task['db']}: {task['question'][:80]} ({seconds:.1f}s)"
+                  + (f" - {error}" if error else ''), file=progress, flush=True)
+
+    # The engine reports its own progress with print; questions overlap, so silence it for the whole run
+    with open(os.devnull, 'w') as devnull, \
+            (contextlib.redirect_stdout(devnull) if not verbose else contextlib.nullcontext()):
+        for db in sorted({task['db'] for task in pending}):
+            # Registry engines are shared with interactive use; the batch settings go on a copy of their own
+            engine = copy.copy(get_engine(db))
+            engine.llm_rate_limiter = limiter
+            engine.llm_max_concurrency = concurrency
+            if rate_limit_retries is not None:
+                engine.llm_rate_limit_retries = rate_limit_retries
+            engines[db] = engine
+        await asyncio.gather(*(run_task(task) for task in pending))
+    return store.counts(run_id)
+
+
+def export_results(results: Iterable[Dict[str, Any]], path: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        for result in results:
+            f.write(json.dumps(result, default=str) + '\n')
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Run a JSONL file of questions against SQLite databases.")
+    parser.add_argument('questions', help="JSONL file with one {'question': ...} object per line")
+    parser.add_argument('--db', action='append', default=[],
+                        help="database to ask every question against (repeatable; 'all' for every .db here)")
+    parser.add_argument('--run-id', help="checkpoint name; rerunning with the same id resumes (default: file name)")
+    parser.add_argument('--store', default='.texttosql_batch.sqlite', help="SQLite file holding the checkpoints")
+    parser.add_argument('--concurrency', type=int, default=8, help="questions in flight at once")
+    parser.add_argument('--rpm', type=float, help="LLM requests per minute")
+    parser.add_argument('--tpm', type=float, help="LLM tokens per minute (prompt plus max completion)")
+    parser.add_argument('--retries', type=int, default=5, help="retries per LLM call after a rate-limit error")
+    parser.add_argument('--retry-failed', action='store_true', help="also rerun questions that failed before")
+    parser.add_argument('--max-result-rows', type=int, default=100, help="rows of each SQL result to keep")
+    parser.add_argument('--output', help="write every result of the run to this JSONL file")
+    parser.add_argument('--verbose', action='store_true', help="keep the engine's own progress output")
+    args = parser.parse_args(argv)
+
+    databases = []
+    for db in args.db:
+        databases.extend(sorted(str(path) for path in Path('.').glob('*.db')) if db == 'all' else [db])
+    tasks = read_questions(args.questions, databases)
+    run_id = args.run_id or Path(args.questions).stem
+
+    limiter = AsyncRateLimiter(args.rpm, args.tpm) if args.rpm or args.tpm else None
+    store = SQLiteBatchStore(args.store)
+
+    started = time.perf_counter()
+    try:
+        counts = asyncio.run(run_batch(tasks, store, run_id, concurrency=args.concurrency, limiter=limiter,
+                                       retry_failed=args.retry_failed, max_result_rows=args.max_result_rows,
+                                       rate_limit_retries=args.retries, verbose=args.verbose))
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; finished questions are saved. Rerun with --run-id {run_id} to resume.")
+        raise SystemExit(130)
+
+    summary = ', '.join(f"{count} {status}" for status, count in sorted(counts.items()))
+    print(f"Run '{run_id}' finished in {time.perf_counter() - started:.1f}s: {summary}")
+    if limiter and limiter.waited_seconds:
+        print(f"Waited {limiter.waited_seconds:.1f}s in total for the rate limit.")
+    if args.output:
+        export_results(store.results(run_id), args.output)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
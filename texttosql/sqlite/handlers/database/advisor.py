@@ -0,0 +1,226 @@
+import re
+import sqlite3
+from collections import defaultdict
+from typing import Dict, List, Sequence, Tuple
+
+from texttosql.sqlite.handlers.database.ingest import quote_identifier
+
+_TOKEN = re.compile(r"""
+      '(?:[^']|'')*'                          # string literal
+    | "(?:[^"]|"")*" | `[^`]*` | \[[^\]]*\]   # quoted identifier
+    | [A-Za-z_][A-Za-z0-9_$]*                 # bare word
+    | \d+(?:\.\d*)?(?:[eE][-+]?\d+)?          # number
+    | <=|>=|<>|!=|==|\|\|
+    | \S
+""", re.VERBOSE)
+
+_CLAUSE_KEYWORDS = {'select', 'from', 'join', 'on', 'where', 'group', 'order', 'having', 'limit', 'union',
+                    'except', 'intersect', 'window', 'values', 'using', 'offset'}
+_RESERVED = _CLAUSE_KEYWORDS | {
+    'as', 'and', 'or', 'not', 'in', 'is', 'null', 'like', 'glob', 'between', 'by', 'case', 'when', 'then', 'else',
+    'end', 'distinct', 'all', 'exists', 'left', 'right', 'inner', 'outer', 'cross', 'natural', 'full', 'asc', 'desc',
+    'with', 'recursive', 'cast', 'collate', 'escape', 'true', 'false', 'current_date', 'current_time',
+    'current_timestamp', 'filter', 'over', 'partition', 'nulls', 'first', 'last',
+}
+_EQUALITY_OPERATORS = {'=', '==', 'in', 'is'}
+_RANGE_OPERATORS = {'<', '>', '<=', '>=', 'between'}
+_SCAN = re.compile(r'^SCAN (\S+)(?: AS \S+)?$')
+_TEMP_B_TREE = re.compile(r'^USE TEMP B-TREE FOR (GROUP BY|ORDER BY|DISTINCT)')
+
+
+def tokenize_sql(sql: str, spans: bool = False) -> List[tuple]:
+    # (kind, value) pairs, or (kind, value, start, end) when the caller needs to edit the text
+    tokens = []
+    for match in _TOKEN.finditer(sql):
+        token = match.group()
+        if token[0] == "'":
+            kind, value = 'literal', token
+        elif token[0] in '"`[':
+            kind, value = 'identifier', token[1:-1].replace('""', '"') if token[0] == '"' else token[1:-1]
+        elif re.match(r'[A-Za-z_]', token):
+            lower = token.lower()
+            kind, value = ('keyword', lower) if lower in _RESERVED else ('identifier', token)
+        else:
+            kind, value = 'symbol', token.lower()
+        tokens.append((kind, value, match.start(), match.end()) if spans else (kind, value))
+    return tokens
+
+
+def table_aliases(tokens: List[Tuple[str, str]], tables) -> Dict[str, str]:
+    # Lowercased table names and aliases from FROM/JOIN clauses, mapped to the table they stand for
+    aliases = {}
+    tables_by_name = {table.lower(): table for table in tables}
+    for position, (kind, value) in enumerate(tokens):
+        if not (kind == 'keyword' and value in ('from', 'join')) and not (value == ',' and _in_from(tokens, position)):
+            continue
+        if position + 1 >= len(tokens) or tokens[position + 1][0] != 'identifier':
+            continue
+        table_name = tables_by_name.get(tokens[position + 1][1].lower())
+        if table_name is None:
+            continue
+        aliases[table_name.lower()] = table_name
+        following = tokens[position + 2:position + 4]
+        if following and following[0] == ('keyword', 'as'):
+            following = following[1:]
+        if following and following[0][0] == 'identifier':
+            aliases[following[0][1].lower()] = table_name
+    return aliases
+
+
+def _in_from(tokens: List[Tuple[str, str]], position: int) -> bool:
+    depth = 0
+    for kind, value in reversed(tokens[:position]):
+        if value == ')':
+            depth += 1
+        elif value == '(':
+            if depth == 0:
+                return False
+            depth -= 1
+        elif depth == 0 and kind == 'keyword' and value in _CLAUSE_KEYWORDS:
+            return value == 'from'
+    return False
+
+
+def read_table_indexes(conn: sqlite3.Connection, tables: Sequence[str]) -> Dict[str, List[List[str]]]:
+    indexes = {}
+    for table_name in tables:
+        table_indexes = []
+        info = conn.execute(f"PRAGMA table_info({quote_identifier(table_name)});").fetchall()
+        primary_key = [column for column in info if column[5]]
+        # An INTEGER PRIMARY KEY is the rowid and never shows up as an index
+        if len(primary_key) == 1 and primary_key[0][2].upper() == 'INTEGER':
+            table_indexes.append([primary_key[0][1]])
+        for index in conn.execute(f"PRAGMA index_list({quote_identifier(table_name)});").fetchall():
+            columns = [row[2] for row in conn.execute(f"PRAGMA index_info({quote_identifier(index[1])});")]
+            table_indexes.append(columns)
+        indexes[table_name] = table_indexes
+    return indexes
+
+
+class IndexAdvisor:
+    """Mines a workload log for columns that full table scans filter, join or group on."""
+
+    def __init__(self, table_columns: Dict[str, List[str]], existing_indexes: Dict[str, List[List[str]]],
+                 max_index_columns: int = 3):
+        self.table_columns = {table: set(columns) for table, columns in table_columns.items()}
+        self.existing_indexes = existing_indexes
+        self.max_index_columns = max_index_columns
+
+    def recommend(self, entries: List[dict], limit: int = 10, min_queries: int = 1) -> List[dict]:
+        candidates = {}
+        for entry in entries:
+            for table_name, columns, usage in self.candidates(entry['sql'], entry['plan']):
+                candidate = candidates.setdefault((table_name, columns), {
+                    'table': table_name, 'columns': list(columns), 'usage': usage,
+                    'queries': 0, 'total_seconds': 0.0, 'sql': [],
+                })
+                candidate['queries'] += 1
+                candidate['total_seconds'] += entry['seconds']
+                if entry['sql'] not in candidate['sql']:
+                    candidate['sql'].append(entry['sql'])
+
+        # A shorter candidate is served by a longer one that starts with the same columns
+        for (table_name, columns), candidate in list(candidates.items()):
+            longer = [other for (other_table, other_columns), other in candidates.items()
+                      if other_table == table_name and len(other_columns) > len(columns)
+                      and other_columns[:len(columns)] == columns]
+            if longer:
+                target = max(longer, key=lambda other: other['total_seconds'])
+                target['queries'] += candidate['queries']
+                target['total_seconds'] += candidate['total_seconds']
+                target['sql'].extend(sql for sql in candidate['sql'] if sql not in target['sql'])
+                del candidates[(table_name, columns)]
+
+        recommendations = []
+        for candidate in sorted(candidates.values(), key=lambda c: (-c['total_seconds'], -c['queries'])):
+            if candidate['queries'] < min_queries or self._is_covered(candidate['table'], candidate['columns']):
+                continue
+            candidate['total_seconds'] = round(candidate['total_seconds'], 6)
+            candidate['name'] = f"idx_{candidate['table']}_{'_'.join(candidate['columns'])}"
+            candidate['reason'] = (f"{candidate['usage']} by {candidate['queries']} statement(s) that scanned "
+                                   f"'{candidate['table']}' in full ({candidate['total_seconds']:.3f}s in total)")
+            recommendations.append(candidate)
+        return recommendations[:limit]
+
+    def candidates(self, sql: str, plan: List[str]) -> List[Tuple[str, Tuple[str, ...], str]]:
+        tokens = tokenize_sql(sql)
+        aliases = table_aliases(tokens, self.table_columns)
+        scanned, sorted_in_temp = set(), False
+        for detail in plan:
+            match = _SCAN.match(detail)
+            if match:
+                scanned.add(aliases.get(match.group(1).lower(), match.group(1)))
+            elif _TEMP_B_TREE.match(detail):
+                sorted_in_temp = True
+
+        equality, ranges, joins, grouping = defaultdict(list), defaultdict(list), defaultdict(list), defaultdict(list)
+        for table_name, column, clause, operator, is_join in self._column_references(tokens, aliases):
+            if table_name not in scanned:
+                continue
+            if clause in ('where', 'on', 'having'):
+                if operator in _EQUALITY_OPERATORS:
+                    _append_unique(joins[table_name] if is_join else equality[table_name], column)
+                elif operator in _RANGE_OPERATORS:
+                    _append_unique(ranges[table_name], column)
+            elif clause in ('group', 'order') and sorted_in_temp:
+                _append_unique(grouping[table_name], column)
+
+        results = []
+        for table_name in sorted(scanned):
+            # Literal filters beat join keys: a scanned table is usually the outer loop of its join.
+            # Equality columns lead, one range column can follow them in the same index
+            columns = (equality[table_name] or joins[table_name])[:self.max_index_columns]
+            if ranges[table_name] and len(columns) < self.max_index_columns:
+                columns = columns + [column for column in ranges[table_name] if column not in columns][:1]
+            if columns:
+                results.append((table_name, tuple(columns), 'filtered or joined'))
+            elif grouping[table_name]:
+                results.append((table_name, tuple(grouping[table_name][:self.max_index_columns]), 'grouped or sorted'))
+        return results
+
+    def _column_references(self, tokens: List[Tuple[str, str]], aliases: Dict[str, str]):
+        clause = None
+        query_tables = set(aliases.values())
+        for position, (kind, value) in enumerate(tokens):
+            if kind == 'keyword' and value in _CLAUSE_KEYWORDS:
+                clause = value
+                continue
+            if kind != 'identifier':
+                continue
+            previous = tokens[position - 1] if position else ('', '')
+            following = tokens[position + 1] if position + 1 < len(tokens) else ('', '')
+            if following[1] in ('.', '('):
+                continue
+
+            if previous[1] == '.' and position >= 2:
+                table_name = aliases.get(tokens[position - 2][1].lower())
+                candidates = [table_name] if table_name and value in self.table_columns.get(table_name, ()) else []
+                start = position - 2
+            else:
+                candidates = [table for table in query_tables if value in self.table_columns.get(table, ())]
+                start = position
+            if len(candidates) != 1:
+                continue
+
+            # The comparison may sit on either side of the column; a column on the other side makes it a join
+            comparisons = _EQUALITY_OPERATORS | _RANGE_OPERATORS
+            before = tokens[start - 1] if start >= 1 else ('', '')
+            operator, other = '', ('', '')
+            if following[1] in comparisons:
+                operator = following[1]
+                other = tokens[position + 2] if position + 2 < len(tokens) else ('', '')
+            elif before[1] in comparisons:
+                operator = before[1]
+                other = tokens[start - 2] if start >= 2 else ('', '')
+            yield candidates[0], value, clause, operator, other[0] == 'identifier'
+
+    def _is_covered(self, table_name: str, columns: List[str]) -> bool:
+        for index_columns in self.existing_indexes.get(table_name, []):
+            if index_columns[:len(columns)] == columns:
+                return True
+        return False
+
+
+def _append_unique(values: List[str], value: str):
+    if value not in values:
+        values.append(value)
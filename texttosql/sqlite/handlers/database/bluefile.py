@@ -0,0 +1,146 @@
+import struct
+import numpy as np
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+from texttosql.sqlite.handlers.database.ingest import normalize_column_names
+
+# X-Midas BLUE files start with a 512 byte header control block; only the
+# fields needed to locate and describe the data are decoded here
+HEADER_SIZE = 512
+ADJUNCT_OFFSET = 256
+SUBRECORD_OFFSET = 48
+SUBRECORD_SIZE = 8
+
+# Elements per value for the first format character; digits mean themselves
+_FORMAT_MODES = {'S': 1, 'C': 2, 'V': 3, 'Q': 4, 'M': 9, 'X': 10, 'T': 16}
+_FORMAT_TYPES = {
+    'B': ('i1', 'INTEGER'),
+    'O': ('u1', 'INTEGER'),
+    'I': ('i2', 'INTEGER'),
+    'L': ('i4', 'INTEGER'),
+    'X': ('i8', 'INTEGER'),
+    'F': ('f4', 'REAL'),
+    'D': ('f8', 'REAL'),
+    'A': ('S8', 'TEXT'),
+}
+_BYTE_ORDERS = {'EEEI': '<', 'IEEE': '>'}
+
+
+class BlueFileReader:
+    """Memory-mapped reader for type 1000, 2000 and 3000 BLUE (.tmp) files.
+
+    The data section is mapped as a structured numpy array with one scalar
+    field per output column, so rows are produced a chunk at a time from
+    column arrays rather than built up value by value.
+    """
+
+    def __init__(self, tmp_file: Path):
+        self.tmp_file = Path(tmp_file)
+        with open(self.tmp_file, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE or header[:4] != b'BLUE':
+            raise ValueError(f"The file '{self.tmp_file}' is not a BLUE file.")
+
+        head_order = _byte_order(header[4:8])
+        self.byte_order = _byte_order(header[8:12])
+        detached, = struct.unpack_from(f'{head_order}i', header, 12)
+        if detached:
+            raise ValueError(f"The file '{self.tmp_file}' keeps its data in a detached file, which is not supported.")
+
+        data_start, data_size, self.type = struct.unpack_from(f'{head_order}ddi', header, 32)
+        self.format = header[52:54].decode('ascii')
+        self.data_start, self.data_size = int(data_start), int(data_size)
+        self.fields = self._record_fields(header, head_order)
+        # Normalized names double as the numpy field names, which must be unique
+        self.columns = normalize_column_names([name for name, _, _, _ in self.fields])
+        self.dtype = np.dtype({
+            'names': self.columns,
+            'formats': [field_format for _, field_format, _, _ in self.fields],
+            'offsets': [offset for _, _, offset, _ in self.fields],
+            'itemsize': self.record_length,
+        })
+        self.types = [affinity for _, _, _, affinity in self.fields]
+
+        available = max(0, min(self.data_size, self.tmp_file.stat().st_size - self.data_start))
+        self.row_count = available // self.record_length
+        self.total_bytes = self.row_count * self.record_length
+
+    def _record_fields(self, header: bytes, order: str) -> List[Tuple[str, str, int, str]]:
+        if self.type // 1000 in (1, 2):
+            elements, element_format, affinity = _element_format(self.format, self.byte_order)
+            frame = 1
+            if self.type // 1000 == 2:
+                frame, = struct.unpack_from(f'{order}i', header, ADJUNCT_OFFSET + 20)
+                frame = max(frame, 1)
+            self.record_length = frame * elements * np.dtype(element_format).itemsize
+            fields = []
+            for position in range(frame * elements):
+                fields.append((self._element_name(position, frame, elements), element_format,
+                               position * np.dtype(element_format).itemsize, affinity))
+            return fields
+
+        if self.type // 1000 == 3:
+            subrecords, = struct.unpack_from(f'{order}i', header, ADJUNCT_OFFSET + 20)
+            self.record_length, = struct.unpack_from(f'{order}i', header, ADJUNCT_OFFSET + 44)
+            if subrecords * SUBRECORD_SIZE > HEADER_SIZE - ADJUNCT_OFFSET - SUBRECORD_OFFSET:
+                raise ValueError(f"The file '{self.tmp_file}' has more subrecords than fit in its header.")
+            fields = []
+            for index in range(subrecords):
+                name, subrecord_format, offset = struct.unpack_from(
+                    f'{order}4s2sh', header, ADJUNCT_OFFSET + SUBRECORD_OFFSET + index * SUBRECORD_SIZE
+                )
+                name = name.decode('ascii').strip(' \x00') or f'field_{index}'
+                elements, element_format, affinity = _element_format(subrecord_format.decode('ascii'), self.byte_order)
+                size = np.dtype(element_format).itemsize
+                for element in range(elements):
+                    fields.append((name if elements == 1 else f'{name}_{element}', element_format,
+                                   offset + element * size, affinity))
+            return fields
+
+        raise ValueError(f"BLUE type {self.type} in '{self.tmp_file}' is not supported; expected type 1000, 2000 or 3000.")
+
+    def _element_name(self, position: int, frame: int, elements: int) -> str:
+        value, part = divmod(position, elements)
+        name = 'value' if frame == 1 else f'value_{value}'
+        if elements == 2:
+            return f"{name}_{('real', 'imag')[part]}"
+        return name if elements == 1 else f'{name}_{part}'
+
+    def rows(self, chunk_size: int = 10_000) -> Iterator[Tuple]:
+        if not self.row_count:
+            return
+        records = np.memmap(self.tmp_file, dtype=self.dtype, mode='r', offset=self.data_start,
+                            shape=(self.row_count,))
+        try:
+            for start in range(0, self.row_count, chunk_size):
+                chunk = records[start:start + chunk_size]
+                # One tolist() per column converts a whole chunk to Python values at C speed
+                columns = [self._column_values(chunk[name]) for name in self.dtype.names]
+                yield from zip(*columns)
+        finally:
+            del records
+
+    def _column_values(self, array: np.ndarray) -> List:
+        if array.dtype.kind == 'S':
+            return [value.decode('ascii', 'replace').strip(' \x00') for value in array.tolist()]
+        return array.tolist()
+
+
+def _byte_order(representation: bytes) -> str:
+    try:
+        return _BYTE_ORDERS[representation.decode('ascii')]
+    except (KeyError, UnicodeDecodeError):
+        raise ValueError(f"Unknown BLUE data representation {representation!r}.")
+
+
+def _element_format(blue_format: str, byte_order: str) -> Tuple[int, str, str]:
+    mode, code = blue_format[0], blue_format[1]
+    elements = int(mode) if mode.isdigit() else _FORMAT_MODES.get(mode)
+    if not elements or code not in _FORMAT_TYPES:
+        raise ValueError(f"Unsupported BLUE data format '{blue_format}'.")
+    numpy_format, affinity = _FORMAT_TYPES[code]
+    # Byte order only matters for multi-byte numbers
+    if numpy_format[0] in 'if' and numpy_format[1:] != '1':
+        numpy_format = byte_order + numpy_format
+    return elements, numpy_format, affinity
@@ -0,0 +1,124 @@
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Optional, Dict, List, Sequence, Tuple, Any
+
+from texttosql.sqlite.handlers.database.handler import SQLiteDatabaseHandler
+from texttosql.sqlite.handlers.database.schema_cache import schema_cache
+from texttosql.sqlite.handlers.database.pool import SQLiteFederatedPool, get_federated_pool
+from texttosql.sqlite.handlers.database.ingest import quote_identifier
+from texttosql.sqlite.handlers.database.result_cache import file_version
+
+_RESERVED_SCHEMAS = {'main', 'temp'}
+
+
+class SQLiteFederatedDatabaseHandler(SQLiteDatabaseHandler):
+    """Queries several database files at once through ATTACH.
+
+    Every member is attached under its file stem, and the schema handed to
+    the prompt qualifies each table as `<database>.<table>`. The merged
+    schema is rebuilt only when a member's schema version changes; each
+    member's own entry in the schema cache keeps its sample rows current.
+    """
+
+    # Attached tables are addressed by qualified names, which the LIKE rewrite and index advisor do not parse
+    fts_rewrite_enabled = False
+    workload_log_enabled = False
+    federation_schema_note = ("The tables live in separate attached databases. Always refer to a table by its "
+                              "qualified name exactly as listed, e.g. SELECT ... FROM budget.budget JOIN "
+                              "risks.risks ON ...")
+
+    def __init__(self, db_names: Sequence[str]):
+        members = {}
+        for db_name in db_names:
+            alias = Path(db_name).stem
+            path = f"{alias}.db"
+            if not os.path.exists(path):
+                raise ValueError(f"Database '{path}' does not exist.")
+            if alias.lower() in _RESERVED_SCHEMAS or not re.match(r'^[A-Za-z_][A-Za-z0-9_]*$', alias):
+                raise ValueError(f"'{alias}' cannot be used as an attached database name.")
+            members[alias] = path
+        if not members:
+            raise ValueError("A federated database needs at least one member database.")
+
+        self.members = members
+        self.db_name = '+'.join(members)
+        # Not a file: identifies the federation in caches, logs and traces
+        self.db_path = f"federated:{','.join(members)}"
+        self._merged: Dict[str, Any] = {'schema_key': None, 'schema': None, 'text_key': None, 'text': None,
+                                        'derived_key': None, 'derived': {}}
+        self._merged_lock = threading.Lock()
+
+        print(f"Attaching databases {', '.join(repr(path) for path in members.values())}...")
+        self._connection_pool.reader()
+        print(f"Successfully attached {len(members)} database(s)...")
+
+    @property
+    def _connection_pool(self) -> SQLiteFederatedPool:
+        return get_federated_pool(self.members)
+
+    def get_db_schema(self) -> Optional[Dict[str, Dict[str, List[Dict[str, str]]]]]:
+        return self._merged_schema(self._member_versions())
+
+    def get_db_schema_prompt(self) -> Optional[str]:
+        versions = self._member_versions()
+        schema = self._merged_schema(versions)
+        if schema is None:
+            return None
+        # The text embeds sample rows, which change with the data as well
+        with self._merged_lock:
+            if self._merged['text_key'] != versions:
+                self._merged.update(text_key=versions, text=f"{self.federation_schema_note}\n\n{schema}")
+            return self._merged['text']
+
+    def _derived(self, name, builder):
+        versions = self._member_versions()
+        schema = self._merged_schema(versions)
+        if schema is None:
+            return None
+        with self._merged_lock:
+            if self._merged['derived_key'] != versions:
+                self._merged.update(derived_key=versions, derived={})
+            derived = self._merged['derived']
+        if name not in derived:
+            derived[name] = builder(schema)
+        return derived[name]
+
+    def _merged_schema(self, versions: Optional[Tuple[tuple, ...]]):
+        if versions is None:
+            return None
+        # Data-only commits leave the structure alone, so only schema versions decide a rebuild
+        schema_key = tuple((alias, file_id, version[0]) for alias, file_id, version in versions)
+        with self._merged_lock:
+            if self._merged['schema_key'] != schema_key:
+                merged = {}
+                for alias, path in self.members.items():
+                    for table_name, table_schema in (schema_cache.get_schema(path) or {}).items():
+                        merged[f"{alias}.{table_name}"] = table_schema
+                self._merged.update(schema_key=schema_key, schema=merged)
+            return self._merged['schema']
+
+    def _table_reference(self, table_name: str) -> str:
+        alias, _, table = table_name.partition('.')
+        if not table:
+            return quote_identifier(table_name)
+        return f"{quote_identifier(alias)}.{quote_identifier(table)}"
+
+    def _result_cache_versions(self) -> Optional[tuple]:
+        versions = self._member_versions()
+        if versions is None:
+            return None
+        disk_version = ';'.join(file_version(path) for path in self.members.values())
+        return f"{versions}|{disk_version}", disk_version
+
+    def _member_versions(self) -> Optional[Tuple[tuple, ...]]:
+        # Two pragmas per member on the schema cache's watcher connections
+        versions = []
+        for alias, path in self.members.items():
+            version = schema_cache.get_version(path)
+            if version is None:
+                return None
+            stat = os.stat(path)
+            versions.append((alias, (stat.st_dev, stat.st_ino), version))
+        return tuple(versions)
@@ -0,0 +1,159 @@
+import sqlite3
+from typing import Dict, List, Optional
+
+from texttosql.sqlite.handlers.database.ingest import quote_identifier
+from texttosql.sqlite.handlers.database.advisor import tokenize_sql, table_aliases
+
+FTS_SUFFIX = '__fts'
+# Trigram lookups need at least one literal run of three characters to probe the index
+MIN_TRIGRAM_LENGTH = 3
+
+# A predicate is only rewritten when it stands alone as an operand of WHERE/ON/AND/OR
+_PREDICATE_STARTS = {'where', 'on', 'and', 'or', '('}
+_PREDICATE_ENDS = {'and', 'or', ')', ';', '', 'group', 'order', 'limit', 'union', 'except', 'intersect', 'window'}
+# Under these a false and a NULL predicate no longer filter rows the same way
+_UNSAFE_KEYWORDS = {'not', 'case', 'is'}
+
+
+def fts_table_name(table_name: str) -> str:
+    return f"{table_name}{FTS_SUFFIX}"
+
+
+def is_fts_table(table_name: str) -> bool:
+    # The index itself plus the shadow tables FTS5 creates next to it
+    return table_name.endswith(FTS_SUFFIX) or f"{FTS_SUFFIX}_" in table_name
+
+
+def text_columns(conn: sqlite3.Connection, table_name: str) -> List[str]:
+    columns = []
+    for column in conn.execute(f"PRAGMA table_info({quote_identifier(table_name)});"):
+        declared = column[2].upper()
+        if any(affinity in declared for affinity in ('CHAR', 'CLOB', 'TEXT')):
+            columns.append(column[1])
+    return columns
+
+
+def create_fts_index(conn: sqlite3.Connection, table_name: str, columns: Optional[List[str]] = None) -> List[str]:
+    # External content: the index stores trigrams only and reads values back from the table by rowid
+    columns = text_columns(conn, table_name) if columns is None else columns
+    fts_table = fts_table_name(table_name)
+    conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(fts_table)};")
+    if not columns:
+        return []
+    content = "'" + table_name.replace("'", "''") + "'"
+    conn.execute(
+        f"CREATE VIRTUAL TABLE {quote_identifier(fts_table)} USING fts5("
+        f"{', '.join(quote_identifier(column) for column in columns)}, "
+        f"content={content}, content_rowid='rowid', tokenize='trigram');"
+    )
+    conn.execute(f"INSERT INTO {quote_identifier(fts_table)}({quote_identifier(fts_table)}) VALUES('rebuild');")
+    return columns
+
+
+def rebuild_fts_index(conn: sqlite3.Connection, table_name: str) -> Optional[List[str]]:
+    # Re-reads every row of the table, which also resyncs an index whose rowids changed under it
+    columns = read_fts_indexes(conn).get(table_name)
+    if columns is None:
+        return None
+    existing = {column[1] for column in conn.execute(f"PRAGMA table_info({quote_identifier(table_name)});")}
+    if not all(column in existing for column in columns):
+        return create_fts_index(conn, table_name, [column for column in columns if column in existing])
+    fts_table = quote_identifier(fts_table_name(table_name))
+    conn.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES('rebuild');")
+    return columns
+
+
+def read_fts_indexes(conn: sqlite3.Connection) -> Dict[str, List[str]]:
+    indexes = {}
+    for name, sql in conn.execute("SELECT name, sql FROM sqlite_master WHERE type='table';").fetchall():
+        if name.endswith(FTS_SUFFIX) and (sql or '').upper().startswith('CREATE VIRTUAL TABLE'):
+            table_name = name[:-len(FTS_SUFFIX)]
+            indexes[table_name] = [column[1] for column in conn.execute(f"PRAGMA table_info({quote_identifier(name)});")]
+    return indexes
+
+
+def rewrite_like_predicates(sql: str, fts_indexes: Dict[str, List[str]],
+                            table_columns: Dict[str, List[str]]) -> str:
+    """Turn `LOWER(col) LIKE '%term%'` filters on indexed columns into FTS5 probes.
+
+    The original predicate is kept next to the rowid lookup, so the trigram
+    index only narrows the candidate rows and results stay identical.
+    """
+    if not fts_indexes:
+        return sql
+    tokens = tokenize_sql(sql, spans=True)
+    pairs = [(kind, value) for kind, value, _, _ in tokens]
+    if any(kind == 'keyword' and value in _UNSAFE_KEYWORDS for kind, value in pairs):
+        return sql
+
+    aliases = table_aliases(pairs, table_columns)
+    edits = []
+    for position, (kind, value) in enumerate(pairs):
+        if (kind, value) != ('keyword', 'like') or position + 1 >= len(pairs) or pairs[position + 1][0] != 'literal':
+            continue
+        predicate = _match_predicate(pairs, position)
+        if predicate is None:
+            continue
+        start, qualifier, column = predicate
+        end = position + 1
+        before = pairs[start - 1] if start else ('keyword', 'where')
+        after = pairs[end + 1] if end + 1 < len(pairs) else ('', '')
+        if before[1] not in _PREDICATE_STARTS or after[1] not in _PREDICATE_ENDS:
+            continue
+        # A parenthesis after a name opens a function call, not a group
+        if before[1] == '(' and start >= 2 and pairs[start - 2][0] == 'identifier':
+            continue
+
+        pattern = pairs[end][1][1:-1].replace("''", "'")
+        if max((len(run) for run in pattern.replace('_', '%').split('%')), default=0) < MIN_TRIGRAM_LENGTH:
+            continue
+
+        table_name, reference = _resolve_column(qualifier, column, aliases, table_columns)
+        if table_name is None or column not in fts_indexes.get(table_name, ()):
+            continue
+
+        fts_table = quote_identifier(fts_table_name(table_name))
+        original = sql[tokens[start][2]:tokens[end][3]]
+        replacement = (f"({reference}.rowid IN (SELECT rowid FROM {fts_table} WHERE {fts_table}.{quote_identifier(column)} "
+                       f"LIKE {pairs[end][1]}) AND {original})")
+        edits.append((tokens[start][2], tokens[end][3], replacement))
+
+    for start, end, replacement in reversed(edits):
+        sql = sql[:start] + replacement + sql[end:]
+    return sql
+
+
+def _match_predicate(pairs: List[tuple], like_position: int):
+    # Matches `[LOWER(] [qualifier.] column [)]` right before LIKE and returns (start, qualifier, column)
+    position = like_position - 1
+    wrapped = pairs[position][1] == ')'
+    if wrapped:
+        position -= 1
+    if position < 0 or pairs[position][0] != 'identifier':
+        return None
+    column, qualifier = pairs[position][1], None
+    if position >= 2 and pairs[position - 1][1] == '.' and pairs[position - 2][0] == 'identifier':
+        qualifier = pairs[position - 2][1]
+        position -= 2
+    if wrapped:
+        if position < 2 or pairs[position - 1][1] != '(' or str(pairs[position - 2][1]).lower() != 'lower':
+            return None
+        position -= 2
+    return position, qualifier, column
+
+
+def _resolve_column(qualifier: Optional[str], column: str, aliases: Dict[str, str],
+                    table_columns: Dict[str, List[str]]):
+    if qualifier is not None:
+        table_name = aliases.get(qualifier.lower())
+        return table_name, quote_identifier(qualifier)
+
+    tables = {table for table in aliases.values() if column in table_columns.get(table, ())}
+    if len(tables) != 1:
+        return None, None
+    table_name = tables.pop()
+    names = [name for name, table in aliases.items() if table == table_name and name != table_name.lower()]
+    # Refer to the table the way the query does; a table used twice is ambiguous
+    if len(names) > 1:
+        return None, None
+    return table_name, quote_identifier(names[0] if names else table_name)
@@ -1,12 +1,59 @@
 import sqlite3
 import os
-import pandas as pd
-import json, re
+import time
 from typing import Optional, Union, Dict, List
 from pathlib import Path
-# import bluefile
+from texttosql.sqlite.handlers.database.schema_cache import schema_cache
+from texttosql.sqlite.handlers.database.result import SQLiteQueryResult
+from texttosql.sqlite.handlers.database.pool import SQLiteConnectionPool, get_pool
+from texttosql.sqlite.handlers.database.ingest import (
+    CSVReader, ProgressCallback, bulk_insert, bulk_load_pragmas, create_table, normalize_table_name,
+    parallel_import_csv_files, iter_xlsx_sheets, JSONRecordReader, insert_records, quote_identifier
+)
+from texttosql.sqlite.handlers.database.bluefile import BlueFileReader
+from texttosql.sqlite.handlers.database.migration import TableDefinition
+from texttosql.sqlite.handlers.database.workload import get_workload_log
+from texttosql.sqlite.handlers.database.advisor import IndexAdvisor, read_table_indexes
+from texttosql.sqlite.handlers.database.fts import (
+    create_fts_index, fts_table_name, read_fts_indexes, rebuild_fts_index, rewrite_like_predicates
+)
+from texttosql.sqlite.handlers.database.rollup import (
+    RollupAdvisor, create_rollup, drop_rollup, read_rollups, refresh_rollup
+)
+from texttosql.sqlite.handlers.database.result_cache import get_result_cache, is_cacheable_sql, file_version
+from texttosql.sqlite.tracing import current_span
 
 class SQLiteDatabaseHandler:
+    # Caps applied while fetching the rows of a generated query
+    result_max_rows = 100_000
+    result_max_bytes = 64 * 1024 * 1024
+    result_batch_size = 1000
+    # Budget after which a generated statement is interrupted; the progress handler runs every N VM steps
+    query_timeout_seconds = 30.0
+    query_max_vm_steps: Optional[int] = None
+    query_progress_interval = 10_000
+    _page_filter_operators = frozenset({'=', '!=', '<', '<=', '>', '>=', 'LIKE'})
+    # Pragmas that take an argument but only read, so generated SQL may still use them
+    _introspection_pragmas = frozenset({
+        'table_info', 'table_xinfo', 'table_list', 'index_list', 'index_info', 'index_xinfo', 'foreign_key_list',
+    })
+    # Rows used to infer column affinities, and rows per executemany batch, when ingesting
+    ingest_sample_size = 1000
+    ingest_chunk_size = 10_000
+    # Loads into a new table commit in slices of this many rows; appends always run as one transaction
+    ingest_rows_per_transaction = 500_000
+    # Plans and timings of executed statements feed the index advisor
+    workload_log_enabled = True
+    workload_advisor_window = 5000
+    # Trigram shadow indexes over TEXT columns: built at ingest when enabled, kept in sync with their table once built,
+    # and used by the LIKE rewrite when present
+    fts_index_enabled = False
+    fts_rewrite_enabled = True
+    # Results of generated SELECTs are reused until the database changes
+    result_cache_enabled = True
+    # Table that BLUE (.tmp) signal files are loaded into
+    tmp_table_name = 'pdw_data'
+
     def __init__(self, db_name: str):
         self.db_name = Path(db_name).stem
         self.db_path = f"{self.db_name}.db"
@@ -18,71 +65,325 @@ class SQLiteDatabaseHandler:
             print(f"Connecting to existing database '{self.db_path}'...")
 
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                print(f"Successfully connected to database '{self.db_path}'...")
+            self._connection_pool.reader()
+            print(f"Successfully connected to database '{self.db_path}'...")
         except sqlite3.Error as e:
             print(f"An error occurred while connecting to the database: {e}")
 
+    @property
+    def _connection_pool(self) -> SQLiteConnectionPool:
+        return get_pool(self.db_path)
+
     def __enter__(self):
         return self
 
     def __exit__(self):
         pass
 
-    def create_tables_from_tmp(self, tmp_path: Union[str, Path]):
-        tmp_path = Path(tmp_path)
-        with sqlite3.connect(self.db_path) as conn:
+    def create_tables_from_tmp(self, tmp_path: Union[str, Path],
+                               progress_callback: Optional[ProgressCallback] = None) -> List[dict]:
+        with self._connection_pool.writer() as conn:
+            tmp_path = Path(tmp_path)
             if tmp_path.is_file() and tmp_path.suffix == '.tmp':
-                self._import_tmp_to_db(conn, tmp_path)
+                return [self._import_tmp_to_db(conn, tmp_path, progress_callback=progress_callback)]
             elif tmp_path.is_dir():
-                for file in tmp_path.glob('*.tmp'):
-                    self._import_tmp_to_db(conn, file)
+                files = sorted(tmp_path.glob('*.tmp'))
+                return [self._import_tmp_to_db(conn, file, progress_callback=progress_callback) for file in files]
             else:
                 raise ValueError("The provided path must be a .tmp file or a directory containing .tmp files.")
 
-    # def _import_tmp_to_db(self, conn, tmp_file: Path):
-    #     _, data = bluefile.read(tmp_file)
-    #     c = conn.cursor()
-    #     # Extract unique keys (field names) from the data
-    #     fields = set()
-    #     for entry in data:
-    #         fields.update(entry.keys())
-
-    #     # Create a table dynamically
-    #     create_table_query = f"CREATE TABLE IF NOT EXISTS pdw_data ({', '.join(f'{field} TEXT' for field in fields)});"
-    #     c.execute(create_table_query)
-
-    #     # Insert data dynamically
-    #     for entry in data:
-    #         keys = ', '.join(entry.keys())
-    #         placeholders = ', '.join('?' for _ in entry)
-    #         values = tuple(str(entry[key]) for key in entry)
-    #         insert_query = f"INSERT INTO pdw_data ({keys}) VALUES ({placeholders});"
-    #         c.execute(insert_query, values)
-    #     conn.commit()
-
-    def create_tables_from_csv(self, csv_path: Union[str, Path]):
-        with sqlite3.connect(self.db_path) as conn:
+    def _import_tmp_to_db(self, conn: sqlite3.Connection, tmp_file: Path,
+                          progress_callback: Optional[ProgressCallback] = None) -> dict:
+        table_name = self.tmp_table_name
+        started = time.perf_counter()
+        reader = BlueFileReader(tmp_file)
+
+        # Every drop lands in the same table, so later files append when their layout matches
+        created = not self._table_exists(conn, table_name)
+        if not created:
+            existing = [column[1] for column in conn.execute(f"PRAGMA table_info({quote_identifier(table_name)});")]
+            if existing != reader.columns:
+                raise ValueError(f"The records in '{tmp_file}' do not match the columns of table '{table_name}'.")
+        else:
+            create_table(conn, table_name, reader.columns, reader.types)
+
+        def report_progress(rows_loaded: int):
+            if progress_callback:
+                progress_callback(rows_loaded, rows_loaded * reader.record_length, reader.total_bytes)
+
+        with bulk_load_pragmas(conn, table_name=table_name, created=created):
+            rows_loaded = bulk_insert(conn, table_name, reader.columns, reader.rows(self.ingest_chunk_size),
+                                      chunk_size=self.ingest_chunk_size, on_chunk=report_progress,
+                                      rows_per_transaction=self.ingest_rows_per_transaction if created else None)
+        self._sync_fts_index(conn, table_name)
+        self._sync_rollups(conn, table_name)
+        print(f"Loaded {rows_loaded} records from file '{tmp_file}' into table '{table_name}'.")
+        return self._import_report(tmp_file, table_name, rows=rows_loaded, seconds=time.perf_counter() - started)
+
+    def create_tables_from_csv(self, csv_path: Union[str, Path], progress_callback: Optional[ProgressCallback] = None,
+                               workers: Optional[int] = None, append: bool = False) -> List[dict]:
+        # With append, a file whose table already exists adds its rows instead of being skipped
+        with self._connection_pool.writer() as conn:
             csv_path = Path(csv_path)
             if csv_path.is_file() and csv_path.suffix == '.csv':
-                self._import_csv_to_db(conn, csv_path)
+                return [self._import_csv_to_db(conn, csv_path, progress_callback=progress_callback, append=append)]
             elif csv_path.is_dir():
-                for file in csv_path.glob('*.csv'):
-                    self._import_csv_to_db(conn, file)
+                files = sorted(csv_path.glob('*.csv'))
+                # A process pool only pays off with several files and several cores
+                workers = min(workers or os.cpu_count() or 1, len(files))
+                if workers < 2:
+                    reports = [self._try_import_csv_to_db(conn, file, progress_callback=progress_callback, append=append)
+                               for file in files]
+                else:
+                    reports = self._parallel_import_csv_to_db(conn, files, workers=workers,
+                                                              progress_callback=progress_callback, append=append)
+                self._raise_import_errors(conn, reports)
+                return reports
             else:
                 raise ValueError("The provided path must be a .csv file or a directory containing .csv files.")
 
-    def _import_csv_to_db(self, conn: sqlite3.Connection, csv_file: Path):
-        table_name = re.sub(r'\s+', '_', csv_file.stem.lower().strip())
-        table_name = re.sub(r'[^a-zA-Z0-9_]', '', table_name)
+    def _parallel_import_csv_to_db(self, conn: sqlite3.Connection, files: List[Path], workers: Optional[int] = None,
+                                   progress_callback: Optional[ProgressCallback] = None,
+                                   append: bool = False) -> List[dict]:
+        reports, jobs = {}, []
+        for file in files:
+            table_name = normalize_table_name(file.stem)
+            if append and self._table_exists(conn, table_name):
+                # Appends go through this connection one by one; only new tables are parsed in parallel
+                reports[file] = self._import_csv_to_db(conn, file, progress_callback=progress_callback, append=True)
+            elif self._table_exists(conn, table_name):
+                print(f"Table '{table_name}' already exists in the database. Skipping import...")
+                reports[file] = self._import_report(file, table_name, skipped=True)
+            else:
+                jobs.append((file, table_name))
+
+        # Worker processes parse and convert; this connection stays the only writer
+        imported = parallel_import_csv_files(conn, jobs, workers=workers, sample_size=self.ingest_sample_size,
+                                             chunk_size=self.ingest_chunk_size,
+                                             rows_per_transaction=self.ingest_rows_per_transaction,
+                                             progress_callback=progress_callback)
+        for (file, table_name), report in zip(jobs, imported):
+            if report['error'] is None:
+                self._sync_fts_index(conn, table_name)
+                self._sync_rollups(conn, table_name)
+            reports[file] = report
+        return [reports[file] for file in files]
+
+    def _try_import_csv_to_db(self, conn: sqlite3.Connection, csv_file: Path,
+                              progress_callback: Optional[ProgressCallback] = None, append: bool = False) -> dict:
+        # A failed file is recorded like the parallel path does, so the other files still get imported
+        try:
+            return self._import_csv_to_db(conn, csv_file, progress_callback=progress_callback, append=append)
+        except Exception as e:
+            return self._import_report(csv_file, normalize_table_name(csv_file.stem), error=f"{type(e).__name__}: {e}")
+
+    def _raise_import_errors(self, conn: sqlite3.Connection, reports: List[dict]):
+        failed = [report for report in reports if report['error'] is not None]
+        if failed:
+            # Keep the files that did import; only the failed ones are left out
+            conn.commit()
+            raise ValueError(f"Failed to import {len(failed)} of {len(reports)} file(s): "
+                             + "; ".join(f"'{report['file']}' ({report['error']})" for report in failed))
 
-        if self._table_exists(conn, table_name):
+    def _import_csv_to_db(self, conn: sqlite3.Connection, csv_file: Path,
+                          progress_callback: Optional[ProgressCallback] = None, append: bool = False) -> dict:
+        table_name = normalize_table_name(csv_file.stem)
+
+        exists = self._table_exists(conn, table_name)
+        if exists and not append:
             print(f"Table '{table_name}' already exists in the database. Skipping import...")
+            return self._import_report(csv_file, table_name, skipped=True)
+
+        started = time.perf_counter()
+        # Column affinities come from a sample; the rest of the file is streamed in chunks
+        reader = CSVReader(csv_file, sample_size=self.ingest_sample_size)
+        if not reader.columns:
+            reader.close()
+            raise ValueError(f"The file '{csv_file}' has no header row.")
+
+        def report_progress(rows_loaded: int):
+            if progress_callback:
+                progress_callback(rows_loaded, reader.bytes_read, reader.total_bytes)
+
+        if exists:
+            existing = [column[1] for column in conn.execute(f"PRAGMA table_info({quote_identifier(table_name)});")]
+            if existing != reader.columns:
+                reader.close()
+                raise ValueError(f"The columns of '{csv_file}' do not match the columns of table '{table_name}'.")
         else:
-            df = pd.read_csv(csv_file)
-            df.columns = [re.sub(r'\s+', '_', col.lower().strip()) for col in df.columns]
-            df.to_sql(table_name, conn, if_exists='replace', index=False)
-            print(f"Table '{table_name}' created from file '{csv_file}'.")
+            create_table(conn, table_name, reader.columns, reader.types)
+        with bulk_load_pragmas(conn, table_name=table_name, created=not exists):
+            rows_loaded = bulk_insert(conn, table_name, reader.columns, reader.rows(),
+                                      chunk_size=self.ingest_chunk_size, on_chunk=report_progress,
+                                      rows_per_transaction=None if exists else self.ingest_rows_per_transaction)
+        if progress_callback:
+            progress_callback(rows_loaded, reader.total_bytes, reader.total_bytes)
+        self._sync_fts_index(conn, table_name)
+        self._sync_rollups(conn, table_name)
+        print(f"Table '{table_name}' {'appended to' if exists else 'created'} from file '{csv_file}' "
+              f"({rows_loaded} rows).")
+        return self._import_report(csv_file, table_name, rows=rows_loaded, seconds=time.perf_counter() - started)
+
+    def create_tables_from_xlsx(self, xlsx_path: Union[str, Path],
+                                progress_callback: Optional[ProgressCallback] = None) -> List[dict]:
+        with self._connection_pool.writer() as conn:
+            xlsx_path = Path(xlsx_path)
+            if xlsx_path.is_file() and xlsx_path.suffix == '.xlsx':
+                return self._import_xlsx_to_db(conn, xlsx_path, progress_callback=progress_callback)
+            elif xlsx_path.is_dir():
+                return [report for file in sorted(xlsx_path.glob('*.xlsx'))
+                        for report in self._import_xlsx_to_db(conn, file, progress_callback=progress_callback)]
+            else:
+                raise ValueError("The provided path must be a .xlsx file or a directory containing .xlsx files.")
+
+    def _import_xlsx_to_db(self, conn: sqlite3.Connection, xlsx_file: Path,
+                           progress_callback: Optional[ProgressCallback] = None) -> List[dict]:
+        reports = []
+        # Sheets have no size in bytes, so progress is counted in the rows the sheets declare, headers included
+        progress = {'rows': 0, 'start': 0, 'end': 0, 'total': 0}
+
+        def report_progress(rows_loaded: int):
+            if progress_callback:
+                position = min(progress['start'] + 1 + rows_loaded, progress['end'])
+                progress_callback(progress['rows'] + rows_loaded, position, progress['total'])
+
+        for sheet in iter_xlsx_sheets(xlsx_file, sample_size=self.ingest_sample_size):
+            progress.update(start=progress['end'], end=progress['end'] + sheet.declared_rows,
+                            total=sheet.workbook_rows)
+            # A single-sheet workbook is named after the file, like a CSV; otherwise each sheet gets a table
+            # prefixed with the file name, so same-titled sheets of different workbooks do not collide
+            table_name = normalize_table_name(xlsx_file.stem if sheet.sheet_count == 1
+                                              else f"{xlsx_file.stem}_{sheet.title}")
+
+            if self._table_exists(conn, table_name):
+                print(f"Table '{table_name}' already exists in the database. Skipping import...")
+                reports.append(self._import_report(xlsx_file, table_name, skipped=True))
+                continue
+            if not sheet.columns:
+                print(f"Sheet '{sheet.title}' in '{xlsx_file}' is empty. Skipping import...")
+                reports.append(self._import_report(xlsx_file, table_name, skipped=True))
+                continue
+
+            started = time.perf_counter()
+            create_table(conn, table_name, sheet.columns, sheet.types)
+            with bulk_load_pragmas(conn, table_name=table_name, created=True):
+                rows_loaded = bulk_insert(conn, table_name, sheet.columns, sheet.rows(),
+                                          chunk_size=self.ingest_chunk_size, rows_per_transaction=None,
+                                          on_chunk=report_progress)
+            self._sync_fts_index(conn, table_name)
+            self._sync_rollups(conn, table_name)
+            print(f"Table '{table_name}' created from sheet '{sheet.title}' of file '{xlsx_file}' ({rows_loaded} rows).")
+            reports.append(self._import_report(xlsx_file, table_name, rows=rows_loaded,
+                                               seconds=time.perf_counter() - started))
+            progress['rows'] += rows_loaded
+        if progress_callback:
+            progress_callback(progress['rows'], progress['total'], progress['total'])
+        return reports
+
+    def create_tables_from_json(self, json_path: Union[str, Path],
+                                progress_callback: Optional[ProgressCallback] = None) -> List[dict]:
+        with self._connection_pool.writer() as conn:
+            json_path = Path(json_path)
+            if json_path.is_file() and json_path.suffix in ('.json', '.jsonl'):
+                return [self._import_json_to_db(conn, json_path, progress_callback=progress_callback)]
+            elif json_path.is_dir():
+                files = sorted([*json_path.glob('*.json'), *json_path.glob('*.jsonl')])
+                return [self._import_json_to_db(conn, file, progress_callback=progress_callback) for file in files]
+            else:
+                raise ValueError("The provided path must be a .json/.jsonl file or a directory containing them.")
+
+    def _import_json_to_db(self, conn: sqlite3.Connection, json_file: Path,
+                           progress_callback: Optional[ProgressCallback] = None) -> dict:
+        table_name = normalize_table_name(json_file.stem)
+
+        if self._table_exists(conn, table_name):
+            print(f"Table '{table_name}' already exists in the database. Skipping import...")
+            return self._import_report(json_file, table_name, skipped=True)
+
+        started = time.perf_counter()
+        reader = JSONRecordReader(json_file)
+
+        def report_progress(rows_loaded: int):
+            if progress_callback:
+                progress_callback(rows_loaded, reader.bytes_read, reader.total_bytes)
+
+        with bulk_load_pragmas(conn, table_name=table_name, created=True):
+            rows_loaded = insert_records(conn, table_name, reader.records(), sample_size=self.ingest_sample_size,
+                                         chunk_size=self.ingest_chunk_size, on_chunk=report_progress)
+        self._sync_fts_index(conn, table_name)
+        self._sync_rollups(conn, table_name)
+        print(f"Table '{table_name}' created from file '{json_file}' ({rows_loaded} rows).")
+        return self._import_report(json_file, table_name, rows=rows_loaded, seconds=time.perf_counter() - started)
+
+    def _sync_fts_index(self, conn: sqlite3.Connection, table_name: str):
+        # An existing index is rebuilt after every load so it never lags behind its table, whatever the setting
+        if rebuild_fts_index(conn, table_name) is None and self.fts_index_enabled:
+            create_fts_index(conn, table_name)
+
+    def _sync_rollups(self, conn: sqlite3.Connection, table_name: str):
+        # Only the rows past each rollup's watermark are aggregated and merged in
+        for rollup in read_rollups(conn, table_name).values():
+            rows = refresh_rollup(conn, rollup)
+            if rows:
+                print(f"Rollup '{rollup['name']}' updated with {rows} new row(s).")
+
+    def create_fts_index(self, table_name: str, columns: Optional[List[str]] = None) -> List[str]:
+        with self._connection_pool.writer() as conn:
+            if not self._table_exists(conn, table_name):
+                raise ValueError(f"Table '{table_name}' does not exist in the database.")
+            columns = create_fts_index(conn, table_name, columns)
+        print(f"Full-text index '{fts_table_name(table_name)}' built over {len(columns)} column(s) of table '{table_name}'.")
+        return columns
+
+    def drop_fts_index(self, table_name: str):
+        with self._connection_pool.writer() as conn:
+            conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(fts_table_name(table_name))};")
+
+    def create_rollup(self, table_name: str, group_by: List[str], measures: Optional[List[tuple]] = None,
+                      name: Optional[str] = None) -> dict:
+        # Measures are (function, column) pairs; by default every numeric column outside the grouping is summed
+        with self._connection_pool.writer() as conn:
+            if not self._table_exists(conn, table_name):
+                raise ValueError(f"Table '{table_name}' does not exist in the database.")
+            if measures is None:
+                info = conn.execute(f"PRAGMA table_info({quote_identifier(table_name)});").fetchall()
+                measures = [('sum', column[1]) for column in info
+                            if column[1] not in group_by and column[2].upper() in ('INTEGER', 'REAL')]
+            started = time.perf_counter()
+            report = create_rollup(conn, table_name, group_by, measures, name or '_'.join(group_by))
+        print(f"Rollup '{report['name']}' built from {report['rows']} rows of table '{table_name}' "
+              f"({report['groups']} groups) in {time.perf_counter() - started:.3f}s.")
+        return report
+
+    def drop_rollup(self, rollup_name: str):
+        with self._connection_pool.writer() as conn:
+            drop_rollup(conn, rollup_name)
+        print(f"Rollup '{rollup_name}' dropped.")
+
+    def list_rollups(self, table_name: Optional[str] = None) -> List[dict]:
+        return list(read_rollups(self._connection_pool.reader(), table_name).values())
+
+    def refresh_rollups(self, table_name: Optional[str] = None, full: bool = False) -> Dict[str, int]:
+        # Loads keep rollups current on their own; a full refresh is for rows changed outside of them
+        with self._connection_pool.writer() as conn:
+            return {name: refresh_rollup(conn, rollup, full=full)
+                    for name, rollup in read_rollups(conn, table_name).items()}
+
+    def rewrite_text_search(self, sql: str) -> str:
+        # The set of indexed tables only changes with the schema, so it is memoized alongside it
+        conn = self._connection_pool.reader()
+        fts_indexes = self._derived('fts_indexes', lambda schema: read_fts_indexes(conn))
+        if not fts_indexes:
+            return sql
+        schema = self.get_db_schema() or {}
+        table_columns = {table_name: [column['name'] for column in table_schema['columns']]
+                         for table_name, table_schema in schema.items()}
+        return rewrite_like_predicates(sql, fts_indexes, table_columns)
+
+    def _import_report(self, file: Path, table_name: str, rows: int = 0, seconds: float = 0.0,
+                       error: Optional[str] = None, skipped: bool = False) -> dict:
+        return {'file': str(file), 'table': table_name, 'rows': rows, 'seconds': round(seconds, 3),
+                'error': error, 'skipped': skipped}
 
     def _table_exists(self, conn: sqlite3.Connection, table_name: str) -> bool:
         query = f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}';"
@@ -92,245 +393,390 @@ class SQLiteDatabaseHandler:
         return result is not None
 
     def get_db_schema(self) -> Optional[Dict[str, Dict[str, List[Dict[str, str]]]]]:
-        if not os.path.exists(self.db_path):
-            print(f"Database '{self.db_path}' does not exist.")
-            return None
-
-        schema = {}
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Get a list of all tables
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-                tables = cursor.fetchall()
-                
-                for table in tables:
-                    table_name = table[0]
-                    schema[table_name] = {
-                        'columns': [],
-                        'constraints': [],
-                        'sample_data': []
-                    }
-                    
-                    # Get the columns and their data types
-                    cursor.execute(f"PRAGMA table_info({table_name});")
-                    columns = cursor.fetchall()
-                    for column in columns:
-                        col_info = {
-                            'name': column[1],
-                            'type': column[2],
-                            'primary_key': bool(column[5])
-                        }
-                        schema[table_name]['columns'].append(col_info)
-                    
-                    # Get table constraints (like unique, foreign keys, etc.)
-                    cursor.execute(f"PRAGMA index_list({table_name});")
-                    indexes = cursor.fetchall()
-                    for index in indexes:
-                        index_name = index[1]
-                        cursor.execute(f"PRAGMA index_info({index_name});")
-                        index_info = cursor.fetchall()
-                        if index_info:
-                            schema[table_name]['constraints'].append({
-                                'index_name': index_name,
-                                'columns': [info[2] for info in index_info],
-                                'unique': bool(index[2])
-                            })
-                    
-                    # Get foreign key constraints
-                    cursor.execute(f"PRAGMA foreign_key_list({table_name});")
-                    foreign_keys = cursor.fetchall()
-                    for fk in foreign_keys:
-                        schema[table_name]['constraints'].append({
-                            'type': 'foreign_key',
-                            'from': fk[3],
-                            'to': fk[4],
-                            'table': fk[2]
-                        })
-                    
-                    # Get the first 5 rows of data from the table
-                    cursor.execute(f"SELECT * FROM {table_name} LIMIT 5;")
-                    rows = cursor.fetchall()
-                    schema[table_name]['sample_data'] = rows
-
-        except sqlite3.Error as e:
-            print(f"An error occurred while retrieving the schema: {e}")
-            return None
-        
-        return schema
-    
-    def update_primary_key(self, table_name: str, column_name: str):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Check if the table exists
-            if not self._table_exists(conn, table_name):
-                raise ValueError(f"Table '{table_name}' does not exist in the database.")
-
-            # Check if the column exists in the table
-            cursor.execute(f"PRAGMA table_info({table_name});")
-            columns = cursor.fetchall()
-            column_exists = any(column[1] == column_name for column in columns)
-            
-            if not column_exists:
-                raise ValueError(f"Column '{column_name}' does not exist in table '{table_name}'.")
-
-            # Create a new table with the primary key
-            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table_name}_temp AS SELECT * FROM {table_name};")
-            cursor.execute(f"DROP TABLE {table_name};")
-            
-            column_definitions = ", ".join(
-                f"{col[1]} {col[2]}" + (" PRIMARY KEY" if col[1] == column_name else "")
-                for col in columns
-            )
-            
-            cursor.execute(f"CREATE TABLE {table_name} ({column_definitions});")
-            cursor.execute(f"INSERT INTO {table_name} SELECT * FROM {table_name}_temp;")
-            cursor.execute(f"DROP TABLE {table_name}_temp;")
-            
-            conn.commit()
-            print(f"Primary key added to column '{column_name}' in table '{table_name}'.")
-
-    def remove_primary_key(self, table_name: str):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        # Served from the shared cache; treat the returned dict as read-only
+        return schema_cache.get_schema(self.db_path)
+
+    def get_db_schema_prompt(self) -> Optional[str]:
+        # The serialized form that goes into the text-to-SQL prompt
+        return schema_cache.get_schema_text(self.db_path)
+
+    def _derived(self, name, builder):
+        # Anything computed from the schema or data, memoized until the database changes
+        return schema_cache.get_derived(self.db_path, name, builder)
+
+    def _table_reference(self, table_name: str) -> str:
+        return quote_identifier(table_name)
+
+    def get_table_page(self, table_name: str, after: Optional[int] = None, before: Optional[int] = None,
+                       limit: int = 1000, columns: Optional[List[str]] = None,
+                       filters: Optional[List[tuple]] = None) -> dict:
+        # Keyset paging on rowid: every page is an index seek, however deep into the table it is
+        columns, where, params = self._page_query_parts(table_name, columns, filters)
+        select = ', '.join(quote_identifier(column) for column in columns)
+        if before is not None:
+            where.append("rowid < ?")
+            params.append(before)
+            order = "DESC"
+        else:
+            if after is not None:
+                where.append("rowid > ?")
+                params.append(after)
+            order = "ASC"
+
+        sql = (f"SELECT rowid, {select} FROM {self._table_reference(table_name)}"
+               f"{' WHERE ' + ' AND '.join(where) if where else ''} ORDER BY rowid {order} LIMIT ?;")
+        conn = self._connection_pool.reader()
+        rows = conn.execute(sql, (*params, limit + 1)).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if before is not None:
+            rows.reverse()
+
+        rowids = [row[0] for row in rows]
+        result = SQLiteQueryResult.from_rows(self._result_column_names([(column,) for column in columns]),
+                                             [row[1:] for row in rows])
+        return {
+            'result': result,
+            'first_rowid': rowids[0] if rowids else None,
+            'last_rowid': rowids[-1] if rowids else None,
+            'has_previous': has_more if before is not None else self._has_rows_before(table_name, rowids, filters),
+            'has_next': has_more if before is None else bool(rowids),
+            'total_rows': self.count_rows(table_name, filters=filters),
+        }
+
+    def count_rows(self, table_name: str, filters: Optional[List[tuple]] = None) -> int:
+        # Counts are memoized until the next commit to the database changes its data version
+        _, where, params = self._page_query_parts(table_name, None, filters)
+        sql = (f"SELECT COUNT(*) FROM {self._table_reference(table_name)}"
+               f"{' WHERE ' + ' AND '.join(where) if where else ''};")
+        conn = self._connection_pool.reader()
+        return self._derived(('row_count', sql, tuple(params)), lambda schema: conn.execute(sql, params).fetchone()[0])
+
+    def _has_rows_before(self, table_name: str, rowids: List[int], filters: Optional[List[tuple]]) -> bool:
+        if not rowids:
+            return False
+        _, where, params = self._page_query_parts(table_name, None, filters)
+        where.append("rowid < ?")
+        sql = f"SELECT 1 FROM {self._table_reference(table_name)} WHERE {' AND '.join(where)} LIMIT 1;"
+        return self._connection_pool.reader().execute(sql, (*params, rowids[0])).fetchone() is not None
+
+    def _page_query_parts(self, table_name: str, columns: Optional[List[str]], filters: Optional[List[tuple]]):
+        schema = self.get_db_schema() or {}
+        if table_name not in schema:
+            raise ValueError(f"Table '{table_name}' does not exist in the database.")
+        table_columns = [column['name'] for column in schema[table_name]['columns']]
+        columns = table_columns if not columns else list(columns)
+        for column in columns:
+            if column not in table_columns:
+                raise ValueError(f"Column '{column}' does not exist in table '{table_name}'.")
+
+        # Filters are (column, operator, value) triples; values are always bound, never interpolated
+        where, params = [], []
+        for column, operator, value in filters or []:
+            operator = operator.upper()
+            if column not in table_columns:
+                raise ValueError(f"Column '{column}' does not exist in table '{table_name}'.")
+            if operator not in self._page_filter_operators:
+                raise ValueError(f"Unsupported filter operator '{operator}'.")
+            if value is None and operator in ('=', '!='):
+                where.append(f"{quote_identifier(column)} IS {'NOT ' if operator == '!=' else ''}NULL")
+            else:
+                where.append(f"{quote_identifier(column)} {operator} ?")
+                params.append(value)
+        return columns, where, params
 
-            # Check if the table exists
+    def migrate_table(self, table_name: str, changes: List[dict]) -> dict:
+        # All changes are applied to an in-memory definition first, so a batch costs at most one rebuild
+        with self._connection_pool.writer() as conn:
             if not self._table_exists(conn, table_name):
                 raise ValueError(f"Table '{table_name}' does not exist in the database.")
 
-            # Get the table schema
-            cursor.execute(f"PRAGMA table_info({table_name});")
-            columns = cursor.fetchall()
-
-            # Check if there's a primary key to remove
-            primary_keys = [col for col in columns if col[5] == 1]
-            if not primary_keys:
-                raise ValueError(f"Table '{table_name}' does not have a primary key.")
-
-            # Create a new table without the primary key
-            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table_name}_temp AS SELECT * FROM {table_name};")
-            cursor.execute(f"DROP TABLE {table_name};")
-
-            column_definitions = ", ".join(
-                f"{col[1]} {col[2]}"
-                for col in columns
-            )
-
-            cursor.execute(f"CREATE TABLE {table_name} ({column_definitions});")
-            cursor.execute(f"INSERT INTO {table_name} SELECT * FROM {table_name}_temp;")
-            cursor.execute(f"DROP TABLE {table_name}_temp;")
+            started = time.perf_counter()
+            definition = TableDefinition(conn, table_name)
+            for change in changes:
+                definition.apply(conn, change)
 
+            # DDL does not open a transaction implicitly, so one is opened by hand
             conn.commit()
-            print(f"Primary key removed from table '{table_name}'.")
-
-    def add_foreign_key(self, table_name: str, column_name: str, ref_table_name: str, ref_column_name: str):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-
-            # Check if the table exists
-            if not self._table_exists(conn, table_name):
-                raise ValueError(f"Table '{table_name}' does not exist in the database.")
-
-            # Check if the reference table exists
-            if not self._table_exists(conn, ref_table_name):
-                raise ValueError(f"Reference table '{ref_table_name}' does not exist in the database.")
-
-            # Check if the column exists in the table
-            cursor.execute(f"PRAGMA table_info({table_name});")
-            columns = cursor.fetchall()
-            column_exists = any(column[1] == column_name for column in columns)
-
-            if not column_exists:
-                raise ValueError(f"Column '{column_name}' does not exist in table '{table_name}'.")
-
-            # Check if the reference column exists in the reference table and is a primary key
-            cursor.execute(f"PRAGMA table_info({ref_table_name});")
-            ref_columns = cursor.fetchall()
-            ref_column_info = next((column for column in ref_columns if column[1] == ref_column_name), None)
-
-            if ref_column_info is None:
-                raise ValueError(f"Column '{ref_column_name}' does not exist in reference table '{ref_table_name}'.")
-
-            if ref_column_info[5] != 1:
-                raise ValueError(f"Column '{ref_column_name}' in table '{ref_table_name}' is not a primary key.")
-
-            # Create a new table with the foreign key constraint
-            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table_name}_temp AS SELECT * FROM {table_name};")
-            cursor.execute(f"DROP TABLE {table_name};")
-
-            column_definitions = ", ".join(
-                f"{col[1]} {col[2]}"
-                for col in columns
-            )
-
-            foreign_key_constraint = f", FOREIGN KEY({column_name}) REFERENCES {ref_table_name}({ref_column_name})"
-
-            create_table_query = f"CREATE TABLE {table_name} ({column_definitions}{foreign_key_constraint});"
-
-            cursor.execute(create_table_query)
-            cursor.execute(f"INSERT INTO {table_name} SELECT * FROM {table_name}_temp;")
-            cursor.execute(f"DROP TABLE {table_name}_temp;")
-
+            conn.execute("BEGIN;")
+            rows = 0
+            if definition.needs_rebuild:
+                rows = self._rebuild_table(conn, definition)
+                index_statements = list(definition.indexes.values())
+            else:
+                index_statements = []
+                for name, sql in definition.original_indexes.items():
+                    if definition.indexes.get(name) != sql:
+                        conn.execute(f"DROP INDEX {quote_identifier(name)};")
+                for name, sql in definition.indexes.items():
+                    if definition.original_indexes.get(name) != sql:
+                        index_statements.append(sql)
+            for sql in index_statements:
+                conn.execute(f"{sql};")
+            if definition.needs_rebuild:
+                # A new INTEGER PRIMARY KEY renumbers the rows, and the shadow index is keyed on rowids
+                rebuild_fts_index(conn, table_name)
+            self._rebuild_rollups(conn, table_name)
             conn.commit()
-            print(f"Foreign key added to column '{column_name}' in table '{table_name}', referencing '{ref_column_name}' in table '{ref_table_name}'.")
-
-    def remove_foreign_key(self, table_name: str, column_name: str):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-
-            # Check if the table exists
-            if not self._table_exists(conn, table_name):
-                raise ValueError(f"Table '{table_name}' does not exist in the database.")
-
-            # Get the table schema
-            cursor.execute(f"PRAGMA table_info({table_name});")
-            columns = cursor.fetchall()
 
-            # Check if the column exists in the table
-            column_exists = any(column[1] == column_name for column in columns)
-            if not column_exists:
-                raise ValueError(f"Column '{column_name}' does not exist in table '{table_name}'.")
-
-            # Get foreign keys for the table
-            cursor.execute(f"PRAGMA foreign_key_list({table_name});")
-            foreign_keys = cursor.fetchall()
-
-            # Check if the foreign key exists on the specified column
-            foreign_key_info = next((fk for fk in foreign_keys if fk[3] == column_name), None)
-            if not foreign_key_info:
-                raise ValueError(f"No foreign key constraint found on column '{column_name}' in table '{table_name}'.")
-
-            # Create a new table without the foreign key constraint
-            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table_name}_temp AS SELECT * FROM {table_name};")
-            cursor.execute(f"DROP TABLE {table_name};")
+        seconds = time.perf_counter() - started
+        print(f"Applied {len(changes)} change(s) to table '{table_name}' in {seconds:.3f}s"
+              f"{f' (rebuilt {rows} rows)' if definition.needs_rebuild else ''}.")
+        return {'table': table_name, 'changes': len(changes), 'rebuilt': definition.needs_rebuild,
+                'rows': rows, 'seconds': round(seconds, 3)}
+
+    def _rebuild_table(self, conn: sqlite3.Connection, definition: TableDefinition) -> int:
+        table_name = definition.table_name
+        new_table_name = f"{table_name}__migrate"
+        conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(new_table_name)};")
+        conn.execute(definition.create_table_sql(new_table_name))
+
+        # Rowids are carried over unless the new key takes their place, so anything keyed on them stays valid
+        columns = [quote_identifier(column) for column in definition.column_names]
+        if not definition.has_rowid_alias:
+            columns.insert(0, 'rowid')
+        column_list = ', '.join(columns)
+        cursor = conn.execute(f"INSERT INTO {quote_identifier(new_table_name)} ({column_list}) "
+                              f"SELECT {column_list} FROM {quote_identifier(table_name)};")
+        conn.execute(f"DROP TABLE {quote_identifier(table_name)};")
+        conn.execute(f"ALTER TABLE {quote_identifier(new_table_name)} RENAME TO {quote_identifier(table_name)};")
+        return cursor.rowcount
+
+    def _rebuild_rollups(self, conn: sqlite3.Connection, table_name: str):
+        # A migration can rename or drop what a rollup aggregates; the survivors are recomputed from scratch
+        columns = {column[1] for column in conn.execute(f"PRAGMA table_info({quote_identifier(table_name)});")}
+        for name, rollup in read_rollups(conn, table_name).items():
+            needed = [*rollup['group_by'], *(column for _, column in rollup['measures'] if column != '*')]
+            if all(column in columns for column in needed):
+                refresh_rollup(conn, rollup, full=True)
+            else:
+                drop_rollup(conn, name)
+                print(f"Rollup '{name}' dropped: table '{table_name}' no longer has the columns it aggregates.")
 
-            column_definitions = ", ".join(
-                f"{col[1]} {col[2]}"
-                for col in columns
-            )
+    def update_primary_key(self, table_name: str, column_name: str):
+        self.migrate_table(table_name, [{'op': 'set_primary_key', 'columns': [column_name]}])
+        print(f"Primary key added to column '{column_name}' in table '{table_name}'.")
 
-            create_table_query = f"CREATE TABLE {table_name} ({column_definitions});"
+    def remove_primary_key(self, table_name: str):
+        self.migrate_table(table_name, [{'op': 'drop_primary_key'}])
+        print(f"Primary key removed from table '{table_name}'.")
 
-            cursor.execute(create_table_query)
-            cursor.execute(f"INSERT INTO {table_name} SELECT * FROM {table_name}_temp;")
-            cursor.execute(f"DROP TABLE {table_name}_temp;")
+    def add_foreign_key(self, table_name: str, column_name: str, ref_table_name: str, ref_column_name: str):
+        self.migrate_table(table_name, [{'op': 'add_foreign_key', 'column': column_name,
+                                         'ref_table': ref_table_name, 'ref_column': ref_column_name}])
+        print(f"Foreign key added to column '{column_name}' in table '{table_name}', referencing '{ref_column_name}' in table '{ref_table_name}'.")
 
-            conn.commit()
-            print(f"Foreign key removed from column '{column_name}' in table '{table_name}'.")
+    def remove_foreign_key(self, table_name: str, column_name: str):
+        self.migrate_table(table_name, [{'op': 'drop_foreign_key', 'column': column_name}])
+        print(f"Foreign key removed from column '{column_name}' in table '{table_name}'.")
 
     def execute_query(self, sql: str):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            try:
-                cursor.execute(sql)
-                conn.commit()
-                df = pd.read_sql_query(sql, conn)
-                json_result = df.to_json(orient='records')
-                print(json.dumps(json_result, indent=4))
+        result = self.execute_query_result(sql)
+        return result.to_json() if result is not None else None
+
+    def execute_query_result(self, sql: str, max_rows: Optional[int] = None, max_bytes: Optional[int] = None,
+                             timeout: Optional[float] = None,
+                             max_vm_steps: Optional[int] = None) -> Optional[SQLiteQueryResult]:
+        max_rows = self.result_max_rows if max_rows is None else max_rows
+        max_bytes = self.result_max_bytes if max_bytes is None else max_bytes
+        timeout = self.query_timeout_seconds if timeout is None else timeout
+        max_vm_steps = self.query_max_vm_steps if max_vm_steps is None else max_vm_steps
+
+        cache, cache_key, versions = None, None, None
+        if self.result_cache_enabled and is_cacheable_sql(sql):
+            versions = self._result_cache_versions()
+        if versions is not None:
+            # The caps are part of the key: the same SQL under other caps is a different result
+            cache = get_result_cache()
+            cache_key = cache.key(self.db_path, sql, max_rows, max_bytes)
+            cached = cache.get(cache_key, *versions)
+            current_span().set(result_cache_hit=cached is not None)
+            if cached is not None:
+                print(f"Using cached query result ({cached.row_count} rows)...")
+                return cached
+
+        original_sql = sql
+        if self.fts_rewrite_enabled:
+            sql = self.rewrite_text_search(sql)
+
+        conn = self._connection_pool.reader()
+        cursor = conn.cursor()
+        started = time.perf_counter()
+        budget = self._install_guards(conn, started, timeout, max_vm_steps)
+        columns, rows, nbytes, truncated = [], [], 0, False
+        try:
+            cursor.execute(sql)
+
+            # Statements that return no rows have nothing to fetch
+            if cursor.description is None:
                 print("Query executed successfully...")
-                return json_result
-            except sqlite3.Error as e:
+                return SQLiteQueryResult.empty()
+
+            columns = self._result_column_names(cursor.description)
+            while not truncated:
+                batch = cursor.fetchmany(min(self.result_batch_size, max_rows - len(rows) + 1))
+                if not batch:
+                    break
+                for row in batch:
+                    row_bytes = sum(self._value_size(value) for value in row)
+                    if len(rows) >= max_rows or nbytes + row_bytes > max_bytes:
+                        truncated = True
+                        break
+                    rows.append(row)
+                    nbytes += row_bytes
+        except sqlite3.Error as e:
+            if not budget['exceeded']:
                 print(f"An error occurred while executing the query: {e}")
                 return None
+            # Interrupted by the budget: keep whatever was fetched and say so in the result
+            print(f"Query stopped after exceeding its {budget['exceeded']} budget ({len(rows)} rows fetched)...")
+            return SQLiteQueryResult.from_rows(columns, rows, truncated=True, nbytes=nbytes, timed_out=True)
+        finally:
+            # Release the read snapshot even when the fetch stopped early
+            cursor.close()
+            self._remove_guards(conn)
+
+        result = SQLiteQueryResult.from_rows(columns, rows, truncated=truncated, nbytes=nbytes)
+        print(f"Query executed successfully ({result.row_count} rows{', truncated' if truncated else ''})...")
+        if self.workload_log_enabled:
+            self._record_workload(conn, sql, time.perf_counter() - started, result.row_count)
+        if cache is not None:
+            cache.put(cache_key, *versions, self.db_path, original_sql, result)
+        return result
+
+    def _result_cache_versions(self) -> Optional[tuple]:
+        # In memory the watcher's data_version is exact; on disk only file stats survive a restart
+        version = schema_cache.get_version(self.db_path)
+        if version is None:
+            return None
+        disk_version = file_version(self.db_path)
+        return f"{version}|{disk_version}", disk_version
+
+    def _install_guards(self, conn: sqlite3.Connection, started: float, timeout: Optional[float],
+                        max_vm_steps: Optional[int]) -> dict:
+        budget = {'steps': 0, 'exceeded': None}
+        deadline = started + timeout if timeout else None
+        interval = self.query_progress_interval
+
+        def check_budget() -> int:
+            # A non-zero return interrupts the running statement
+            budget['steps'] += interval
+            if deadline is not None and time.perf_counter() > deadline:
+                budget['exceeded'] = 'time'
+            elif max_vm_steps and budget['steps'] > max_vm_steps:
+                budget['exceeded'] = 'VM step'
+            return 1 if budget['exceeded'] else 0
+
+        def authorize(action, arg1, arg2, db_name, trigger) -> int:
+            # The reader is already read-only; also keep generated SQL from attaching files or changing settings
+            if action in (sqlite3.SQLITE_ATTACH, sqlite3.SQLITE_DETACH):
+                return sqlite3.SQLITE_DENY
+            if action == sqlite3.SQLITE_PRAGMA and arg2 is not None and arg1.lower() not in self._introspection_pragmas:
+                return sqlite3.SQLITE_DENY
+            return sqlite3.SQLITE_OK
+
+        conn.set_progress_handler(check_budget, interval)
+        conn.set_authorizer(authorize)
+        return budget
+
+    def _remove_guards(self, conn: sqlite3.Connection):
+        conn.set_progress_handler(None, 0)
+        conn.set_authorizer(None)
+
+    def _record_workload(self, conn: sqlite3.Connection, sql: str, seconds: float, rows: int):
+        # Logging is best effort; a failure here must never fail the query itself
+        try:
+            plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+            get_workload_log().record(self.db_path, sql, plan, seconds, rows)
+        except sqlite3.Error as e:
+            print(f"An error occurred while recording the query plan: {e}")
+
+    def recommend_indexes(self, limit: int = 10, min_queries: int = 1) -> List[dict]:
+        schema = self.get_db_schema() or {}
+        table_columns = {table_name: [column['name'] for column in table_schema['columns']]
+                         for table_name, table_schema in schema.items()}
+        existing_indexes = read_table_indexes(self._connection_pool.reader(), list(table_columns))
+        advisor = IndexAdvisor(table_columns, existing_indexes)
+        entries = get_workload_log().entries(self.db_path, limit=self.workload_advisor_window)
+        return advisor.recommend(entries, limit=limit, min_queries=min_queries)
+
+    def recommend_rollups(self, limit: int = 5, min_queries: int = 2) -> List[dict]:
+        schema = self.get_db_schema() or {}
+        existing_rollups = read_rollups(self._connection_pool.reader())
+        # Rollups are not themselves worth rolling up
+        table_columns = {table_name: [column['name'] for column in table_schema['columns']]
+                         for table_name, table_schema in schema.items() if table_name not in existing_rollups}
+        advisor = RollupAdvisor(table_columns, existing_rollups)
+        entries = get_workload_log().entries(self.db_path, limit=self.workload_advisor_window)
+        return advisor.recommend(entries, limit=limit, min_queries=min_queries)
+
+    def apply_rollup_recommendations(self, recommendations: Optional[List[dict]] = None) -> List[dict]:
+        recommendations = self.recommend_rollups() if recommendations is None else recommendations
+        return [self.create_rollup(recommendation['table'], recommendation['group_by'], recommendation['measures'],
+                                   name=recommendation['name'])
+                for recommendation in recommendations]
+
+    def apply_index_recommendations(self, recommendations: Optional[List[dict]] = None, replay: bool = True,
+                                    repeat: int = 3) -> List[dict]:
+        recommendations = self.recommend_indexes() if recommendations is None else recommendations
+        statements = list(dict.fromkeys(sql for recommendation in recommendations for sql in recommendation['sql']))
+        before = {sql: self._replay_query(sql, repeat) for sql in statements} if replay else {}
+
+        changes_by_table: Dict[str, List[dict]] = {}
+        for recommendation in recommendations:
+            changes_by_table.setdefault(recommendation['table'], []).append(
+                {'op': 'create_index', 'columns': recommendation['columns'], 'name': recommendation['name']}
+            )
+        for table_name, changes in changes_by_table.items():
+            self.migrate_table(table_name, changes)
+        with self._connection_pool.writer() as conn:
+            # Refresh planner statistics for the new indexes
+            conn.execute("PRAGMA optimize;")
+
+        after = {sql: self._replay_query(sql, repeat) for sql in statements} if replay else {}
+        report = []
+        for recommendation in recommendations:
+            replays = [
+                {'sql': sql, 'before_ms': before[sql], 'after_ms': after[sql]}
+                for sql in recommendation['sql'] if before.get(sql) is not None and after.get(sql) is not None
+            ]
+            report.append({'table': recommendation['table'], 'index': recommendation['name'],
+                           'columns': recommendation['columns'], 'replays': replays})
+            for replayed in replays:
+                print(f"Index '{recommendation['name']}': {replayed['before_ms']:.2f}ms -> {replayed['after_ms']:.2f}ms "
+                      f"for {replayed['sql']!r}")
+        return report
+
+    def _replay_query(self, sql: str, repeat: int = 3) -> Optional[float]:
+        # Median wall time of a full fetch, in milliseconds
+        conn = self._connection_pool.reader()
+        timings = []
+        try:
+            for _ in range(max(repeat, 1)):
+                started = time.perf_counter()
+                cursor = conn.execute(sql)
+                for _ in cursor:
+                    pass
+                timings.append((time.perf_counter() - started) * 1000)
+        except sqlite3.Error as e:
+            print(f"An error occurred while replaying the query: {e}")
+            return None
+        timings.sort()
+        return round(timings[len(timings) // 2], 3)
+
+    def _result_column_names(self, description) -> List[str]:
+        # Duplicate names (e.g. from joins) would collapse in a columnar result; a suffix may itself be taken
+        columns, used, suffixes = [], set(), {}
+        for column in description:
+            base = name = column[0]
+            while name in used:
+                suffixes[base] = suffixes.get(base, 0) + 1
+                name = f"{base}_{suffixes[base]}"
+            used.add(name)
+            columns.append(name)
+        return columns
+
+    def _value_size(self, value) -> int:
+        if isinstance(value, (str, bytes)):
+            return len(value)
+        return 8
@@ -0,0 +1,512 @@
+import csv
+import datetime
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from queue import Empty
+from typing import Optional, Callable, Dict, Iterable, Iterator, List, Sequence
+
+# Same strings pandas.read_csv treats as missing by default
+NA_VALUES = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+})
+
+# Called as progress_callback(rows_loaded, bytes_read, total_bytes)
+ProgressCallback = Callable[[int, int, int], None]
+
+
+def normalize_table_name(name: str) -> str:
+    table_name = re.sub(r'\s+', '_', name.lower().strip())
+    return re.sub(r'[^a-zA-Z0-9_]', '', table_name)
+
+
+def normalize_column_names(columns: Sequence[str]) -> List[str]:
+    names, seen = [], {}
+    for position, column in enumerate(columns):
+        name = re.sub(r'\s+', '_', str(column).lower().strip()) or f"unnamed:_{position}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}_{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def infer_column_types(sample_rows: Sequence[Sequence], column_count: int) -> List[str]:
+    # Pick the narrowest SQLite affinity that holds every non-missing sample value
+    types = []
+    for position in range(column_count):
+        affinity = None
+        for row in sample_rows:
+            value = row[position] if position < len(row) else None
+            if value is None:
+                continue
+            value_affinity = _value_affinity(value)
+            if value_affinity == 'TEXT':
+                affinity = 'TEXT'
+                break
+            if affinity != 'REAL':
+                affinity = value_affinity
+        types.append(affinity or 'TEXT')
+    return types
+
+
+def _value_affinity(value) -> str:
+    if isinstance(value, int):
+        return 'INTEGER'
+    if isinstance(value, float):
+        return 'REAL'
+    if not isinstance(value, str):
+        return 'TEXT'
+    try:
+        int(value)
+        return 'INTEGER'
+    except ValueError:
+        pass
+    try:
+        float(value)
+        return 'REAL'
+    except ValueError:
+        return 'TEXT'
+
+
+def create_table(conn: sqlite3.Connection, table_name: str, columns: Sequence[str], types: Sequence[str]):
+    column_definitions = ", ".join(f"{quote_identifier(column)} {column_type}" for column, column_type in zip(columns, types))
+    conn.execute(f"CREATE TABLE {quote_identifier(table_name)} ({column_definitions});")
+
+
+@contextmanager
+def bulk_load_pragmas(conn: sqlite3.Connection, cache_size: int = -256 * 1024, table_name: Optional[str] = None,
+                      created: bool = False):
+    # Durability is traded for speed only for the duration of the load. The safety
+    # level cannot change inside a transaction, so commit around the switch
+    conn.commit()
+    synchronous = conn.execute("PRAGMA synchronous;").fetchone()[0]
+    previous_cache_size = conn.execute("PRAGMA cache_size;").fetchone()[0]
+    conn.execute("PRAGMA synchronous=OFF;")
+    conn.execute(f"PRAGMA cache_size={cache_size};")
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        # A failed load leaves nothing behind. A table this load created is dropped, slices committed
+        # along the way included; an append must run as a single transaction, which the rollback undoes
+        conn.rollback()
+        if table_name is not None and created:
+            conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(table_name)};")
+            conn.commit()
+        raise
+    finally:
+        conn.execute(f"PRAGMA synchronous={synchronous};")
+        conn.execute(f"PRAGMA cache_size={previous_cache_size};")
+
+
+def bulk_insert(conn: sqlite3.Connection, table_name: str, columns: Sequence[str], rows: Iterable[Sequence],
+                chunk_size: int = 10_000, rows_per_transaction: Optional[int] = 500_000,
+                on_chunk: Optional[Callable[[int], None]] = None) -> int:
+    insert_query = (
+        f"INSERT INTO {quote_identifier(table_name)} ({', '.join(quote_identifier(column) for column in columns)}) "
+        f"VALUES ({', '.join('?' for _ in columns)});"
+    )
+    total, uncommitted, chunk = 0, 0, []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            conn.executemany(insert_query, chunk)
+            total += len(chunk)
+            uncommitted += len(chunk)
+            chunk = []
+            # Commit in large slices so the WAL stays bounded on huge files
+            if rows_per_transaction and uncommitted >= rows_per_transaction:
+                conn.commit()
+                uncommitted = 0
+            if on_chunk:
+                on_chunk(total)
+    if chunk:
+        conn.executemany(insert_query, chunk)
+        total += len(chunk)
+        if on_chunk:
+            on_chunk(total)
+    return total
+
+
+def fit_row(row: Sequence[str], column_count: int) -> List[Optional[str]]:
+    values = [None if value in NA_VALUES else value for value in row[:column_count]]
+    if len(values) < column_count:
+        values.extend([None] * (column_count - len(values)))
+    return values
+
+
+class CSVReader:
+    """Streams a CSV file row by row while tracking how many bytes have been read."""
+
+    def __init__(self, csv_file: Path, sample_size: int = 1000):
+        self.path = Path(csv_file)
+        self.total_bytes = self.path.stat().st_size
+        self._raw = open(self.path, 'rb')
+        self._reader = csv.reader(io.TextIOWrapper(self._raw, encoding='utf-8-sig', newline=''))
+        header = next(self._reader, [])
+        self.columns = normalize_column_names(header)
+        non_blank_rows = (row for row in self._reader if row)
+        self.sample = [fit_row(row, len(self.columns)) for _, row in zip(range(sample_size), non_blank_rows)]
+        self.types = infer_column_types(self.sample, len(self.columns))
+
+    @property
+    def bytes_read(self) -> int:
+        return self.total_bytes if self._raw.closed else self._raw.tell()
+
+    def rows(self) -> Iterator[List[Optional[str]]]:
+        column_count = len(self.columns)
+        try:
+            yield from self.sample
+            self.sample = []
+            for row in self._reader:
+                if row:
+                    yield fit_row(row, column_count)
+        finally:
+            self.close()
+
+    def close(self):
+        self._raw.close()
+
+
+def sqlite_value(value):
+    # Spreadsheet and JSON values that sqlite3 cannot bind natively
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat(sep=' ') if isinstance(value, datetime.datetime) else value.isoformat()
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, str) and value in NA_VALUES:
+        return None
+    return value
+
+
+class XLSXSheetReader:
+    """Streams one worksheet of a workbook opened in openpyxl's read-only mode."""
+
+    def __init__(self, worksheet, sample_size: int = 1000, sheet_count: int = 1, workbook_rows: int = 0):
+        self.title = worksheet.title
+        self.sheet_count = sheet_count
+        # Rows every sheet of the workbook declares, headers included; 0 when a sheet does not say
+        self.declared_rows = worksheet.max_row or 0
+        self.workbook_rows = workbook_rows
+        self._rows = worksheet.iter_rows(values_only=True)
+        header = next(self._rows, ())
+        # Read-only sheets often report trailing empty columns; trim them off the header
+        while header and header[-1] is None:
+            header = header[:-1]
+        self.columns = normalize_column_names(header)
+        self.sample = []
+        for row in self._rows:
+            if len(self.sample) >= sample_size:
+                self._pending = row
+                break
+            if any(value is not None for value in row):
+                self.sample.append(self._fit(row))
+        else:
+            self._pending = None
+        self.types = infer_column_types(self.sample, len(self.columns))
+
+    def _fit(self, row: Sequence) -> List:
+        values = [sqlite_value(value) for value in row[:len(self.columns)]]
+        values.extend([None] * (len(self.columns) - len(values)))
+        return values
+
+    def rows(self) -> Iterator[List]:
+        yield from self.sample
+        self.sample = []
+        if self._pending is not None and any(value is not None for value in self._pending):
+            yield self._fit(self._pending)
+        for row in self._rows:
+            if any(value is not None for value in row):
+                yield self._fit(row)
+
+
+def iter_xlsx_sheets(xlsx_file: Path, sample_size: int = 1000) -> Iterator[XLSXSheetReader]:
+    import openpyxl
+
+    # read_only streams rows from the sheet XML instead of building the whole workbook in memory
+    workbook = openpyxl.load_workbook(xlsx_file, read_only=True, data_only=True)
+    try:
+        declared = [worksheet.max_row for worksheet in workbook.worksheets]
+        workbook_rows = sum(declared) if all(declared) else 0
+        for worksheet in workbook.worksheets:
+            yield XLSXSheetReader(worksheet, sample_size=sample_size, sheet_count=len(workbook.worksheets),
+                                  workbook_rows=workbook_rows)
+    finally:
+        workbook.close()
+
+
+class JSONRecordReader:
+    """Incrementally decodes a JSON array, JSON Lines, or concatenated JSON objects."""
+
+    def __init__(self, json_file: Path, read_size: int = 1 << 20):
+        self.path = Path(json_file)
+        self.total_bytes = self.path.stat().st_size
+        self.read_size = read_size
+        self._raw = open(self.path, 'rb')
+        self._text = io.TextIOWrapper(self._raw, encoding='utf-8-sig')
+        self._decoder = json.JSONDecoder()
+
+    @property
+    def bytes_read(self) -> int:
+        return self.total_bytes if self._raw.closed else self._raw.tell()
+
+    def records(self) -> Iterator[dict]:
+        buffer, position, at_end = '', 0, False
+        try:
+            while True:
+                # Skip whitespace and the punctuation between top-level records
+                while position < len(buffer) and buffer[position] in ' \t\r\n,[]':
+                    position += 1
+                if position >= len(buffer) or not at_end and len(buffer) - position < self.read_size // 2:
+                    chunk = self._text.read(self.read_size)
+                    buffer, position = buffer[position:] + chunk, 0
+                    if not chunk:
+                        at_end = True
+                        if not buffer.strip(' \t\r\n,[]'):
+                            return
+                    continue
+                try:
+                    value, end = self._decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if at_end:
+                        raise
+                    # The record runs past the buffered text; read more and retry
+                    chunk = self._text.read(self.read_size)
+                    buffer, position = buffer[position:] + chunk, 0
+                    at_end = not chunk
+                    continue
+                position = end
+                yield value if isinstance(value, dict) else {'value': value}
+        finally:
+            self.close()
+
+    def close(self):
+        self._text.close()
+
+
+def insert_records(conn: sqlite3.Connection, table_name: str, records: Iterable[dict], sample_size: int = 1000,
+                   chunk_size: int = 10_000, on_chunk: Optional[Callable[[int], None]] = None) -> int:
+    # Columns come from the first records; keys that show up later are added with ALTER TABLE
+    records = iter(records)
+    sample = [record for _, record in zip(range(sample_size), records)]
+    if not sample:
+        raise ValueError(f"No records found to create table '{table_name}'.")
+    keys: List[str] = []
+    for record in sample:
+        keys.extend(key for key in record if key not in keys)
+    columns = normalize_column_names(keys)
+    key_columns = dict(zip(keys, columns))
+    types = infer_column_types([[sqlite_value(record.get(key)) for key in keys] for record in sample], len(keys))
+    create_table(conn, table_name, columns, types)
+
+    def rows() -> Iterator[List]:
+        for record in itertools.chain(sample, records):
+            new_keys = [key for key in record if key not in key_columns]
+            if new_keys:
+                yield None
+                for key in new_keys:
+                    column = normalize_column_names(columns + [key])[-1]
+                    conn.execute(f"ALTER TABLE {quote_identifier(table_name)} ADD COLUMN {quote_identifier(column)} "
+                                 f"{_value_affinity(sqlite_value(record[key])) if record[key] is not None else 'TEXT'};")
+                    key_columns[key] = column
+                    keys.append(key)
+                    columns.append(column)
+            yield [sqlite_value(record.get(key)) for key in keys]
+
+    total = 0
+    batch: List[List] = []
+    for row in rows():
+        # A None marker means the column set is about to change; flush what is buffered first
+        if row is None or len(batch) >= chunk_size:
+            if batch:
+                total += bulk_insert(conn, table_name, columns[:len(batch[0])], batch,
+                                     chunk_size=chunk_size, rows_per_transaction=None)
+                batch = []
+                if on_chunk:
+                    on_chunk(total)
+            if row is None:
+                continue
+        batch.append(row)
+    if batch:
+        total += bulk_insert(conn, table_name, columns[:len(batch[0])], batch,
+                             chunk_size=chunk_size, rows_per_transaction=None)
+        if on_chunk:
+            on_chunk(total)
+    return total
+
+
+def convert_value(value: Optional[str], affinity: str):
+    # Do SQLite's affinity conversion up front so parsing workers, not the writer, pay for it
+    if value is None or affinity == 'TEXT':
+        return value
+    try:
+        return int(value) if affinity == 'INTEGER' else float(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+
+_worker_queue = None
+
+
+def _init_parse_worker(queue):
+    global _worker_queue
+    _worker_queue = queue
+    # Messages left in the queue once the writer stops reading must not keep the process from exiting
+    queue.cancel_join_thread()
+
+
+def _parse_csv_worker(csv_file: str, sample_size: int, chunk_size: int):
+    # Runs in a pool process; every message goes through the bounded queue to the single writer
+    try:
+        reader = CSVReader(Path(csv_file), sample_size=sample_size)
+        _worker_queue.put(('schema', csv_file, (reader.columns, reader.types)))
+        chunk = []
+        for row in reader.rows():
+            chunk.append(tuple(convert_value(value, affinity) for value, affinity in zip(row, reader.types)))
+            if len(chunk) >= chunk_size:
+                _worker_queue.put(('rows', csv_file, chunk))
+                chunk = []
+        if chunk:
+            _worker_queue.put(('rows', csv_file, chunk))
+        _worker_queue.put(('done', csv_file, reader.total_bytes))
+    except Exception as e:
+        _worker_queue.put(('error', csv_file, f"{type(e).__name__}: {e}"))
+
+
+@contextmanager
+def _drop_unfinished_tables(conn: sqlite3.Connection, tables: Dict[str, str], columns: Dict[str, List[str]],
+                            pending: set):
+    # An interrupted writer would otherwise leave the tables of files still in flight half loaded
+    try:
+        yield
+    except BaseException:
+        conn.rollback()
+        for csv_file in columns:
+            if csv_file in pending:
+                conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(tables[csv_file])};")
+        conn.commit()
+        raise
+
+
+def _stop_workers(executor: ProcessPoolExecutor, futures: Dict, queue):
+    # Running workers may be blocked on the full queue, and shutdown waits for them, so it is drained meanwhile;
+    # jobs that never started are cancelled
+    executor.shutdown(wait=False, cancel_futures=True)
+    while not all(future.done() for future in futures):
+        try:
+            queue.get(timeout=0.1)
+        except Empty:
+            pass
+
+
+def parallel_import_csv_files(conn: sqlite3.Connection, jobs: Sequence[tuple], workers: Optional[int] = None,
+                              sample_size: int = 1000, chunk_size: int = 10_000, queue_size: int = 16,
+                              rows_per_transaction: int = 500_000,
+                              progress_callback: Optional[ProgressCallback] = None) -> List[dict]:
+    """Parse (csv_file, table_name) jobs in a process pool and write them through one connection."""
+    if not jobs:
+        return []
+
+    # Forking a multithreaded process (such as the Streamlit server) can deadlock the children
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue(maxsize=queue_size)
+    tables = {str(csv_file): table_name for csv_file, table_name in jobs}
+    reports = {
+        str(csv_file): {'file': str(csv_file), 'table': table_name, 'rows': 0, 'seconds': 0.0, 'error': None,
+                        'skipped': False}
+        for csv_file, table_name in jobs
+    }
+    columns: Dict[str, List[str]] = {}
+    total_bytes = sum(Path(csv_file).stat().st_size for csv_file, _ in jobs)
+    file_started: Dict[str, float] = {}
+    bytes_done, rows_done, uncommitted = 0, 0, 0
+    started = time.perf_counter()
+
+    workers = workers or min(os.cpu_count() or 1, len(jobs))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_parse_worker, initargs=(queue,)) as executor:
+        futures = {executor.submit(_parse_csv_worker, str(csv_file), sample_size, chunk_size): str(csv_file)
+                   for csv_file, _ in jobs}
+        pending = set(reports)
+
+        try:
+            with bulk_load_pragmas(conn), _drop_unfinished_tables(conn, tables, columns, pending):
+                while pending:
+                    try:
+                        kind, csv_file, payload = queue.get(timeout=0.5)
+                    except Empty:
+                        # A worker that died without reporting would otherwise stall the writer forever
+                        for future, future_file in futures.items():
+                            if future_file in pending and future.done() and future.exception() is not None:
+                                reports[future_file]['error'] = f"{type(future.exception()).__name__}: {future.exception()}"
+                                pending.discard(future_file)
+                        continue
+
+                    report = reports[csv_file]
+                    if csv_file not in pending:
+                        continue
+                    if kind == 'schema':
+                        file_started[csv_file] = time.perf_counter()
+                        file_columns, types = payload
+                        if not file_columns:
+                            kind, payload = 'error', "ValueError: the file has no header row"
+                        else:
+                            try:
+                                create_table(conn, tables[csv_file], file_columns, types)
+                                columns[csv_file] = file_columns
+                            except sqlite3.Error as e:
+                                kind, payload = 'error', f"{type(e).__name__}: {e}"
+                    if kind == 'rows':
+                        conn.executemany(
+                            f"INSERT INTO {quote_identifier(tables[csv_file])} VALUES ({', '.join('?' for _ in columns[csv_file])});",
+                            payload,
+                        )
+                        report['rows'] += len(payload)
+                        rows_done += len(payload)
+                        uncommitted += len(payload)
+                        if uncommitted >= rows_per_transaction:
+                            conn.commit()
+                            uncommitted = 0
+                    elif kind == 'done':
+                        bytes_done += payload
+                        report['seconds'] = round(time.perf_counter() - file_started.get(csv_file, started), 3)
+                        pending.discard(csv_file)
+                        print(f"Table '{tables[csv_file]}' created from file '{csv_file}' ({report['rows']} rows).")
+                    elif kind == 'error':
+                        # Leave no half-loaded table behind
+                        if csv_file in columns:
+                            conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(tables[csv_file])};")
+                        report['error'] = payload
+                        report['rows'] = 0
+                        report['seconds'] = round(time.perf_counter() - file_started.get(csv_file, started), 3)
+                        pending.discard(csv_file)
+                        print(f"Failed to import file '{csv_file}': {payload}")
+
+                    if progress_callback and kind in ('rows', 'done'):
+                        progress_callback(rows_done, bytes_done, total_bytes)
+        finally:
+            # A failed writer, or a file dropped after an error, leaves workers with rows nobody will read
+            _stop_workers(executor, futures, queue)
+
+    return [reports[str(csv_file)] for csv_file, _ in jobs]
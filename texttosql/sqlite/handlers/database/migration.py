@@ -0,0 +1,154 @@
+import sqlite3
+from typing import Dict, List, Optional, Sequence
+
+from texttosql.sqlite.handlers.database.ingest import quote_identifier
+
+# Supported operations for SQLiteDatabaseHandler.migrate_table, e.g.
+#   {'op': 'set_primary_key', 'columns': ['id']}
+#   {'op': 'drop_primary_key'}
+#   {'op': 'add_foreign_key', 'column': 'program_id', 'ref_table': 'programs', 'ref_column': 'id'}
+#   {'op': 'drop_foreign_key', 'column': 'program_id'}
+#   {'op': 'create_index', 'columns': ['fy', 'program'], 'name': None, 'unique': False}
+#   {'op': 'drop_index', 'name': 'idx_budget_fy'}
+MIGRATION_OPERATIONS = (
+    'set_primary_key', 'drop_primary_key', 'add_foreign_key', 'drop_foreign_key', 'create_index', 'drop_index',
+)
+
+
+class TableDefinition:
+    """Columns, keys and indexes of one table, edited in memory before a migration."""
+
+    def __init__(self, conn: sqlite3.Connection, table_name: str):
+        self.table_name = table_name
+        info = conn.execute(f"PRAGMA table_info({quote_identifier(table_name)});").fetchall()
+        self.columns = [
+            {'name': column[1], 'type': column[2], 'notnull': bool(column[3]), 'default': column[4]}
+            for column in info
+        ]
+        self.primary_key = [column[1] for column in sorted((c for c in info if c[5]), key=lambda c: c[5])]
+
+        foreign_keys = {}
+        for fk in conn.execute(f"PRAGMA foreign_key_list({quote_identifier(table_name)});"):
+            entry = foreign_keys.setdefault(fk[0], {'columns': [], 'ref_table': fk[2], 'ref_columns': [],
+                                                    'on_update': fk[5], 'on_delete': fk[6]})
+            entry['columns'].append(fk[3])
+            entry['ref_columns'].append(fk[4])
+        self.foreign_keys = [foreign_keys[key] for key in sorted(foreign_keys)]
+
+        # Automatic indexes (from UNIQUE/PRIMARY KEY) have no SQL and come back with the table
+        self.indexes: Dict[str, str] = dict(conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type='index' AND tbl_name=? AND sql IS NOT NULL;",
+            (table_name,)
+        ).fetchall())
+        self.original_indexes = dict(self.indexes)
+        self.needs_rebuild = False
+
+    @property
+    def column_names(self) -> List[str]:
+        return [column['name'] for column in self.columns]
+
+    @property
+    def has_rowid_alias(self) -> bool:
+        # A lone INTEGER PRIMARY KEY is the rowid itself
+        if len(self.primary_key) != 1:
+            return False
+        column = next(column for column in self.columns if column['name'] == self.primary_key[0])
+        return column['type'].upper() == 'INTEGER'
+
+    def apply(self, conn: sqlite3.Connection, change: dict):
+        op = change.get('op')
+        if op not in MIGRATION_OPERATIONS:
+            raise ValueError(f"Unknown migration operation '{op}'. Expected one of {', '.join(MIGRATION_OPERATIONS)}.")
+
+        if op == 'set_primary_key':
+            columns = change.get('columns') or [change['column']]
+            self._check_columns(columns)
+            self.primary_key = list(columns)
+            self.needs_rebuild = True
+
+        elif op == 'drop_primary_key':
+            if not self.primary_key:
+                raise ValueError(f"Table '{self.table_name}' does not have a primary key.")
+            self.primary_key = []
+            self.needs_rebuild = True
+
+        elif op == 'add_foreign_key':
+            column, ref_table, ref_column = change['column'], change['ref_table'], change['ref_column']
+            self._check_columns([column])
+            self._check_reference(conn, ref_table, ref_column)
+            self.foreign_keys.append({'columns': [column], 'ref_table': ref_table, 'ref_columns': [ref_column],
+                                      'on_update': change.get('on_update', 'NO ACTION'),
+                                      'on_delete': change.get('on_delete', 'NO ACTION')})
+            self.needs_rebuild = True
+
+        elif op == 'drop_foreign_key':
+            column = change['column']
+            self._check_columns([column])
+            remaining = [fk for fk in self.foreign_keys if column not in fk['columns']]
+            if len(remaining) == len(self.foreign_keys):
+                raise ValueError(f"No foreign key constraint found on column '{column}' in table '{self.table_name}'.")
+            self.foreign_keys = remaining
+            self.needs_rebuild = True
+
+        elif op == 'create_index':
+            columns = change.get('columns') or [change['column']]
+            self._check_columns(columns)
+            name = change.get('name') or f"idx_{self.table_name}_{'_'.join(columns)}"
+            if name in self.indexes:
+                raise ValueError(f"Index '{name}' already exists on table '{self.table_name}'.")
+            self.indexes[name] = (
+                f"CREATE {'UNIQUE ' if change.get('unique') else ''}INDEX {quote_identifier(name)} "
+                f"ON {quote_identifier(self.table_name)} ({', '.join(quote_identifier(c) for c in columns)})"
+            )
+
+        elif op == 'drop_index':
+            if change['name'] not in self.indexes:
+                raise ValueError(f"Index '{change['name']}' does not exist on table '{self.table_name}'.")
+            del self.indexes[change['name']]
+
+    def create_table_sql(self, table_name: str) -> str:
+        definitions = []
+        for column in self.columns:
+            definition = f"{quote_identifier(column['name'])} {column['type']}".rstrip()
+            if column['notnull']:
+                definition += " NOT NULL"
+            if column['default'] is not None:
+                definition += f" DEFAULT {column['default']}"
+            definitions.append(definition)
+        if self.primary_key:
+            definitions.append(f"PRIMARY KEY ({_column_list(self.primary_key)})")
+        for fk in self.foreign_keys:
+            references = quote_identifier(fk['ref_table'])
+            if all(fk['ref_columns']):
+                references += f" ({_column_list(fk['ref_columns'])})"
+            definitions.append(f"FOREIGN KEY ({_column_list(fk['columns'])}) REFERENCES {references}"
+                               f" ON UPDATE {fk['on_update']} ON DELETE {fk['on_delete']}")
+        return f"CREATE TABLE {quote_identifier(table_name)} ({', '.join(definitions)});"
+
+    def _check_columns(self, columns: Sequence[str]):
+        names = set(self.column_names)
+        for column in columns:
+            if column not in names:
+                raise ValueError(f"Column '{column}' does not exist in table '{self.table_name}'.")
+
+    def _check_reference(self, conn: sqlite3.Connection, ref_table: str, ref_column: str):
+        # A self-reference must point at the primary key this migration leaves behind
+        if ref_table == self.table_name:
+            if ref_column not in self.column_names:
+                raise ValueError(f"Column '{ref_column}' does not exist in reference table '{ref_table}'.")
+            if self.primary_key != [ref_column]:
+                raise ValueError(f"Column '{ref_column}' in table '{ref_table}' is not a primary key.")
+            return
+
+        info = conn.execute(f"PRAGMA table_info({quote_identifier(ref_table)});").fetchall()
+        if not info:
+            raise ValueError(f"Reference table '{ref_table}' does not exist in the database.")
+        ref_column_info = next((column for column in info if column[1] == ref_column), None)
+        if ref_column_info is None:
+            raise ValueError(f"Column '{ref_column}' does not exist in reference table '{ref_table}'.")
+        if ref_column_info[5] != 1:
+            raise ValueError(f"Column '{ref_column}' in table '{ref_table}' is not a primary key.")
+
+
+def _column_list(columns: Sequence[Optional[str]]) -> str:
+    return ', '.join(quote_identifier(column) for column in columns)
@@ -0,0 +1,198 @@
+import sqlite3
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Dict, Tuple, Iterator, List, Callable
+
+
+class PooledConnection(sqlite3.Connection):
+    # Subclassed only so the pool can track connections through weak references
+    pass
+
+
+class SQLiteConnectionPool:
+    """Long-lived, pre-tuned connections for one database file.
+
+    Every thread gets its own read-only connection; writes go through a single
+    writer connection guarded by a lock, so readers never contend with each
+    other and WAL lets them keep reading while the writer commits. Only the
+    writer switches a file to WAL, so a database that is never written to is
+    left exactly as it was on disk.
+    """
+
+    reader_pragmas = {
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+        'temp_store': 'MEMORY',
+        'query_only': 'ON',
+    }
+    writer_pragmas = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+        'temp_store': 'MEMORY',
+    }
+
+    def __init__(self, db_path: str):
+        self.db_path = os.path.abspath(db_path)
+        self.file_id = self._file_id()
+        self._local = threading.local()
+        self._writer = None
+        self._writer_lock = threading.RLock()
+        self._connections = weakref.WeakSet()
+
+    def reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Reading never touches the file; it only switches to WAL once the writer is first used
+            conn = self._connect(f"file:{self.db_path}?mode=ro", self.reader_pragmas, uri=True)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        with self._writer_lock:
+            conn = self._get_writer()
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        for listener in list(_commit_listeners):
+            listener(self.db_path)
+
+    def close(self):
+        with self._writer_lock:
+            for conn in list(self._connections):
+                conn.close()
+            self._writer = None
+
+    def _get_writer(self) -> sqlite3.Connection:
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = self._connect(self.db_path, self.writer_pragmas)
+            return self._writer
+
+    def _connect(self, database: str, pragmas: Dict[str, object], uri: bool = False) -> sqlite3.Connection:
+        conn = sqlite3.connect(database, uri=uri, check_same_thread=False, factory=PooledConnection)
+        for pragma, value in pragmas.items():
+            conn.execute(f"PRAGMA {pragma}={value};")
+        self._connections.add(conn)
+        return conn
+
+    def _file_id(self) -> Tuple[int, int]:
+        stat = os.stat(self.db_path)
+        return stat.st_dev, stat.st_ino
+
+
+class SQLiteFederatedPool:
+    """Read-only connections with several database files attached side by side.
+
+    Each thread gets an in-memory main database with every member attached
+    read-only under its own schema name, so one statement can join tables
+    from different files without copying any data.
+    """
+
+    # SQLite's default compile-time limit on attached databases
+    max_attached = 10
+    connection_pragmas = {
+        'temp_store': 'MEMORY',
+        'query_only': 'ON',
+    }
+    schema_pragmas = {
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+    }
+
+    def __init__(self, members: Dict[str, str]):
+        if len(members) > self.max_attached:
+            raise ValueError(f"At most {self.max_attached} databases can be attached to one connection.")
+        self.members = {alias: os.path.abspath(path) for alias, path in members.items()}
+        self.file_ids = self._file_ids()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = weakref.WeakSet()
+
+    def reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect("file::memory:", uri=True, check_same_thread=False, factory=PooledConnection)
+            for pragma, value in self.connection_pragmas.items():
+                conn.execute(f"PRAGMA {pragma}={value};")
+            for alias, path in self.members.items():
+                conn.execute("ATTACH DATABASE ? AS " + _quote(alias) + ";", (f"file:{path}?mode=ro",))
+                for pragma, value in self.schema_pragmas.items():
+                    conn.execute(f"PRAGMA {_quote(alias)}.{pragma}={value};")
+            with self._lock:
+                self._connections.add(conn)
+            self._local.conn = conn
+        return conn
+
+    def writer(self):
+        raise ValueError("Federated databases are read-only; write to the member databases instead.")
+
+    def close(self):
+        with self._lock:
+            for conn in list(self._connections):
+                conn.close()
+
+    def _file_ids(self) -> Tuple[Tuple[int, int], ...]:
+        return tuple((os.stat(path).st_dev, os.stat(path).st_ino) for path in self.members.values())
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+_commit_listeners: List[Callable[[str], None]] = []
+
+
+def add_commit_listener(listener: Callable[[str], None]):
+    # Called with the database path after every commit through a pool's writer
+    if listener not in _commit_listeners:
+        _commit_listeners.append(listener)
+
+
+_pools: Dict[str, SQLiteConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str) -> SQLiteConnectionPool:
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        # A replaced file needs fresh connections; the old ones still see the unlinked inode
+        if pool is not None and pool.file_id != pool._file_id():
+            pool.close()
+            pool = None
+        if pool is None:
+            pool = SQLiteConnectionPool(key)
+            _pools[key] = pool
+        return pool
+
+
+def close_pool(db_path: str):
+    with _pools_lock:
+        pool = _pools.pop(os.path.abspath(db_path), None)
+    if pool is not None:
+        pool.close()
+
+
+_federated_pools: Dict[Tuple[Tuple[str, str], ...], SQLiteFederatedPool] = {}
+
+
+def get_federated_pool(members: Dict[str, str]) -> SQLiteFederatedPool:
+    key = tuple(sorted((alias, os.path.abspath(path)) for alias, path in members.items()))
+    with _pools_lock:
+        pool = _federated_pools.get(key)
+        # Any member replaced on disk means every connection holds a stale attachment
+        if pool is not None and pool.file_ids != pool._file_ids():
+            pool.close()
+            pool = None
+        if pool is None:
+            pool = SQLiteFederatedPool(dict(key))
+            _federated_pools[key] = pool
+        return pool
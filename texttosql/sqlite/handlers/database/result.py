@@ -0,0 +1,87 @@
+import json
+import numpy as np
+from typing import Optional, Dict, List, Any
+
+
+class SQLiteQueryResult:
+    """Columnar result of a single statement, with JSON produced only on demand."""
+
+    def __init__(self, columns: List[str], data: Dict[str, np.ndarray], row_count: int,
+                 truncated: bool = False, nbytes: int = 0, timed_out: bool = False):
+        self.columns = columns
+        self.data = data
+        self.row_count = row_count
+        self.truncated = truncated or timed_out
+        self.timed_out = timed_out
+        self.nbytes = nbytes
+        self._json: Optional[str] = None
+
+    @classmethod
+    def from_rows(cls, columns: List[str], rows: List[tuple], truncated: bool = False, nbytes: int = 0,
+                  timed_out: bool = False):
+        # Transpose the fetched rows once into one array per column
+        if rows:
+            column_values = list(zip(*rows))
+        else:
+            column_values = [() for _ in columns]
+        data = {name: cls._to_array(values) for name, values in zip(columns, column_values)}
+        return cls(columns, data, len(rows), truncated=truncated, nbytes=nbytes, timed_out=timed_out)
+
+    @classmethod
+    def empty(cls):
+        return cls([], {}, 0)
+
+    @staticmethod
+    def _to_array(values: tuple) -> np.ndarray:
+        # Keep NULLs and mixed storage classes in object arrays so nothing is coerced
+        kinds = {type(value) for value in values}
+        if kinds == {int}:
+            try:
+                return np.array(values, dtype=np.int64)
+            except OverflowError:
+                return np.array(values, dtype=object)
+        if kinds and kinds <= {int, float}:
+            return np.array(values, dtype=np.float64)
+        array = np.empty(len(values), dtype=object)
+        array[:] = values
+        return array
+
+    @property
+    def status(self) -> str:
+        # 'ok', 'truncated' (a row/byte cap was hit) or 'timed_out' (the execution budget ran out)
+        if self.timed_out:
+            return 'timed_out'
+        return 'truncated' if self.truncated else 'ok'
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    def __bool__(self) -> bool:
+        return self.row_count > 0
+
+    def __str__(self) -> str:
+        return self.to_json()
+
+    def __repr__(self) -> str:
+        return f"SQLiteQueryResult(columns={self.columns}, rows={self.row_count}, status={self.status!r})"
+
+    def rows(self) -> List[tuple]:
+        return list(zip(*(self.data[name].tolist() for name in self.columns)))
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        return [dict(zip(self.columns, row)) for row in self.rows()]
+
+    def to_json(self) -> str:
+        if self._json is None:
+            self._json = json.dumps(self.to_records(), default=self._json_default)
+        return self._json
+
+    def to_pandas(self):
+        import pandas as pd
+        return pd.DataFrame({name: self.data[name] for name in self.columns}, columns=self.columns)
+
+    @staticmethod
+    def _json_default(value):
+        if isinstance(value, bytes):
+            return value.hex()
+        return str(value)
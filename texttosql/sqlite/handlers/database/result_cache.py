@@ -0,0 +1,274 @@
+import base64
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+from texttosql.sqlite.handlers.database.advisor import tokenize_sql
+from texttosql.sqlite.handlers.database.result import SQLiteQueryResult
+from texttosql.sqlite.handlers.database.pool import add_commit_listener
+
+# Statements whose result depends on more than the data cannot be served from a cache
+_VOLATILE_FUNCTIONS = {'random', 'randomblob', 'changes', 'total_changes', 'last_insert_rowid'}
+_VOLATILE_KEYWORDS = {'current_date', 'current_time', 'current_timestamp'}
+# Date and time functions mean "now" when called without a time value; the value is this argument (0-based)
+_TIME_VALUE_ARGUMENT = {'date': 0, 'time': 0, 'datetime': 0, 'julianday': 0, 'unixepoch': 0, 'strftime': 1}
+
+
+def canonicalize_sql(sql: str) -> str:
+    # Keywords and bare names are case-insensitive in SQLite; literals and quoted names are kept verbatim
+    parts = []
+    for kind, value, start, end in tokenize_sql(sql, spans=True):
+        text = sql[start:end]
+        parts.append(text if kind == 'literal' or text[0] in '"`[' else text.lower())
+    while parts and parts[-1] == ';':
+        parts.pop()
+    return ' '.join(parts)
+
+
+def is_cacheable_sql(sql: str) -> bool:
+    tokens = tokenize_sql(sql)
+    if not tokens or tokens[0][1].lower() not in ('select', 'with', 'values'):
+        return False
+    for position, (kind, value) in enumerate(tokens):
+        if kind == 'keyword' and value in _VOLATILE_KEYWORDS:
+            return False
+        if kind == 'literal' and value.lower() == "'now'":
+            return False
+        following = tokens[position + 1][1] if position + 1 < len(tokens) else ''
+        if kind == 'identifier' and value.lower() in _VOLATILE_FUNCTIONS and following == '(':
+            return False
+        if kind == 'identifier' and value.lower() in _TIME_VALUE_ARGUMENT and following == '(':
+            if _argument_count(tokens, position + 1) <= _TIME_VALUE_ARGUMENT[value.lower()]:
+                return False
+    return True
+
+
+def _argument_count(tokens, open_position: int) -> int:
+    # Top-level arguments of the call whose opening parenthesis is at open_position
+    depth, count = 0, 0
+    for _, value in tokens[open_position:]:
+        if value == '(':
+            depth += 1
+        elif value == ')':
+            depth -= 1
+            if depth == 0:
+                return count
+        elif depth == 1 and count == 0:
+            count = 1
+        if depth == 1 and value == ',':
+            count += 1
+    return count
+
+
+def file_version(db_path: str) -> str:
+    # Survives restarts, unlike data_version: the database file plus its WAL, which every commit touches
+    parts = []
+    for path in (db_path, f"{db_path}-wal"):
+        try:
+            stat = os.stat(path)
+            parts.append(f"{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}")
+        except OSError:
+            parts.append('-')
+    return '|'.join(parts)
+
+
+class SQLiteResultCache:
+    """Results of generated SQL, kept in memory and in a local SQLite side file.
+
+    Entries are keyed on the database and the canonical SQL text. An entry
+    is only served while the database is still at the version it was read
+    at: the watcher's data_version in memory, and file stats on disk, so a
+    cached result never outlives a commit. Both tiers evict least recently
+    used entries once over their byte budget.
+    """
+
+    def __init__(self, path: Optional[str] = '.texttosql_results.sqlite', max_memory_bytes: int = 256 * 1024 * 1024,
+                 max_disk_bytes: int = 1024 * 1024 * 1024, max_entry_bytes: int = 32 * 1024 * 1024):
+        self.path = path
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'invalidations': 0}
+        self._memory: "OrderedDict[str, Tuple[str, str, SQLiteQueryResult]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL;")
+            self._conn.execute("PRAGMA synchronous=NORMAL;")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS texttosql_results (
+                    key TEXT PRIMARY KEY,
+                    db_path TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    sql TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    nbytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                );
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS texttosql_results_last_used ON texttosql_results(last_used);")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS texttosql_results_db_path ON texttosql_results(db_path);")
+
+    def key(self, db_path: str, sql: str, *options) -> str:
+        text = '\0'.join([os.path.abspath(db_path), canonicalize_sql(sql), *map(str, options)])
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get(self, key: str, memory_version: str, disk_version: str) -> Optional[SQLiteQueryResult]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] == memory_version:
+                    self._memory.move_to_end(key)
+                    self.stats['memory_hits'] += 1
+                    return entry[2]
+                self._drop_memory(key)
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT version, db_path, result FROM texttosql_results WHERE key = ?;", (key,)
+                ).fetchone()
+                if row is not None and row[0] == disk_version:
+                    self._conn.execute(
+                        "UPDATE texttosql_results SET last_used = ?, hits = hits + 1 WHERE key = ?;", (time.time(), key)
+                    )
+                    result = self._loads(row[2])
+                    self._remember(key, memory_version, row[1], result)
+                    self.stats['disk_hits'] += 1
+                    return result
+                if row is not None:
+                    self._conn.execute("DELETE FROM texttosql_results WHERE key = ?;", (key,))
+
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, key: str, memory_version: str, disk_version: str, db_path: str, sql: str,
+            result: SQLiteQueryResult):
+        # Partial results from an interrupted statement are not the answer to the query
+        if result.timed_out or result.nbytes > self.max_entry_bytes:
+            return
+        with self._lock:
+            self._remember(key, memory_version, os.path.abspath(db_path), result)
+            if self._conn is not None:
+                now = time.time()
+                self._conn.execute("BEGIN;")
+                try:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO texttosql_results "
+                        "(key, db_path, version, sql, result, nbytes, created_at, last_used, hits) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0);",
+                        (key, os.path.abspath(db_path), disk_version, sql, self._dumps(result), result.nbytes, now, now),
+                    )
+                    self._evict_disk()
+                    self._conn.execute("COMMIT;")
+                except sqlite3.Error:
+                    self._conn.execute("ROLLBACK;")
+                    raise
+            self.stats['stores'] += 1
+
+    def invalidate(self, db_path: Optional[str] = None):
+        db_path = os.path.abspath(db_path) if db_path is not None else None
+        with self._lock:
+            for key in [key for key, entry in self._memory.items() if db_path is None or entry[1] == db_path]:
+                self._drop_memory(key)
+            if self._conn is not None:
+                if db_path is None:
+                    self._conn.execute("DELETE FROM texttosql_results;")
+                else:
+                    self._conn.execute("DELETE FROM texttosql_results WHERE db_path = ?;", (db_path,))
+            self.stats['invalidations'] += 1
+
+    def clear(self):
+        self.invalidate()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            disk_entries, disk_bytes = (self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM texttosql_results;"
+            ).fetchone() if self._conn is not None else (0, 0))
+            memory_entries, memory_bytes = len(self._memory), self._memory_bytes
+        hits = self.stats['memory_hits'] + self.stats['disk_hits']
+        lookups = hits + self.stats['misses']
+        return {**self.stats, 'hit_rate': hits / lookups if lookups else 0.0, 'memory_entries': memory_entries,
+                'memory_bytes': memory_bytes, 'disk_entries': disk_entries, 'disk_bytes': disk_bytes}
+
+    def _remember(self, key: str, memory_version: str, db_path: str, result: SQLiteQueryResult):
+        self._drop_memory(key)
+        # The db path rides along so invalidate() can find the entries of one database
+        self._memory[key] = (memory_version, db_path, result)
+        self._memory_bytes += result.nbytes
+        while self._memory_bytes > self.max_memory_bytes and self._memory:
+            oldest = next(iter(self._memory))
+            self._drop_memory(oldest)
+            self.stats['evictions'] += 1
+
+    def _drop_memory(self, key: str):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry[2].nbytes
+
+    def _evict_disk(self):
+        # Least recently used entries go first once the file holds more than its byte budget
+        total = self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM texttosql_results;").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        freed = 0
+        for key, nbytes in self._conn.execute(
+            "SELECT key, nbytes FROM texttosql_results ORDER BY last_used;"
+        ).fetchall():
+            if total - freed <= self.max_disk_bytes:
+                break
+            self._conn.execute("DELETE FROM texttosql_results WHERE key = ?;", (key,))
+            freed += nbytes
+            self.stats['evictions'] += 1
+
+    @staticmethod
+    def _dumps(result: SQLiteQueryResult) -> str:
+        return json.dumps({
+            'columns': result.columns,
+            'rows': [[_encode_value(value) for value in row] for row in result.rows()],
+            'truncated': result.truncated,
+            'nbytes': result.nbytes,
+        })
+
+    @staticmethod
+    def _loads(payload: str) -> SQLiteQueryResult:
+        data = json.loads(payload)
+        rows = [tuple(_decode_value(value) for value in row) for row in data['rows']]
+        return SQLiteQueryResult.from_rows(data['columns'], rows, truncated=data['truncated'], nbytes=data['nbytes'])
+
+
+def _encode_value(value):
+    # JSON has no bytes; BLOBs travel as tagged base64
+    if isinstance(value, bytes):
+        return {'$blob': base64.b64encode(value).decode('ascii')}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        return base64.b64decode(value['$blob'])
+    return value
+
+
+_result_cache: Optional[SQLiteResultCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> SQLiteResultCache:
+    # Opened on first use so importing the handler never touches the disk; an empty path keeps it in memory
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = SQLiteResultCache(path=os.getenv('TEXTTOSQL_RESULT_CACHE_PATH', '.texttosql_results.sqlite') or None)
+            # Writes through this process's pools drop the entries right away instead of waiting for eviction
+            add_commit_listener(_result_cache.invalidate)
+        return _result_cache
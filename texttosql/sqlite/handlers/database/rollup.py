@@ -0,0 +1,286 @@
+import json
+import sqlite3
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from texttosql.sqlite.handlers.database.ingest import quote_identifier
+from texttosql.sqlite.handlers.database.advisor import tokenize_sql, table_aliases, _CLAUSE_KEYWORDS
+
+ROLLUP_INFIX = '__rollup_'
+ROLLUP_METADATA_TABLE = '__rollups'
+ROLLUP_FUNCTIONS = ('count', 'sum', 'min', 'max', 'avg')
+
+# How two partial aggregates of the same group combine; NULL stands for "no non-NULL values yet"
+_MERGE = {
+    'count': "{old} + {new}",
+    'sum': "CASE WHEN {old} IS NULL THEN {new} WHEN {new} IS NULL THEN {old} ELSE {old} + {new} END",
+    'min': "COALESCE(MIN({old}, {new}), {old}, {new})",
+    'max': "COALESCE(MAX({old}, {new}), {old}, {new})",
+}
+
+
+def rollup_table_name(table_name: str, name: str) -> str:
+    return f"{table_name}{ROLLUP_INFIX}{name}"
+
+
+def is_rollup_metadata_table(table_name: str) -> bool:
+    return table_name == ROLLUP_METADATA_TABLE
+
+
+def measure_columns(function: str, column: str) -> List[Tuple[str, str, str]]:
+    # (stored column, aggregate over base rows, merge function); AVG is kept as its SUM and COUNT
+    function = function.lower()
+    if function not in ROLLUP_FUNCTIONS:
+        raise ValueError(f"Unsupported rollup aggregate '{function}'.")
+    if column == '*':
+        if function != 'count':
+            raise ValueError("Only COUNT can aggregate '*'.")
+        return [('row_count', 'COUNT(*)', 'count')]
+    if function == 'avg':
+        return measure_columns('sum', column) + measure_columns('count', column)
+    return [(f"{function}_{column}", f"{function.upper()}({quote_identifier(column)})", function)]
+
+
+def stored_columns(measures: Sequence[Tuple[str, str]]) -> List[Tuple[str, str, str, str]]:
+    # Every column a rollup keeps besides its keys, COUNT(*) first; AVG(x) next to SUM(x) shares sum_x
+    stored = {}
+    for function, column in [('count', '*'), *measures]:
+        for name, expression, merge in measure_columns(function, column):
+            stored.setdefault(name, (name, expression, merge, column))
+    return list(stored.values())
+
+
+def read_rollups(conn: sqlite3.Connection, table_name: Optional[str] = None) -> Dict[str, dict]:
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?;",
+                          (ROLLUP_METADATA_TABLE,)).fetchone()
+    if not exists:
+        return {}
+    sql = (f"SELECT name, base_table, group_by, measures, last_rowid, refreshed_at "
+           f"FROM {quote_identifier(ROLLUP_METADATA_TABLE)}")
+    rows = conn.execute(sql + (" WHERE base_table = ?;" if table_name else ";"),
+                        (table_name,) if table_name else ()).fetchall()
+    return {
+        name: {'name': name, 'table': base_table, 'group_by': json.loads(group_by),
+               'measures': [tuple(measure) for measure in json.loads(measures)], 'last_rowid': last_rowid,
+               'refreshed_at': refreshed_at}
+        for name, base_table, group_by, measures, last_rowid, refreshed_at in rows
+    }
+
+
+def describe_rollup(rollup: dict) -> dict:
+    # What the model sees next to the rollup table's columns in the schema
+    measures = {name: expression.replace('"', '') for name, expression, _, _ in stored_columns(rollup['measures'])}
+    return {
+        'source_table': rollup['table'],
+        'group_by': rollup['group_by'],
+        'measures': measures,
+        'usage': (f"Pre-aggregated summary of {rollup['table']}, one row per distinct {', '.join(rollup['group_by'])}. "
+                  f"Prefer it over {rollup['table']} for totals, counts, minimums and maximums by these columns: "
+                  f"re-aggregate with SUM of sums and counts, MIN of mins and MAX of maxes; an average is "
+                  f"SUM(sum_x) / SUM(count_x)."),
+    }
+
+
+def create_rollup(conn: sqlite3.Connection, table_name: str, group_by: Sequence[str],
+                  measures: Sequence[Tuple[str, str]], name: str) -> dict:
+    info = conn.execute(f"PRAGMA table_info({quote_identifier(table_name)});").fetchall()
+    types = {column[1]: column[2] for column in info}
+    for column in [*group_by, *(column for _, column in measures if column != '*')]:
+        if column not in types:
+            raise ValueError(f"Column '{column}' does not exist in table '{table_name}'.")
+    if not group_by:
+        raise ValueError("A rollup needs at least one GROUP BY column.")
+
+    rollup_table = rollup_table_name(table_name, name)
+    # COUNT(*) is always kept: it is what tells an empty group from a missing one
+    measures = [(function.lower(), column) for function, column in measures
+                if (function.lower(), column) != ('count', '*')]
+    stored = stored_columns(measures)
+    names = [*group_by, *(column_name for column_name, _, _, _ in stored)]
+    if len(set(names)) != len(names):
+        raise ValueError(f"The columns of rollup '{rollup_table}' would not be unique: {names}.")
+
+    definitions = [f"{quote_identifier(column)} {types[column]}" for column in group_by]
+    for column_name, _, merge, source in stored:
+        definitions.append(f"{quote_identifier(column_name)} {'INTEGER' if merge == 'count' else types[source]}")
+
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {quote_identifier(ROLLUP_METADATA_TABLE)} (
+            name TEXT PRIMARY KEY,
+            base_table TEXT NOT NULL,
+            group_by TEXT NOT NULL,
+            measures TEXT NOT NULL,
+            last_rowid INTEGER NOT NULL DEFAULT 0,
+            refreshed_at REAL
+        );
+    """)
+    conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(rollup_table)};")
+    conn.execute(f"CREATE TABLE {quote_identifier(rollup_table)} ({', '.join(definitions)});")
+    conn.execute(f"CREATE INDEX {quote_identifier(rollup_table + '_groups')} ON {quote_identifier(rollup_table)} "
+                 f"({', '.join(quote_identifier(column) for column in group_by)});")
+    conn.execute(f"INSERT OR REPLACE INTO {quote_identifier(ROLLUP_METADATA_TABLE)} "
+                 f"(name, base_table, group_by, measures, last_rowid) VALUES (?, ?, ?, ?, 0);",
+                 (rollup_table, table_name, json.dumps(list(group_by)), json.dumps([list(m) for m in measures])))
+    rollup = read_rollups(conn, table_name)[rollup_table]
+    rows = refresh_rollup(conn, rollup, full=True)
+    return {'name': rollup_table, 'table': table_name, 'group_by': list(group_by), 'measures': measures,
+            'groups': conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(rollup_table)};").fetchone()[0],
+            'rows': rows}
+
+
+def drop_rollup(conn: sqlite3.Connection, rollup_table: str):
+    conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(rollup_table)};")
+    if read_rollups(conn):
+        conn.execute(f"DELETE FROM {quote_identifier(ROLLUP_METADATA_TABLE)} WHERE name = ?;", (rollup_table,))
+
+
+def refresh_rollup(conn: sqlite3.Connection, rollup: dict, full: bool = False) -> int:
+    """Folds base rows past the rollup's rowid watermark into it; returns the rows folded in.
+
+    Loads only ever append, and appended rows get rowids above every existing
+    one, so the delta is a rowid range seek. A table whose INTEGER PRIMARY KEY
+    stands in for the rowid can receive rows anywhere and is rebuilt in full.
+    """
+    table = quote_identifier(rollup['table'])
+    rollup_table = quote_identifier(rollup['name'])
+    info = conn.execute(f"PRAGMA table_info({table});").fetchall()
+    primary_key = [column for column in info if column[5]]
+    if full or (len(primary_key) == 1 and primary_key[0][2].upper() == 'INTEGER'):
+        conn.execute(f"DELETE FROM {rollup_table};")
+        # Explicit keys may be zero or negative, so a full pass has no lower bound
+        rowids, params = "rowid <= ?", ()
+    else:
+        rowids, params = "rowid > ? AND rowid <= ?", (rollup['last_rowid'],)
+    last_rowid = conn.execute(f"SELECT MAX(rowid) FROM {table};").fetchone()[0] or 0
+    params = (*params, last_rowid)
+
+    keys = [quote_identifier(column) for column in rollup['group_by']]
+    stored = stored_columns(rollup['measures'])
+    delta = (f"SELECT {', '.join(keys)}, "
+             f"{', '.join(f'{expression} AS {quote_identifier(name)}' for name, expression, _, _ in stored)} "
+             f"FROM {table} WHERE {rowids} GROUP BY {', '.join(keys)}")
+    # IS rather than = so NULL keys land in their own group, as GROUP BY puts them
+    matches = ' AND '.join(f"{rollup_table}.{key} IS delta.{key}" for key in keys)
+    assignments = ', '.join(
+        f"{quote_identifier(name)} = "
+        + _MERGE[merge].format(old=f"{rollup_table}.{quote_identifier(name)}", new=f"delta.{quote_identifier(name)}")
+        for name, _, merge, _ in stored
+    )
+    column_list = ', '.join([*keys, *(quote_identifier(name) for name, _, _, _ in stored)])
+
+    rows = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {rowids};", params).fetchone()[0]
+    if rows:
+        conn.execute(f"UPDATE {rollup_table} SET {assignments} FROM ({delta}) AS delta WHERE {matches};", params)
+        conn.execute(f"INSERT INTO {rollup_table} ({column_list}) SELECT {column_list} FROM ({delta}) AS delta "
+                     f"WHERE NOT EXISTS (SELECT 1 FROM {rollup_table} WHERE {matches});", params)
+    conn.execute(f"UPDATE {quote_identifier(ROLLUP_METADATA_TABLE)} SET last_rowid = ?, refreshed_at = ? "
+                 f"WHERE name = ?;", (last_rowid, time.time(), rollup['name']))
+    return rows
+
+
+class RollupAdvisor:
+    """Mines a workload log for single-table GROUP BY aggregations worth materializing."""
+
+    def __init__(self, table_columns: Dict[str, List[str]], existing_rollups: Dict[str, dict],
+                 max_group_columns: int = 4):
+        self.table_columns = {table: {column.lower(): column for column in columns}
+                              for table, columns in table_columns.items()}
+        self.existing_rollups = existing_rollups
+        self.max_group_columns = max_group_columns
+
+    def recommend(self, entries: List[dict], limit: int = 5, min_queries: int = 2) -> List[dict]:
+        candidates = {}
+        for entry in entries:
+            candidate = self.candidate(entry['sql'])
+            if candidate is None:
+                continue
+            table_name, group_by, measures = candidate
+            merged = candidates.setdefault((table_name, frozenset(group_by)), {
+                'table': table_name, 'group_by': group_by, 'measures': [],
+                'queries': 0, 'total_seconds': 0.0, 'sql': [],
+            })
+            merged['measures'].extend(measure for measure in measures if measure not in merged['measures'])
+            merged['queries'] += 1
+            merged['total_seconds'] += entry['seconds']
+            if entry['sql'] not in merged['sql']:
+                merged['sql'].append(entry['sql'])
+
+        # A rollup over more columns answers every query grouped by a subset of them
+        for key, candidate in list(candidates.items()):
+            wider = [other for other_key, other in candidates.items()
+                     if other_key[0] == key[0] and other_key[1] > key[1]]
+            if wider:
+                target = max(wider, key=lambda other: other['total_seconds'])
+                target['measures'].extend(measure for measure in candidate['measures']
+                                          if measure not in target['measures'])
+                target['queries'] += candidate['queries']
+                target['total_seconds'] += candidate['total_seconds']
+                target['sql'].extend(sql for sql in candidate['sql'] if sql not in target['sql'])
+                del candidates[key]
+
+        recommendations = []
+        for candidate in sorted(candidates.values(), key=lambda c: (-c['total_seconds'], -c['queries'])):
+            if candidate['queries'] < min_queries or self._is_covered(candidate):
+                continue
+            candidate['total_seconds'] = round(candidate['total_seconds'], 6)
+            candidate['name'] = '_'.join(candidate['group_by'])
+            candidate['reason'] = (f"{candidate['queries']} statement(s) aggregated '{candidate['table']}' by "
+                                   f"{', '.join(candidate['group_by'])} ({candidate['total_seconds']:.3f}s in total)")
+            recommendations.append(candidate)
+        return recommendations[:limit]
+
+    def candidate(self, sql: str) -> Optional[Tuple[str, List[str], List[Tuple[str, str]]]]:
+        # Only the plain shape a rollup can answer: one table, bare GROUP BY columns, aggregates of bare columns
+        tokens = tokenize_sql(sql)
+        values = [value for _, value in tokens]
+        if values.count('select') != 1 or 'join' in values or 'group' not in values or 'distinct' in values:
+            return None
+        tables = set(table_aliases(tokens, self.table_columns).values())
+        if len(tables) != 1:
+            return None
+        table_name = tables.pop()
+        columns = self.table_columns[table_name]
+
+        group_by, filtered, referenced, measures = [], [], [], []
+        clause, position = None, 0
+        while position < len(tokens):
+            kind, value = tokens[position]
+            following = values[position + 1] if position + 1 < len(tokens) else ''
+            if kind == 'keyword' and value in _CLAUSE_KEYWORDS:
+                clause = value
+            elif kind == 'identifier' and value.lower() in ROLLUP_FUNCTIONS and following == '(':
+                close = values.index(')', position) if ')' in values[position:] else len(values)
+                inner = tokens[position + 2:close]
+                if [value for _, value in inner] == ['*'] and value.lower() == 'count':
+                    measure = ('count', '*')
+                elif inner and inner[-1][0] == 'identifier' and inner[-1][1].lower() in columns \
+                        and (len(inner) == 1 or (len(inner) == 3 and inner[1][1] == '.')):
+                    measure = (value.lower(), columns[inner[-1][1].lower()])
+                else:
+                    return None
+                if measure not in measures:
+                    measures.append(measure)
+                position = close
+            elif kind == 'identifier' and value.lower() in columns and following not in ('.', '('):
+                column = columns[value.lower()]
+                target = {'group': group_by, 'where': filtered, 'having': filtered}.get(clause, referenced)
+                if column not in target:
+                    target.append(column)
+            position += 1
+
+        # Filtered columns must survive aggregation, so they join the grouping
+        keys = group_by + [column for column in filtered if column not in group_by]
+        if not group_by or not measures or len(keys) > self.max_group_columns:
+            return None
+        if any(column not in keys for column in referenced):
+            return None
+        return table_name, keys, measures
+
+    def _is_covered(self, candidate: dict) -> bool:
+        needed = {name for name, _, _, _ in stored_columns(candidate['measures'])}
+        for rollup in self.existing_rollups.values():
+            if rollup['table'] != candidate['table'] or not set(candidate['group_by']) <= set(rollup['group_by']):
+                continue
+            if needed <= {name for name, _, _, _ in stored_columns(rollup['measures'])}:
+                return True
+        return False
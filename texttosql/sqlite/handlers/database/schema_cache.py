@@ -0,0 +1,198 @@
+import sqlite3
+import os
+import threading
+from typing import Optional, Dict, List, Tuple, Any
+
+from texttosql.sqlite.handlers.database.fts import is_fts_table
+from texttosql.sqlite.handlers.database.rollup import is_rollup_metadata_table, read_rollups, describe_rollup
+
+
+class SQLiteSchemaCache:
+    """Process-wide cache of introspected schemas, keyed on the database file.
+
+    Each database gets a long-lived watcher connection. `PRAGMA schema_version`
+    and `PRAGMA data_version` on that connection tell us whether anything was
+    committed since the last look, so a warm lookup costs two pragmas instead
+    of a full round of table introspection.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get_schema(self, db_path: str) -> Optional[Dict[str, Dict[str, List[Dict[str, str]]]]]:
+        entry = self._refresh(db_path)
+        return entry['schema'] if entry else None
+
+    def get_schema_text(self, db_path: str) -> Optional[str]:
+        entry = self._refresh(db_path)
+        if not entry:
+            return None
+        if entry['text'] is None:
+            entry['text'] = str(entry['schema'])
+        return entry['text']
+
+    def get_version(self, db_path: str) -> Optional[Tuple[int, int]]:
+        entry = self._refresh(db_path)
+        return entry['version'] if entry else None
+
+    def get_derived(self, db_path: str, name: str, builder):
+        # Memoize anything computed from the schema until the schema changes
+        entry = self._refresh(db_path)
+        if not entry:
+            return None
+        if name not in entry['derived']:
+            entry['derived'][name] = builder(entry['schema'])
+        return entry['derived'][name]
+
+    def invalidate(self, db_path: Optional[str] = None):
+        with self._lock:
+            keys = list(self._entries) if db_path is None else [os.path.abspath(db_path)]
+            for key in keys:
+                entry = self._entries.pop(key, None)
+                if entry:
+                    entry['conn'].close()
+
+    def _refresh(self, db_path: str) -> Optional[Dict[str, Any]]:
+        key = os.path.abspath(db_path)
+        if not os.path.exists(key):
+            print(f"Database '{db_path}' does not exist.")
+            return None
+
+        with self._lock:
+            try:
+                entry = self._entries.get(key)
+                file_id = self._file_id(key)
+
+                # The file was replaced underneath us, so the watcher is stale
+                if entry and entry['file_id'] != file_id:
+                    entry['conn'].close()
+                    entry = None
+
+                if entry is None:
+                    conn = sqlite3.connect(f"file:{key}?mode=ro", uri=True, check_same_thread=False)
+                    entry = {
+                        'conn': conn,
+                        'file_id': file_id,
+                        'version': None,
+                        'tables': {},
+                        'schema': {},
+                        'text': None,
+                        'derived': {},
+                    }
+                    self._entries[key] = entry
+
+                cursor = entry['conn'].cursor()
+                version = self._read_version(cursor)
+                if version == entry['version']:
+                    return entry
+
+                if entry['version'] is None or version[0] != entry['version'][0]:
+                    self._rebuild_changed_tables(cursor, entry)
+                else:
+                    # Only data moved; the structure is intact, so just resample rows
+                    for table_name, table_schema in entry['schema'].items():
+                        table_schema['sample_data'] = self._read_sample_data(cursor, table_name)
+
+                entry['version'] = version
+                entry['text'] = None
+                entry['derived'] = {}
+                return entry
+            except sqlite3.Error as e:
+                print(f"An error occurred while retrieving the schema: {e}")
+                self._entries.pop(key, None)
+                return None
+
+    def _rebuild_changed_tables(self, cursor: sqlite3.Cursor, entry: Dict[str, Any]):
+        # The DDL of a table plus its indexes is the table's fingerprint
+        cursor.execute("SELECT type, name, tbl_name, sql FROM sqlite_master WHERE type IN ('table', 'index');")
+        ddl: Dict[str, List[str]] = {}
+        for obj_type, name, tbl_name, sql in cursor.fetchall():
+            # Full-text shadow indexes and rollup bookkeeping are execution details, not schema the model sees
+            if is_fts_table(tbl_name) or is_rollup_metadata_table(tbl_name):
+                continue
+            if obj_type == 'table':
+                ddl.setdefault(name, []).insert(0, sql or '')
+            else:
+                ddl.setdefault(tbl_name, []).append(sql or name)
+
+        schema = {}
+        for table_name, statements in ddl.items():
+            fingerprint = tuple(statements)
+            if entry['tables'].get(table_name) == fingerprint:
+                schema[table_name] = entry['schema'][table_name]
+                schema[table_name]['sample_data'] = self._read_sample_data(cursor, table_name)
+            else:
+                schema[table_name] = self._read_table_schema(cursor, table_name)
+                entry['tables'][table_name] = fingerprint
+
+        for table_name in set(entry['tables']) - set(schema):
+            del entry['tables'][table_name]
+
+        # Rollups say what they summarize, so the model can pick them over a scan of the source table
+        for rollup_name, rollup in read_rollups(cursor.connection).items():
+            if rollup_name in schema:
+                schema[rollup_name]['rollup'] = describe_rollup(rollup)
+
+        entry['schema'] = schema
+
+    def _read_table_schema(self, cursor: sqlite3.Cursor, table_name: str) -> Dict[str, List[Dict[str, str]]]:
+        table_schema = {
+            'columns': [],
+            'constraints': [],
+            'sample_data': []
+        }
+
+        # Get the columns and their data types
+        cursor.execute(f"PRAGMA table_info({table_name});")
+        for column in cursor.fetchall():
+            table_schema['columns'].append({
+                'name': column[1],
+                'type': column[2],
+                'primary_key': bool(column[5])
+            })
+
+        # Get table constraints (like unique, foreign keys, etc.)
+        cursor.execute(f"PRAGMA index_list({table_name});")
+        for index in cursor.fetchall():
+            index_name = index[1]
+            cursor.execute(f"PRAGMA index_info({index_name});")
+            index_info = cursor.fetchall()
+            if index_info:
+                table_schema['constraints'].append({
+                    'index_name': index_name,
+                    'columns': [info[2] for info in index_info],
+                    'unique': bool(index[2])
+                })
+
+        # Get foreign key constraints
+        cursor.execute(f"PRAGMA foreign_key_list({table_name});")
+        for fk in cursor.fetchall():
+            table_schema['constraints'].append({
+                'type': 'foreign_key',
+                'from': fk[3],
+                'to': fk[4],
+                'table': fk[2]
+            })
+
+        table_schema['sample_data'] = self._read_sample_data(cursor, table_name)
+        return table_schema
+
+    def _read_sample_data(self, cursor: sqlite3.Cursor, table_name: str) -> List[tuple]:
+        # Get the first 5 rows of data from the table
+        cursor.execute(f"SELECT * FROM {table_name} LIMIT 5;")
+        return cursor.fetchall()
+
+    def _read_version(self, cursor: sqlite3.Cursor) -> Tuple[int, int]:
+        cursor.execute("PRAGMA schema_version;")
+        schema_version = cursor.fetchone()[0]
+        cursor.execute("PRAGMA data_version;")
+        data_version = cursor.fetchone()[0]
+        return schema_version, data_version
+
+    def _file_id(self, path: str) -> Tuple[int, int]:
+        stat = os.stat(path)
+        return stat.st_dev, stat.st_ino
+
+
+schema_cache = SQLiteSchemaCache()
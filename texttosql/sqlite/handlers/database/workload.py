@@ -0,0 +1,77 @@
+import sqlite3
+import json
+import os
+import threading
+import time
+from typing import Optional, List, Dict, Any
+
+
+class SQLiteWorkloadLog:
+    """Local log of executed statements with their query plans and timings.
+
+    Kept in a SQLite side file so the index advisor can mine what the
+    generated SQL actually does across sessions.
+    """
+
+    def __init__(self, path: str = '.texttosql_workload.sqlite', max_entries: int = 50_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("PRAGMA synchronous=NORMAL;")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS texttosql_workload (
+                id INTEGER PRIMARY KEY,
+                db_path TEXT NOT NULL,
+                sql TEXT NOT NULL,
+                plan TEXT NOT NULL,
+                seconds REAL NOT NULL,
+                rows INTEGER NOT NULL,
+                executed_at REAL NOT NULL
+            );
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS texttosql_workload_db_path ON texttosql_workload(db_path, id);")
+
+    def record(self, db_path: str, sql: str, plan: List[str], seconds: float, rows: int):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO texttosql_workload (db_path, sql, plan, seconds, rows, executed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?);",
+                (os.path.abspath(db_path), sql, json.dumps(plan), seconds, rows, time.time()),
+            )
+            # Oldest statements go first once the log is over capacity
+            self._conn.execute("DELETE FROM texttosql_workload WHERE id <= "
+                               "(SELECT MAX(id) FROM texttosql_workload) - ?;", (self.max_entries,))
+
+    def entries(self, db_path: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT sql, plan, seconds, rows, executed_at FROM texttosql_workload "
+                "WHERE db_path = ? ORDER BY id DESC LIMIT ?;",
+                (os.path.abspath(db_path), -1 if limit is None else limit),
+            ).fetchall()
+        return [
+            {'sql': sql, 'plan': json.loads(plan), 'seconds': seconds, 'rows': row_count, 'executed_at': executed_at}
+            for sql, plan, seconds, row_count, executed_at in rows
+        ]
+
+    def clear(self, db_path: Optional[str] = None):
+        with self._lock:
+            if db_path is None:
+                self._conn.execute("DELETE FROM texttosql_workload;")
+            else:
+                self._conn.execute("DELETE FROM texttosql_workload WHERE db_path = ?;", (os.path.abspath(db_path),))
+
+
+_workload_log: Optional[SQLiteWorkloadLog] = None
+_workload_log_lock = threading.Lock()
+
+
+def get_workload_log() -> SQLiteWorkloadLog:
+    # Opened on first use so importing the handler never touches the disk
+    global _workload_log
+    with _workload_log_lock:
+        if _workload_log is None:
+            _workload_log = SQLiteWorkloadLog(path=os.getenv('TEXTTOSQL_WORKLOAD_PATH', '.texttosql_workload.sqlite'))
+        return _workload_log
@@ -0,0 +1,138 @@
+import sqlite3
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Optional, Dict, Any
+
+# Words that change the phrasing of a question but not what it asks for
+_FILLER_WORDS = {
+    'a', 'an', 'the', 'please', 'kindly', 'can', 'could', 'would', 'you',
+    'tell', 'me', 'show', 'give', 'hey', 'hi',
+}
+
+
+# Numbers keep their sign and decimal point, and comparisons their operator; other punctuation is dropped
+_QUESTION_TOKENS = re.compile(r"-?\d+(?:[.,]\d+)*|[<>!=]+|%|\w+")
+
+
+def normalize_question(question: str) -> str:
+    question = unicodedata.normalize('NFKC', question).lower()
+    return ' '.join(word for word in _QUESTION_TOKENS.findall(question) if word not in _FILLER_WORDS)
+
+
+def schema_fingerprint(schema) -> str:
+    return hashlib.sha256(str(schema).encode('utf-8')).hexdigest()
+
+
+class SQLiteLLMCache:
+    """Persistent question-to-SQL cache stored in a local SQLite side file.
+
+    Every response is stored under two keys, the exact question and its
+    normalized text, both scoped to the schema fingerprint and model.
+    """
+
+    def __init__(self, path: str = '.texttosql_cache.sqlite', max_entries: int = 5000,
+                 ttl_seconds: Optional[float] = 7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats = {'exact_hits': 0, 'normalized_hits': 0, 'misses': 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("PRAGMA synchronous=NORMAL;")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS texttosql_cache (
+                key TEXT PRIMARY KEY,
+                match TEXT NOT NULL,
+                question TEXT NOT NULL,
+                schema_fingerprint TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            );
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS texttosql_cache_last_used ON texttosql_cache(last_used);")
+
+    def get(self, question: str, fingerprint: str, model: str = '') -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            for match, key in self._keys(question, fingerprint, model):
+                row = self._conn.execute(
+                    "SELECT response, created_at FROM texttosql_cache WHERE key = ?;", (key,)
+                ).fetchone()
+                if row is None:
+                    continue
+                if self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                    self._conn.execute("DELETE FROM texttosql_cache WHERE key = ?;", (key,))
+                    continue
+                self._conn.execute(
+                    "UPDATE texttosql_cache SET last_used = ?, hits = hits + 1 WHERE key = ?;", (now, key)
+                )
+                self.stats[f'{match}_hits'] += 1
+                return json.loads(row[0])
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, question: str, fingerprint: str, response: Dict[str, Any], model: str = ''):
+        now = time.time()
+        payload = json.dumps(response)
+        with self._lock:
+            self._conn.execute("BEGIN;")
+            try:
+                for match, key in self._keys(question, fingerprint, model):
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO texttosql_cache "
+                        "(key, match, question, schema_fingerprint, response, created_at, last_used, hits) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, 0);",
+                        (key, match, question, fingerprint, payload, now, now),
+                    )
+                self._evict(now)
+                self._conn.execute("COMMIT;")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK;")
+                raise
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM texttosql_cache;")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM texttosql_cache;").fetchone()[0]
+        hits = self.stats['exact_hits'] + self.stats['normalized_hits']
+        lookups = hits + self.stats['misses']
+        return {**self.stats, 'entries': entries, 'hit_rate': hits / lookups if lookups else 0.0}
+
+    def _evict(self, now: float):
+        if self.ttl_seconds is not None:
+            self._conn.execute("DELETE FROM texttosql_cache WHERE created_at < ?;", (now - self.ttl_seconds,))
+        # Least recently used entries go first once the cache is over capacity
+        self._conn.execute("""
+            DELETE FROM texttosql_cache WHERE key IN (
+                SELECT key FROM texttosql_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            );
+        """, (self.max_entries,))
+
+    def _keys(self, question: str, fingerprint: str, model: str):
+        for match, text in (('exact', question.strip()), ('normalized', normalize_question(question))):
+            digest = hashlib.sha256(f"{match}\0{model}\0{fingerprint}\0{text}".encode('utf-8')).hexdigest()
+            yield match, digest
+
+
+_llm_cache: Optional[SQLiteLLMCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> SQLiteLLMCache:
+    # Opened on first use so importing the handler never touches the disk
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = SQLiteLLMCache(path=os.getenv('TEXTTOSQL_CACHE_PATH', '.texttosql_cache.sqlite'))
+        return _llm_cache
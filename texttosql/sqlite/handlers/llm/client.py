@@ -0,0 +1,123 @@
+import os
+import threading
+from typing import Callable, List, Optional, Sequence, Union
+
+
+class EnvCredentialSource:
+    """Reads the API key from the environment, loading a .env file first when asked to."""
+
+    def __init__(self, variable: str = 'OPENAI_API_KEY', load_dotenv: bool = True):
+        self.variable = variable
+        self.load_dotenv = load_dotenv
+
+    def get_api_key(self) -> Optional[str]:
+        if self.load_dotenv:
+            _load_dotenv_once()
+        return os.getenv(self.variable) or None
+
+    def __repr__(self) -> str:
+        return f"EnvCredentialSource({self.variable!r})"
+
+
+class StreamlitSecretsCredentialSource:
+    """Reads the API key from Streamlit secrets; Streamlit is only imported when this source is consulted."""
+
+    def __init__(self, key: str = 'OPENAI_API_KEY'):
+        self.key = key
+
+    def get_api_key(self) -> Optional[str]:
+        try:
+            import streamlit as st
+            return st.secrets[self.key] or None
+        except Exception:
+            # No secrets file, or the key is missing from it
+            return None
+
+    def __repr__(self) -> str:
+        return f"StreamlitSecretsCredentialSource({self.key!r})"
+
+
+class StaticCredentialSource:
+    """A key handed over directly, e.g. by a batch job that reads it from its own config."""
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+
+    def get_api_key(self) -> Optional[str]:
+        return self.api_key
+
+    def __repr__(self) -> str:
+        return "StaticCredentialSource(***)"
+
+
+CredentialSource = Union[EnvCredentialSource, StreamlitSecretsCredentialSource, StaticCredentialSource,
+                         Callable[[], Optional[str]]]
+
+_dotenv_loaded = False
+_lock = threading.Lock()
+_sources: Optional[List[CredentialSource]] = None
+_base_url: Optional[str] = None
+_client = None
+_async_client = None
+
+
+def _load_dotenv_once():
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        from dotenv import load_dotenv
+        load_dotenv(override=True)
+        _dotenv_loaded = True
+
+
+def default_credential_sources() -> List[CredentialSource]:
+    # Development reads the environment (and .env); otherwise Streamlit secrets win, with the environment as fallback
+    _load_dotenv_once()
+    if os.getenv('DEVELOPMENT_MODE'):
+        print(f'\n\nRunning in DEVELOPMENT mode...\n\n')
+        return [EnvCredentialSource()]
+    print(f'\n\nRunning in PRODUCTION mode...\n\n')
+    return [StreamlitSecretsCredentialSource(), EnvCredentialSource()]
+
+
+def configure_llm(api_key: Optional[str] = None, sources: Optional[Sequence[CredentialSource]] = None,
+                  base_url: Optional[str] = None):
+    # Drops any client already built, so the next call picks the new settings up
+    global _sources, _base_url, _client, _async_client
+    with _lock:
+        if api_key is not None:
+            _sources = [StaticCredentialSource(api_key)]
+        elif sources is not None:
+            _sources = list(sources)
+        _base_url = base_url if base_url is not None else _base_url
+        _client = None
+        _async_client = None
+
+
+def resolve_api_key() -> str:
+    global _sources
+    if _sources is None:
+        _sources = default_credential_sources()
+    for source in _sources:
+        api_key = source.get_api_key() if hasattr(source, 'get_api_key') else source()
+        if api_key:
+            return api_key
+    raise ValueError(f"No OpenAI API key found; tried {', '.join(repr(source) for source in _sources)}.")
+
+
+def get_client():
+    global _client
+    with _lock:
+        if _client is None:
+            from openai import OpenAI
+            _client = OpenAI(api_key=resolve_api_key(), base_url=_base_url)
+        return _client
+
+
+def get_async_client():
+    global _async_client
+    with _lock:
+        if _async_client is None:
+            from openai import AsyncOpenAI
+            # Retries are left to the caller, which waits on the shared rate limiter between attempts
+            _async_client = AsyncOpenAI(api_key=resolve_api_key(), base_url=_base_url, max_retries=0)
+        return _async_client
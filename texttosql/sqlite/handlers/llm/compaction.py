@@ -0,0 +1,134 @@
+import json
+import math
+import numpy as np
+from collections import Counter, defaultdict
+from typing import Optional, Dict, List, Any
+
+from texttosql.sqlite.handlers.database.result import SQLiteQueryResult
+
+_encoding = None
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    # Falls back to a characters-per-token estimate when tiktoken is unavailable
+    global _encoding
+    if _encoding is None:
+        # Imported on first use; tiktoken is slow to import and only needed once a result is compacted
+        try:
+            import tiktoken
+            _encoding = tiktoken.encoding_for_model(model)
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
+
+
+def compact_result(result: SQLiteQueryResult, token_budget: int, model: str = "gpt-4o",
+                   top_k: int = 10, edge_rows: int = 5) -> str:
+    # Rows pass through untouched while they fit; JSON is only built when it might
+    if result.nbytes <= token_budget * 8:
+        data = result.to_json()
+        if count_tokens(data, model) <= token_budget:
+            return data
+
+    # Shrink the summary deterministically until it fits the budget as well
+    while True:
+        summary = json.dumps(summarize_result(result, top_k=top_k, edge_rows=edge_rows), default=str)
+        if count_tokens(summary, model) <= token_budget or (top_k <= 1 and edge_rows <= 0):
+            return summary
+        top_k = max(1, top_k // 2)
+        edge_rows = edge_rows // 2
+
+
+def summarize_result(result: SQLiteQueryResult, top_k: int = 10, edge_rows: int = 5) -> Dict[str, Any]:
+    numeric = {name: _numeric_values(result.data[name]) for name in result.columns}
+    numeric_columns = [name for name in result.columns if numeric[name] is not None]
+    tail_start = max(edge_rows, result.row_count - edge_rows)
+
+    # A capped result only knows a lower bound on its size, and its statistics cover the fetched rows only
+    if result.truncated:
+        size = (f"The result has at least {result.row_count} rows (only the first {result.row_count} were fetched), "
+                "too many to include in full. Statistics below describe the fetched rows only. ")
+    else:
+        size = f"The result has {result.row_count} rows, too many to include in full. "
+
+    summary = {
+        'note': size + "Column statistics, the most common groups and the first/last rows are shown instead.",
+        'row_count': result.row_count,
+        'truncated': result.truncated,
+        'columns': {name: _column_stats(result.data[name], numeric[name], top_k) for name in result.columns},
+        'top_groups': {},
+        'head': _records(result, 0, min(edge_rows, result.row_count)),
+        'tail': _records(result, tail_start, result.row_count) if edge_rows else [],
+    }
+
+    # Low-cardinality text columns are treated as grouping keys for the numeric columns
+    for name in result.columns:
+        if name in numeric_columns:
+            continue
+        positions = defaultdict(list)
+        for position, value in enumerate(result.data[name].tolist()):
+            positions[value].append(position)
+        if len(positions) > max(50, top_k) or len(positions) == result.row_count:
+            continue
+        counts = Counter({value: len(group_positions) for value, group_positions in positions.items()})
+        groups = []
+        for value, count in _most_common(counts, top_k):
+            group = {'value': value, 'rows': count}
+            for numeric_name in numeric_columns:
+                group_values = numeric[numeric_name][positions[value]]
+                group[f'sum_{numeric_name}'] = round(float(np.nansum(group_values)), 2)
+            groups.append(group)
+        summary['top_groups'][name] = groups
+
+    return summary
+
+
+def _records(result: SQLiteQueryResult, start: int, stop: int) -> List[Dict[str, Any]]:
+    columns = [result.data[name][start:stop].tolist() for name in result.columns]
+    return [dict(zip(result.columns, row)) for row in zip(*columns)]
+
+
+def _column_stats(array: np.ndarray, numeric: Optional[np.ndarray], top_k: int) -> Dict[str, Any]:
+    values = array.tolist()
+    nulls = sum(value is None for value in values)
+    if numeric is not None:
+        present = numeric[~np.isnan(numeric)]
+        if present.size == 0:
+            return {'type': 'numeric', 'nulls': nulls}
+        return {
+            'type': 'numeric',
+            'nulls': nulls,
+            'min': _plain(present.min()),
+            'max': _plain(present.max()),
+            'mean': round(float(present.mean()), 2),
+            'sum': round(float(present.sum()), 2),
+        }
+
+    counts = Counter(value for value in values if value is not None)
+    stats = {'type': 'text', 'nulls': nulls, 'distinct': len(counts)}
+    # Frequencies say nothing when every value is unique
+    if len(counts) < len(values) - nulls:
+        stats['top_values'] = [[value, count] for value, count in _most_common(counts, top_k)]
+    return stats
+
+
+def _numeric_values(array: np.ndarray) -> Optional[np.ndarray]:
+    if array.dtype.kind in 'iuf':
+        return array.astype(np.float64)
+    values = array.tolist()
+    present = [value for value in values if value is not None]
+    if not present or not all(isinstance(value, (int, float)) for value in present):
+        return None
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+
+def _most_common(counts: Counter, top_k: int) -> List[tuple]:
+    # Break count ties on the value itself so summaries are reproducible
+    return sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))[:top_k]
+
+
+def _plain(value):
+    value = float(value)
+    return int(value) if value.is_integer() else round(value, 2)
@@ -1,34 +1,88 @@
-from openai import OpenAI
-from dotenv import load_dotenv
-import json, re, os
-import streamlit as st
+import json, re
+import asyncio, weakref
+from typing import Optional, Union, Iterator
+from texttosql.sqlite.handlers.llm.cache import get_llm_cache, schema_fingerprint
+from texttosql.sqlite.handlers.llm.client import get_client, get_async_client
+from texttosql.sqlite.handlers.llm.compaction import compact_result, count_tokens
+from texttosql.sqlite.handlers.llm.ratelimit import AsyncRateLimiter, backoff_delay, retry_after_seconds
+from texttosql.sqlite.handlers.database.result import SQLiteQueryResult
+from texttosql.sqlite.tracing import trace_span, current_span
 
-load_dotenv(override=True)
+# The OpenAI client and its API key are resolved on the first LLM call, see client.py
 
-# Load environment variables from .env if in development mode
-if os.getenv('DEVELOPMENT_MODE'):
-    print(f'\n\nRunning in DEVELOPMENT mode...\n\n')
-    load_dotenv(override=True)
-    openai_api_key = os.getenv('OPENAI_API_KEY')
-else:
-    print(f'\n\nRunning in PRODUCTION mode...\n\n')
-    openai_api_key = st.secrets["OPENAI_API_KEY"]
-
-client = OpenAI(api_key=openai_api_key)
+# In-flight LLM requests per event loop, shared by every handler instance
+_llm_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
 
 class SQLiteLLMHandler:
+    model = "gpt-4o"
+    # Reuse parsed text-to-SQL responses for repeated questions against the same schema
+    texttosql_cache_enabled = True
+    # Upper bound on concurrent LLM requests issued through the async API
+    llm_max_concurrency = 8
+    # Results larger than this many tokens are summarized before the generative call
+    generative_token_budget = 16_000
+    # Optional requests/tokens-per-minute limiter shared by the async calls, e.g. for batch runs
+    llm_rate_limiter: Optional[AsyncRateLimiter] = None
+    # Async calls that hit a rate limit are retried with backoff this many times
+    llm_rate_limit_retries = 5
+    llm_backoff_base_seconds = 1.0
+    llm_backoff_max_seconds = 60.0
+
     def __init__(self):
         pass
     
-    def make_texttosql_llm_call(self, query: str, schema: dict) -> dict:
-        prompt = self._build_texttosql_llm_prompt(query, schema)
+    def make_texttosql_llm_call(self, query: str, schema: Union[dict, str]) -> dict:
+        fingerprint = schema_fingerprint(schema)
+        if self.texttosql_cache_enabled:
+            cached_result = get_llm_cache().get(query, fingerprint, model=self.model)
+            if cached_result is not None:
+                print("Using cached text-to-SQL response...")
+                current_span().set(cache_hit=True)
+                return cached_result
+            current_span().set(cache_hit=False)
+
+        with trace_span('build_prompt'):
+            prompt = self._build_texttosql_llm_prompt(query, schema)
         
         if not prompt:
             print("Error: Generated prompt is empty or None.")
             return {}
 
-        sql_generative_response = client.chat.completions.create(
-            model="gpt-4o",
+        sql_generative_response = get_client().chat.completions.create(**self._texttosql_request(prompt))
+        self._record_usage(sql_generative_response)
+
+        result = self._parse_texttosql_response(sql_generative_response)
+        if self.texttosql_cache_enabled and 'error' not in result:
+            get_llm_cache().put(query, fingerprint, result, model=self.model)
+        return result
+
+    async def amake_texttosql_llm_call(self, query: str, schema: Union[dict, str]) -> dict:
+        fingerprint = schema_fingerprint(schema)
+        if self.texttosql_cache_enabled:
+            cached_result = await asyncio.to_thread(get_llm_cache().get, query, fingerprint, self.model)
+            if cached_result is not None:
+                print("Using cached text-to-SQL response...")
+                current_span().set(cache_hit=True)
+                return cached_result
+            current_span().set(cache_hit=False)
+
+        with trace_span('build_prompt'):
+            prompt = self._build_texttosql_llm_prompt(query, schema)
+
+        if not prompt:
+            print("Error: Generated prompt is empty or None.")
+            return {}
+
+        sql_generative_response = await self._acreate(self._texttosql_request(prompt), prompt)
+
+        result = self._parse_texttosql_response(sql_generative_response)
+        if self.texttosql_cache_enabled and 'error' not in result:
+            await asyncio.to_thread(get_llm_cache().put, query, fingerprint, result, self.model)
+        return result
+
+    def _texttosql_request(self, prompt: str) -> dict:
+        return dict(
+            model=self.model,
             messages=[
                 {"role": "system", "content": "You are a helpful research assistant and a SQL expert for SQLite databases. Respond ONLY with a valid JSON object containing the specified keys and values, without any additional text, code blocks, or formatting."},
                 {"role": "user", "content": prompt},
@@ -39,7 +93,8 @@ class SQLiteLLMHandler:
             frequency_penalty=0,
             presence_penalty=0,
         )
-        
+
+    def _parse_texttosql_response(self, sql_generative_response) -> dict:
         result = sql_generative_response.choices[0].message.content.strip()
         result = re.sub(r"```(\w+)?", "", result).strip()
         
@@ -55,7 +110,7 @@ class SQLiteLLMHandler:
         except Exception as e:
             return {"error": f"Failed to decode JSON: {e}", "response": result}
 
-    def _build_texttosql_llm_prompt(self, query: str, schema: dict) -> str:
+    def _build_texttosql_llm_prompt(self, query: str, schema: Union[dict, str]) -> str:
         prompt = ''
         prompt += "You are a SQLite expert tasked with returning a SQL query based on a user's natural language question, the data scema, and a few example rows of the data."
         prompt += f"\n\nThe data schema is as follows:\n\n{schema}"
@@ -113,15 +168,72 @@ class SQLiteLLMHandler:
         
         return prompt
     
+    def compact_result_for_prompt(self, data):
+        # Plain JSON strings (from execute_query) carry no structure to summarize
+        if isinstance(data, SQLiteQueryResult):
+            compacted = compact_result(data, self.generative_token_budget, model=self.model)
+            note = self._result_status_note(data)
+            return f"{note}\n{compacted}" if note else compacted
+        return data
+
+    def _result_status_note(self, data: SQLiteQueryResult) -> Optional[str]:
+        # Partial results are flagged so the answer can say it may be incomplete
+        if data.status == 'timed_out':
+            return (f"Note: the query was stopped because it exceeded its execution budget, so only the first "
+                    f"{data.row_count} rows were retrieved. State that the answer may be incomplete.")
+        if data.status == 'truncated':
+            return (f"Note: the result was capped at {data.row_count} rows and more rows matched. "
+                    f"State that the answer only covers part of the matching data.")
+        return None
+
     def make_generative_llm_call(self, query: str, data: json) -> dict:
-        prompt = self._build_generative_llm_prompt(query, data)
+        with trace_span('build_prompt'):
+            prompt = self._build_generative_llm_prompt(query, data)
 
         if not prompt:
             print("Error: Generated prompt is empty or None.")
             return {}
         
-        generative_response = client.chat.completions.create(
-            model="gpt-4o",
+        generative_response = get_client().chat.completions.create(**self._generative_request(prompt))
+        self._record_usage(generative_response)
+
+        generative_result = generative_response.choices[0].message.content.strip()
+
+        return generative_result
+
+    async def amake_generative_llm_call(self, query: str, data: json) -> dict:
+        with trace_span('build_prompt'):
+            prompt = self._build_generative_llm_prompt(query, data)
+
+        if not prompt:
+            print("Error: Generated prompt is empty or None.")
+            return {}
+
+        generative_response = await self._acreate(self._generative_request(prompt), prompt)
+
+        return generative_response.choices[0].message.content.strip()
+    
+    def make_generative_llm_call_stream(self, query: str, data: json) -> Iterator[str]:
+        with trace_span('build_prompt'):
+            prompt = self._build_generative_llm_prompt(query, data)
+
+        if not prompt:
+            print("Error: Generated prompt is empty or None.")
+            return
+
+        # The final chunk carries the token usage for the whole stream
+        stream = get_client().chat.completions.create(**self._generative_request(prompt), stream=True,
+                                                      stream_options={"include_usage": True})
+
+        for chunk in stream:
+            if chunk.usage:
+                self._record_usage(chunk)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def _generative_request(self, prompt: str) -> dict:
+        return dict(
+            model=self.model,
             messages=[
                 {"role": "system", "content": "You are a helpful research assistant and a SQL expert for SQLite databases. Respond ONLY with the answer to the user's question, without any additional text, code blocks, or formatting."},
                 {"role": "user", "content": prompt},
@@ -133,10 +245,53 @@ class SQLiteLLMHandler:
             presence_penalty=0,
         )
 
-        generative_result = generative_response.choices[0].message.content.strip()
+    async def _acreate(self, request: dict, prompt: str):
+        from openai import RateLimitError
+
+        limiter = self.llm_rate_limiter
+        # The rate limit counts the prompt plus the completion tokens the request may use
+        estimated_tokens = count_tokens(prompt, model=self.model) + request.get('max_tokens', 0)
+        for attempt in range(self.llm_rate_limit_retries + 1):
+            reserved = await limiter.acquire(estimated_tokens) if limiter else 0
+            try:
+                async with self._llm_semaphore():
+                    response = await get_async_client().chat.completions.create(**request)
+            except RateLimitError as e:
+                if limiter:
+                    limiter.settle(reserved, 0)
+                if attempt == self.llm_rate_limit_retries:
+                    raise
+                delay = backoff_delay(attempt, self.llm_backoff_base_seconds, self.llm_backoff_max_seconds,
+                                      retry_after_seconds(e))
+                print(f"Rate limited by the LLM API; retrying in {delay:.1f}s (attempt {attempt + 1})...")
+                current_span().add(rate_limit_retries=1)
+                if limiter:
+                    # Every call sharing the limiter backs off, and the next acquire does the waiting
+                    limiter.pause(delay)
+                else:
+                    await asyncio.sleep(delay)
+                continue
+
+            usage = getattr(response, 'usage', None)
+            if limiter:
+                limiter.settle(reserved, usage.total_tokens if usage is not None else None)
+            self._record_usage(response)
+            return response
+
+    def _record_usage(self, response):
+        usage = getattr(response, 'usage', None)
+        if usage is not None:
+            current_span().add(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+
+    def _llm_semaphore(self) -> asyncio.Semaphore:
+        # Semaphores belong to an event loop, so keep one per running loop
+        loop = asyncio.get_running_loop()
+        semaphore = _llm_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.llm_max_concurrency)
+            _llm_semaphores[loop] = semaphore
+        return semaphore
 
-        return generative_result
-    
     def _build_generative_llm_prompt(self, query, data):
         return_prompt = f"""
         Based on the question:\n\n**{query}**\n\n the following data was found:\n\n
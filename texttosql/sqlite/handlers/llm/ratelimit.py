@@ -0,0 +1,87 @@
+import asyncio
+import random
+import time
+from typing import Optional
+
+
+class AsyncRateLimiter:
+    """Token buckets for requests per minute and tokens per minute.
+
+    Each call reserves one request and an estimate of its tokens before it
+    is sent; `settle` corrects the token bucket once the response reports
+    what the call actually used.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute or 0)
+        self._tokens = float(tokens_per_minute or 0)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waited_seconds = 0.0
+
+    async def acquire(self, tokens: int = 0) -> int:
+        # A single call larger than a minute's budget would never fit, so it waits for a full bucket instead
+        if self.tokens_per_minute:
+            tokens = min(tokens, int(self.tokens_per_minute))
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = max(self._wait_for(self._requests, 1, self.requests_per_minute),
+                           self._wait_for(self._tokens, tokens, self.tokens_per_minute))
+                if wait <= 0:
+                    if self.requests_per_minute:
+                        self._requests -= 1
+                    if self.tokens_per_minute:
+                        self._tokens -= tokens
+                    return tokens
+                self.waited_seconds += wait
+                await asyncio.sleep(wait)
+
+    def settle(self, reserved: int, used: Optional[int]):
+        if self.tokens_per_minute and used is not None:
+            self._tokens = min(self._tokens + reserved - used, float(self.tokens_per_minute))
+
+    def pause(self, seconds: float):
+        # A 429 means the server's view of the budget is tighter than ours; drain the buckets for a while
+        self._refill()
+        if self.requests_per_minute:
+            self._requests = min(self._requests, -seconds * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._tokens = min(self._tokens, -seconds * self.tokens_per_minute / 60)
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed, self._updated = now - self._updated, now
+        if self.requests_per_minute:
+            self._requests = min(self._requests + elapsed * self.requests_per_minute / 60, float(self.requests_per_minute))
+        if self.tokens_per_minute:
+            self._tokens = min(self._tokens + elapsed * self.tokens_per_minute / 60, float(self.tokens_per_minute))
+
+    @staticmethod
+    def _wait_for(available: float, needed: float, per_minute: Optional[float]) -> float:
+        if not per_minute or available >= needed:
+            return 0.0
+        return (needed - available) * 60 / per_minute
+
+
+def backoff_delay(attempt: int, base_seconds: float = 1.0, max_seconds: float = 60.0,
+                  retry_after: Optional[float] = None) -> float:
+    # Honour the server's Retry-After when it sends one, otherwise exponential backoff with full jitter
+    if retry_after is not None:
+        return min(retry_after, max_seconds)
+    return random.uniform(0, min(max_seconds, base_seconds * 2 ** attempt))
+
+
+def retry_after_seconds(error) -> Optional[float]:
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    for header, scale in (('retry-after-ms', 0.001), ('retry-after', 1.0)):
+        value = headers.get(header)
+        if value is not None:
+            try:
+                return float(value) * scale
+            except ValueError:
+                pass
+    return None
@@ -1,6 +1,11 @@
-from typing import Optional
+from typing import Optional, Dict
+from texttosql.sqlite.handlers.query.schema_index import SchemaIndex
 
 class SQLiteQueryHandler:
+    # Schemas with more tables than this are pruned to the tables relevant to the question
+    schema_prune_top_k_tables = 5
+    schema_prune_max_columns = 40
+
     def __init__(self):
         pass
 
@@ -8,5 +13,12 @@ class SQLiteQueryHandler:
         query = self._clean_query(query)
         return query
 
+    def prune_schema(self, query: str, schema: Optional[Dict[str, dict]],
+                     index: Optional[SchemaIndex] = None) -> Optional[Dict[str, dict]]:
+        if not schema or len(schema) <= self.schema_prune_top_k_tables:
+            return schema
+        index = index or SchemaIndex(schema)
+        return index.prune(query, schema, self.schema_prune_top_k_tables, self.schema_prune_max_columns)
+
     def _clean_query(self, query: str) -> str:
-        return query
\ No newline at end of file
+        return query
@@ -0,0 +1,132 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple, Set
+
+_STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'do', 'does', 'for', 'from', 'has', 'have',
+    'how', 'in', 'is', 'it', 'its', 'me', 'many', 'much', 'of', 'on', 'or', 'show', 'that', 'the',
+    'their', 'them', 'there', 'these', 'they', 'this', 'to', 'was', 'were', 'what', 'when', 'where',
+    'which', 'who', 'with', 'list', 'give', 'tell', 'all', 'each', 'per',
+}
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in re.split(r'[^a-z0-9]+', str(text).lower()):
+        if not token or token in _STOP_WORDS:
+            continue
+        # A crude plural strip is enough to match 'risks' against 'risk'
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class _BM25:
+    def __init__(self, documents: Dict[object, List[str]], k1: float = 1.2, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self.term_counts = {key: Counter(tokens) for key, tokens in documents.items()}
+        self.lengths = {key: len(tokens) for key, tokens in documents.items()}
+        self.average_length = (sum(self.lengths.values()) / len(self.lengths)) if self.lengths else 0
+        document_frequency = Counter()
+        for counts in self.term_counts.values():
+            document_frequency.update(counts.keys())
+        total = len(documents)
+        self.idf = {term: math.log(1 + (total - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def scores(self, query_tokens: List[str]) -> Dict[object, float]:
+        scores = defaultdict(float)
+        for term in set(query_tokens):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for key, counts in self.term_counts.items():
+                frequency = counts.get(term)
+                if not frequency:
+                    continue
+                norm = 1 - self.b + self.b * self.lengths[key] / (self.average_length or 1)
+                scores[key] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * norm)
+        return scores
+
+
+class SchemaIndex:
+    """Lexical index over table names, column names and distinct sample values."""
+
+    def __init__(self, schema: Dict[str, dict]):
+        table_documents, column_documents = {}, {}
+        self.links: Dict[str, Set[str]] = defaultdict(set)
+        self.key_columns: Dict[str, Set[str]] = defaultdict(set)
+
+        for table_name, table_schema in schema.items():
+            columns = [column['name'] for column in table_schema.get('columns', [])]
+            samples = table_schema.get('sample_data', [])
+            table_tokens = tokenize(table_name) * 2
+            for position, column_name in enumerate(columns):
+                values = {row[position] for row in samples if position < len(row) and isinstance(row[position], str)}
+                column_tokens = tokenize(column_name) * 2 + [token for value in sorted(values) for token in tokenize(value)]
+                column_documents[(table_name, column_name)] = column_tokens
+                table_tokens += column_tokens
+            table_documents[table_name] = table_tokens
+
+            for column in table_schema.get('columns', []):
+                if column.get('primary_key'):
+                    self.key_columns[table_name].add(column['name'])
+            for constraint in table_schema.get('constraints', []):
+                if constraint.get('type') == 'foreign_key':
+                    self.links[table_name].add(constraint['table'])
+                    self.links[constraint['table']].add(table_name)
+                    self.key_columns[table_name].add(constraint['from'])
+                    self.key_columns[constraint['table']].add(constraint['to'])
+
+        self.tables = _BM25(table_documents)
+        self.columns = _BM25(column_documents)
+
+    def rank(self, query: str) -> Tuple[List[Tuple[str, float]], Dict[str, Dict[str, float]]]:
+        query_tokens = tokenize(query)
+        table_scores = self.tables.scores(query_tokens)
+        column_scores = defaultdict(dict)
+        for (table_name, column_name), score in self.columns.scores(query_tokens).items():
+            column_scores[table_name][column_name] = score
+            table_scores[table_name] = max(table_scores[table_name], score)
+        ranked = sorted(table_scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked, column_scores
+
+    def prune(self, query: str, schema: Dict[str, dict], top_k_tables: int, max_columns: int) -> Dict[str, dict]:
+        ranked, column_scores = self.rank(query)
+        selected = [table_name for table_name, score in ranked[:top_k_tables] if score > 0]
+        if not selected:
+            # Nothing matched lexically; let the model see everything rather than guess
+            return schema
+
+        # Joins need both ends, so pull in tables linked through foreign keys
+        for table_name in list(selected):
+            for linked in sorted(self.links.get(table_name, ())):
+                if linked in schema and linked not in selected:
+                    selected.append(linked)
+
+        return {
+            table_name: self._prune_table(schema[table_name], column_scores.get(table_name, {}),
+                                          self.key_columns.get(table_name, set()), max_columns)
+            for table_name in selected
+        }
+
+    def _prune_table(self, table_schema: dict, scores: Dict[str, float], key_columns: Set[str],
+                     max_columns: int) -> dict:
+        columns = table_schema['columns']
+        if len(columns) <= max_columns:
+            return table_schema
+
+        # Keys always survive; the rest are kept by relevance, then in table order
+        order = sorted(range(len(columns)),
+                       key=lambda i: (columns[i]['name'] not in key_columns, -scores.get(columns[i]['name'], 0), i))
+        keep = sorted(order[:max_columns])
+        kept_names = {columns[i]['name'] for i in keep}
+        return {
+            'columns': [columns[i] for i in keep],
+            'constraints': [
+                constraint for constraint in table_schema['constraints']
+                if set(constraint.get('columns', [constraint.get('from')])) <= kept_names
+            ],
+            'sample_data': [tuple(row[i] for i in keep) for row in table_schema['sample_data']],
+        }
@@ -0,0 +1,338 @@
+import asyncio
+import contextvars
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Any
+
+
+class Span:
+    """One timed stage of a question, e.g. the text-to-SQL call or the SQL execution."""
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'started_at', 'seconds', 'status', 'error',
+                 'attributes', '_start')
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, **attributes):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.started_at = time.time()
+        self.seconds: Optional[float] = None
+        self.status = 'ok'
+        self.error: Optional[str] = None
+        self.attributes: Dict[str, Any] = attributes
+        self._start = time.perf_counter()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, **counters):
+        # Counters such as tokens add up when a stage makes more than one call
+        for key, value in counters.items():
+            self.attributes[key] = self.attributes.get(key, 0) + (value or 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'started_at': self.started_at,
+            'seconds': self.seconds,
+            'status': self.status,
+            'error': self.error,
+            'attributes': self.attributes,
+        }
+
+    def __repr__(self) -> str:
+        return f"<Span {self.name} {self.status} {self.seconds}s>"
+
+
+class _NoopSpan:
+    # Handed out while tracing is off so instrumented code never has to check
+    trace_id = None
+
+    def set(self, **attributes):
+        pass
+
+    def add(self, **counters):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar('texttosql_span', default=None)
+_current_trace: contextvars.ContextVar[Optional[List[Span]]] = contextvars.ContextVar('texttosql_trace', default=None)
+
+
+class JSONLSpanSink:
+    """Appends finished spans to a JSON Lines file, one span per line."""
+
+    def __init__(self, path: str = '.texttosql_traces.jsonl'):
+        self.path = path
+
+    def write(self, spans: List[Span]):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), default=str) + '\n')
+
+    def close(self):
+        pass
+
+
+class SQLiteSpanSink:
+    """Stores finished spans in a local SQLite side file for later inspection."""
+
+    def __init__(self, path: str = '.texttosql_traces.sqlite', max_entries: int = 200_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("PRAGMA synchronous=NORMAL;")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS texttosql_spans (
+                id INTEGER PRIMARY KEY,
+                trace_id TEXT NOT NULL,
+                span_id TEXT NOT NULL,
+                parent_id TEXT,
+                name TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                seconds REAL,
+                status TEXT NOT NULL,
+                error TEXT,
+                attributes TEXT NOT NULL
+            );
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS texttosql_spans_trace_id ON texttosql_spans(trace_id);")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS texttosql_spans_name ON texttosql_spans(name, started_at);")
+
+    def write(self, spans: List[Span]):
+        rows = [
+            (span.trace_id, span.span_id, span.parent_id, span.name, span.started_at, span.seconds,
+             span.status, span.error, json.dumps(span.attributes, default=str))
+            for span in spans
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN;")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO texttosql_spans "
+                    "(trace_id, span_id, parent_id, name, started_at, seconds, status, error, attributes) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);",
+                    rows,
+                )
+                # Oldest spans go first once the table is over capacity
+                self._conn.execute("DELETE FROM texttosql_spans WHERE id <= "
+                                   "(SELECT MAX(id) FROM texttosql_spans) - ?;", (self.max_entries,))
+                self._conn.execute("COMMIT;")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK;")
+                raise
+
+    def stage_summary(self, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT name, COUNT(*), AVG(seconds), MAX(seconds), SUM(status = 'error'),
+                       SUM(COALESCE(json_extract(attributes, '$.prompt_tokens'), 0)),
+                       SUM(COALESCE(json_extract(attributes, '$.completion_tokens'), 0))
+                FROM texttosql_spans WHERE started_at >= ? GROUP BY name ORDER BY SUM(seconds) DESC;
+            """, (since or 0,)).fetchall()
+        return [
+            {'stage': name, 'count': count, 'avg_seconds': avg, 'max_seconds': longest, 'errors': errors,
+             'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens}
+            for name, count, avg, longest, errors, prompt_tokens, completion_tokens in rows
+        ]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class Tracer:
+    """Collects spans from SQLiteEngine.query and hands them to a sink off the request path.
+
+    Finished spans go onto a bounded queue that a background thread drains
+    in batches; when the queue is full spans are dropped and counted rather
+    than slowing the question down.
+    """
+
+    def __init__(self, sink=None, enabled: bool = True, max_queue: int = 10_000, batch_size: int = 256,
+                 flush_interval: float = 0.5, keep_traces: int = 50):
+        self.sink = sink
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=max_queue)
+        self._recent: deque = deque(maxlen=keep_traces)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        if not self.enabled:
+            yield _NOOP_SPAN
+            return
+
+        parent = _current_span.get()
+        trace = _current_trace.get()
+        is_root = parent is None or trace is None
+        if is_root:
+            trace = []
+        span = Span(name, trace_id=parent.trace_id if not is_root else uuid.uuid4().hex,
+                    parent_id=None if is_root else parent.span_id, **attributes)
+        span_token = _current_span.set(span)
+        trace_token = _current_trace.set(trace) if is_root else None
+        try:
+            yield span
+        except (GeneratorExit, asyncio.CancelledError):
+            # An abandoned stream or a cancelled task is not a failure of the stage
+            span.status = 'cancelled'
+            raise
+        except BaseException as e:
+            span.status = 'error'
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.seconds = time.perf_counter() - span._start
+            _current_span.reset(span_token)
+            if trace_token is not None:
+                _current_trace.reset(trace_token)
+            trace.append(span)
+            if is_root:
+                self._recent.append(sorted(trace, key=lambda s: s.started_at))
+            self._submit(span)
+
+    def current_span(self):
+        return _current_span.get() or _NOOP_SPAN
+
+    def recent_traces(self, limit: Optional[int] = None) -> List[List[Span]]:
+        # Most recent first, each trace as its spans in start order
+        traces = list(reversed(self._recent))
+        return traces[:limit] if limit is not None else traces
+
+    def flush(self, timeout: float = 5.0):
+        # Block until everything queued so far has reached the sink
+        if self._writer is None:
+            return
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _submit(self, span: Span):
+        if self.sink is None:
+            return
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_writer(self):
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._drain, name='texttosql-tracer', daemon=True)
+                self._writer.start()
+
+    def _drain(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self.sink.write(batch)
+            except Exception as e:
+                print(f"Error writing {len(batch)} trace spans: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+def current_trace_spans() -> List[Span]:
+    # Spans of the enclosing trace that have already finished
+    return list(_current_trace.get() or [])
+
+
+def summarize_trace(spans: List[Span]) -> Dict[str, Any]:
+    # One row per question: the root span plus totals and per-stage timings from its children
+    root = next((span for span in spans if span.parent_id is None), spans[0])
+    summary = {
+        'question': root.attributes.get('question'),
+        'db': root.attributes.get('db'),
+        'started_at': root.started_at,
+        'seconds': root.seconds,
+        'status': root.status if root.status == 'error' else root.attributes.get('outcome', root.status),
+        'prompt_tokens': 0,
+        'completion_tokens': 0,
+        'rows': None,
+        'bytes': None,
+        'cache_hit': None,
+    }
+    stages = {}
+    for span in spans:
+        summary['prompt_tokens'] += span.attributes.get('prompt_tokens', 0)
+        summary['completion_tokens'] += span.attributes.get('completion_tokens', 0)
+        if span.name == 'execute_query':
+            summary['rows'] = span.attributes.get('rows')
+            summary['bytes'] = span.attributes.get('bytes')
+        if 'cache_hit' in span.attributes:
+            summary['cache_hit'] = span.attributes['cache_hit']
+        if span.parent_id == root.span_id:
+            stages[span.name] = stages.get(span.name, 0.0) + (span.seconds or 0.0)
+    summary['stages'] = stages
+    return summary
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def _sink_from_env():
+    sink = os.getenv('TEXTTOSQL_TRACE_SINK', 'sqlite').lower()
+    path = os.getenv('TEXTTOSQL_TRACE_PATH')
+    if sink == 'jsonl':
+        return JSONLSpanSink(path=path or '.texttosql_traces.jsonl')
+    if sink == 'sqlite':
+        return SQLiteSpanSink(path=path or '.texttosql_traces.sqlite')
+    return None
+
+
+def get_tracer() -> Tracer:
+    # Created on first use so importing the engine never touches the disk
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            enabled = os.getenv('TEXTTOSQL_TRACING', '1').lower() not in ('0', 'false', 'no', 'off')
+            _tracer = Tracer(sink=_sink_from_env() if enabled else None, enabled=enabled)
+        return _tracer
+
+
+def set_tracer(tracer: Tracer) -> Tracer:
+    global _tracer
+    with _tracer_lock:
+        _tracer = tracer
+    return tracer
+
+
+def trace_span(name: str, **attributes):
+    return get_tracer().span(name, **attributes)
+
+
+def current_span():
+    return get_tracer().current_span()